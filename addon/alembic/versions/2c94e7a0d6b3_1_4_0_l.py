@@ -0,0 +1,64 @@
+"""1.4.0 L
+
+Revision ID: 2c94e7a0d6b3
+Revises: f61a8c3d7b95
+Create Date: 2026-10-19 20:03:51.740926
+
+"""
+
+import sqlalchemy as sa
+from alembic import op
+
+revision = "2c94e7a0d6b3"
+down_revision = "f61a8c3d7b95"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "database_sizes",
+        sa.Column("id", sa.String(length=32), nullable=False),
+        sa.Column("created", sa.DateTime(), nullable=False),
+        sa.Column("size", sa.BigInteger(), nullable=False),
+        sa.Column("database_id", sa.String(length=32), nullable=False),
+        sa.ForeignKeyConstraint(
+            ["database_id"],
+            ["databases.id"],
+            name=op.f("fk_database_sizes_database_id_databases"),
+        ),
+        sa.PrimaryKeyConstraint("id", name=op.f("pk_database_sizes")),
+    )
+    with op.batch_alter_table("database_sizes", schema=None) as batch_op:
+        batch_op.create_index(
+            batch_op.f("ix_database_sizes_created"), ["created"], unique=False
+        )
+        batch_op.create_index(
+            batch_op.f("ix_database_sizes_database_id"), ["database_id"], unique=False
+        )
+
+    with op.batch_alter_table("databases", schema=None) as batch_op:
+        batch_op.add_column(sa.Column("size", sa.BigInteger(), nullable=True))
+        batch_op.add_column(sa.Column("size_measured", sa.DateTime(), nullable=True))
+        batch_op.add_column(sa.Column("size_growth_per_day", sa.Float(), nullable=True))
+        batch_op.add_column(sa.Column("soft_quota", sa.BigInteger(), nullable=True))
+        batch_op.add_column(sa.Column("hard_quota", sa.BigInteger(), nullable=True))
+        batch_op.add_column(
+            sa.Column("quota_blocked", sa.Boolean(), server_default="0", nullable=False)
+        )
+
+
+def downgrade():
+    with op.batch_alter_table("databases", schema=None) as batch_op:
+        batch_op.drop_column("quota_blocked")
+        batch_op.drop_column("hard_quota")
+        batch_op.drop_column("soft_quota")
+        batch_op.drop_column("size_growth_per_day")
+        batch_op.drop_column("size_measured")
+        batch_op.drop_column("size")
+
+    with op.batch_alter_table("database_sizes", schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f("ix_database_sizes_database_id"))
+        batch_op.drop_index(batch_op.f("ix_database_sizes_created"))
+
+    op.drop_table("database_sizes")
@@ -0,0 +1,29 @@
+"""1.4.0 C
+
+Revision ID: 3e9a07c4d215
+Revises: b58d1e6f0a47
+Create Date: 2026-10-19 10:48:52.093614
+
+"""
+
+import sqlalchemy as sa
+from alembic import op
+
+revision = "3e9a07c4d215"
+down_revision = "b58d1e6f0a47"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table("instances", schema=None) as batch_op:
+        batch_op.add_column(
+            sa.Column(
+                "stat_statements", sa.Boolean(), server_default="0", nullable=False
+            )
+        )
+
+
+def downgrade():
+    with op.batch_alter_table("instances", schema=None) as batch_op:
+        batch_op.drop_column("stat_statements")
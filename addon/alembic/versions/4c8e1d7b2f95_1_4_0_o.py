@@ -0,0 +1,27 @@
+"""1.4.0 O
+
+Revision ID: 4c8e1d7b2f95
+Revises: 9b4d2f6e1a83
+Create Date: 2026-10-19 23:12:08.517364
+
+"""
+
+import sqlalchemy as sa
+from alembic import op
+
+revision = "4c8e1d7b2f95"
+down_revision = "9b4d2f6e1a83"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table("maintenance_runs", schema=None) as batch_op:
+        batch_op.add_column(sa.Column("timeout_seconds", sa.Integer(), nullable=True))
+        batch_op.alter_column("duration", existing_type=sa.Float(), nullable=True)
+
+
+def downgrade():
+    with op.batch_alter_table("maintenance_runs", schema=None) as batch_op:
+        batch_op.alter_column("duration", existing_type=sa.Float(), nullable=False)
+        batch_op.drop_column("timeout_seconds")
@@ -0,0 +1,46 @@
+"""1.4.0 F
+
+Revision ID: 54d8c2f9e1a6
+Revises: c6071d3e8b92
+Create Date: 2026-10-19 13:41:09.264380
+
+"""
+
+import sqlalchemy as sa
+from alembic import op
+
+revision = "54d8c2f9e1a6"
+down_revision = "c6071d3e8b92"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "instance_upgrades",
+        sa.Column("id", sa.String(length=32), nullable=False),
+        sa.Column("created", sa.DateTime(), nullable=False),
+        sa.Column("updated", sa.DateTime(), nullable=False),
+        sa.Column("instance_name", sa.String(length=255), nullable=False),
+        sa.Column("target_instance_name", sa.String(length=255), nullable=True),
+        sa.Column("method", sa.String(length=32), nullable=False),
+        sa.Column("from_version", sa.String(length=255), nullable=False),
+        sa.Column("to_version", sa.String(length=255), nullable=False),
+        sa.Column("status", sa.String(length=32), nullable=False),
+        sa.Column("phases", sa.UnicodeText(), nullable=False),
+        sa.Column("error", sa.UnicodeText(), nullable=True),
+        sa.PrimaryKeyConstraint("id", name=op.f("pk_instance_upgrades")),
+    )
+    with op.batch_alter_table("instance_upgrades", schema=None) as batch_op:
+        batch_op.create_index(
+            batch_op.f("ix_instance_upgrades_instance_name"),
+            ["instance_name"],
+            unique=False,
+        )
+
+
+def downgrade():
+    with op.batch_alter_table("instance_upgrades", schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f("ix_instance_upgrades_instance_name"))
+
+    op.drop_table("instance_upgrades")
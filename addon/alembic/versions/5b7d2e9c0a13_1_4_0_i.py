@@ -0,0 +1,45 @@
+"""1.4.0 I
+
+Revision ID: 5b7d2e9c0a13
+Revises: a4f3e8d21c57
+Create Date: 2026-10-19 17:21:44.093518
+
+"""
+
+import sqlalchemy as sa
+from alembic import op
+
+revision = "5b7d2e9c0a13"
+down_revision = "a4f3e8d21c57"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "database_moves",
+        sa.Column("id", sa.String(length=32), nullable=False),
+        sa.Column("created", sa.DateTime(), nullable=False),
+        sa.Column("updated", sa.DateTime(), nullable=False),
+        sa.Column("db_name", sa.String(length=255), nullable=False),
+        sa.Column("source_instance_name", sa.String(length=255), nullable=False),
+        sa.Column("target_instance_name", sa.String(length=255), nullable=False),
+        sa.Column("status", sa.String(length=32), nullable=False),
+        sa.Column("phases", sa.UnicodeText(), nullable=False),
+        sa.Column("lag_bytes", sa.BigInteger(), nullable=True),
+        sa.Column("error", sa.UnicodeText(), nullable=True),
+        sa.PrimaryKeyConstraint("id", name=op.f("pk_database_moves")),
+    )
+    with op.batch_alter_table("database_moves", schema=None) as batch_op:
+        batch_op.create_index(
+            batch_op.f("ix_database_moves_source_instance_name"),
+            ["source_instance_name"],
+            unique=False,
+        )
+
+
+def downgrade():
+    with op.batch_alter_table("database_moves", schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f("ix_database_moves_source_instance_name"))
+
+    op.drop_table("database_moves")
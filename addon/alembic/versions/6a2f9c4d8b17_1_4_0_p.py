@@ -0,0 +1,31 @@
+"""1.4.0 P
+
+Revision ID: 6a2f9c4d8b17
+Revises: 4c8e1d7b2f95
+Create Date: 2026-10-20 10:41:27.306519
+
+"""
+
+import sqlalchemy as sa
+from alembic import op
+
+revision = "6a2f9c4d8b17"
+down_revision = "4c8e1d7b2f95"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table("database_moves", schema=None) as batch_op:
+        batch_op.add_column(sa.Column("max_lag_bytes", sa.BigInteger(), nullable=True))
+        batch_op.add_column(
+            sa.Column("allow_restart", sa.Boolean(), server_default="0", nullable=False)
+        )
+        batch_op.add_column(sa.Column("api_key", sa.String(length=255), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table("database_moves", schema=None) as batch_op:
+        batch_op.drop_column("api_key")
+        batch_op.drop_column("allow_restart")
+        batch_op.drop_column("max_lag_bytes")
@@ -0,0 +1,51 @@
+"""1.4.0 A
+
+Revision ID: 7c2e4a9b1f30
+Revises: 01f55269072f
+Create Date: 2026-10-19 09:12:41.207518
+
+"""
+
+import sqlalchemy as sa
+from alembic import op
+
+revision = "7c2e4a9b1f30"
+down_revision = "01f55269072f"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "pool_databases",
+        sa.Column("id", sa.String(length=32), nullable=False),
+        sa.Column("created", sa.DateTime(), nullable=False),
+        sa.Column("updated", sa.DateTime(), nullable=False),
+        sa.Column("name", sa.String(length=255), nullable=False),
+        sa.Column("instance_id", sa.String(length=32), nullable=False),
+        sa.ForeignKeyConstraint(
+            ["instance_id"],
+            ["instances.id"],
+            name=op.f("fk_pool_databases_instance_id_instances"),
+        ),
+        sa.PrimaryKeyConstraint("id", name=op.f("pk_pool_databases")),
+    )
+    with op.batch_alter_table("pool_databases", schema=None) as batch_op:
+        batch_op.create_index(
+            batch_op.f("ix_pool_databases_instance_id"), ["instance_id"], unique=False
+        )
+
+    with op.batch_alter_table("instances", schema=None) as batch_op:
+        batch_op.add_column(
+            sa.Column("pool_size", sa.Integer(), server_default="0", nullable=False)
+        )
+
+
+def downgrade():
+    with op.batch_alter_table("instances", schema=None) as batch_op:
+        batch_op.drop_column("pool_size")
+
+    with op.batch_alter_table("pool_databases", schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f("ix_pool_databases_instance_id"))
+
+    op.drop_table("pool_databases")
@@ -0,0 +1,78 @@
+"""1.4.0 M
+
+Revision ID: 7e1b5f3a9c24
+Revises: 2c94e7a0d6b3
+Create Date: 2026-10-19 21:12:07.318542
+
+"""
+
+import sqlalchemy as sa
+from alembic import op
+
+revision = "7e1b5f3a9c24"
+down_revision = "2c94e7a0d6b3"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "operations",
+        sa.Column("id", sa.String(length=32), nullable=False),
+        sa.Column("created", sa.DateTime(), nullable=False),
+        sa.Column("updated", sa.DateTime(), nullable=False),
+        sa.Column("idempotency_key", sa.String(length=255), nullable=True),
+        sa.Column("kind", sa.String(length=32), nullable=False),
+        sa.Column("instance_name", sa.String(length=255), nullable=False),
+        sa.Column("request", sa.UnicodeText(), nullable=False),
+        sa.Column("status", sa.String(length=32), nullable=False),
+        sa.Column("response", sa.UnicodeText(), nullable=True),
+        sa.Column("error", sa.UnicodeText(), nullable=True),
+        sa.PrimaryKeyConstraint("id", name=op.f("pk_operations")),
+        sa.UniqueConstraint(
+            "idempotency_key", name=op.f("uq_operations_idempotency_key")
+        ),
+    )
+    with op.batch_alter_table("operations", schema=None) as batch_op:
+        batch_op.create_index(
+            batch_op.f("ix_operations_created"), ["created"], unique=False
+        )
+        batch_op.create_index(
+            batch_op.f("ix_operations_instance_name"), ["instance_name"], unique=False
+        )
+
+    op.create_table(
+        "operation_steps",
+        sa.Column("id", sa.String(length=32), nullable=False),
+        sa.Column("created", sa.DateTime(), nullable=False),
+        sa.Column("name", sa.String(length=255), nullable=False),
+        sa.Column("status", sa.String(length=32), nullable=False),
+        sa.Column("duration", sa.Float(), nullable=False),
+        sa.Column("result", sa.UnicodeText(), nullable=True),
+        sa.Column("error", sa.UnicodeText(), nullable=True),
+        sa.Column("operation_id", sa.String(length=32), nullable=False),
+        sa.ForeignKeyConstraint(
+            ["operation_id"],
+            ["operations.id"],
+            name=op.f("fk_operation_steps_operation_id_operations"),
+        ),
+        sa.PrimaryKeyConstraint("id", name=op.f("pk_operation_steps")),
+    )
+    with op.batch_alter_table("operation_steps", schema=None) as batch_op:
+        batch_op.create_index(
+            batch_op.f("ix_operation_steps_operation_id"),
+            ["operation_id"],
+            unique=False,
+        )
+
+
+def downgrade():
+    with op.batch_alter_table("operation_steps", schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f("ix_operation_steps_operation_id"))
+
+    op.drop_table("operation_steps")
+    with op.batch_alter_table("operations", schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f("ix_operations_instance_name"))
+        batch_op.drop_index(batch_op.f("ix_operations_created"))
+
+    op.drop_table("operations")
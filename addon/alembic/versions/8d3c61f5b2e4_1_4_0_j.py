@@ -0,0 +1,25 @@
+"""1.4.0 J
+
+Revision ID: 8d3c61f5b2e4
+Revises: 5b7d2e9c0a13
+Create Date: 2026-10-19 18:02:37.551204
+
+"""
+
+import sqlalchemy as sa
+from alembic import op
+
+revision = "8d3c61f5b2e4"
+down_revision = "5b7d2e9c0a13"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table("attachments", schema=None) as batch_op:
+        batch_op.add_column(sa.Column("conn_params", sa.UnicodeText(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table("attachments", schema=None) as batch_op:
+        batch_op.drop_column("conn_params")
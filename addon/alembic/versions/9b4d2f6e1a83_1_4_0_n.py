@@ -0,0 +1,29 @@
+"""1.4.0 N
+
+Revision ID: 9b4d2f6e1a83
+Revises: 7e1b5f3a9c24
+Create Date: 2026-10-19 22:04:41.905127
+
+"""
+
+import sqlalchemy as sa
+from alembic import op
+
+revision = "9b4d2f6e1a83"
+down_revision = "7e1b5f3a9c24"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table("instance_upgrades", schema=None) as batch_op:
+        batch_op.add_column(sa.Column("image", sa.String(length=255), nullable=True))
+        batch_op.add_column(sa.Column("jobs", sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column("api_key", sa.String(length=255), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table("instance_upgrades", schema=None) as batch_op:
+        batch_op.drop_column("api_key")
+        batch_op.drop_column("jobs")
+        batch_op.drop_column("image")
@@ -0,0 +1,29 @@
+"""1.4.0 D
+
+Revision ID: 9f14b6a2c803
+Revises: 3e9a07c4d215
+Create Date: 2026-10-19 11:32:06.518447
+
+"""
+
+import sqlalchemy as sa
+from alembic import op
+
+revision = "9f14b6a2c803"
+down_revision = "3e9a07c4d215"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table("instances", schema=None) as batch_op:
+        batch_op.add_column(sa.Column("max_query_seconds", sa.Integer(), nullable=True))
+        batch_op.add_column(
+            sa.Column("max_idle_in_transaction_seconds", sa.Integer(), nullable=True)
+        )
+
+
+def downgrade():
+    with op.batch_alter_table("instances", schema=None) as batch_op:
+        batch_op.drop_column("max_idle_in_transaction_seconds")
+        batch_op.drop_column("max_query_seconds")
@@ -0,0 +1,29 @@
+"""1.4.0 H
+
+Revision ID: a4f3e8d21c57
+Revises: e2a95b7c4f18
+Create Date: 2026-10-19 16:05:12.482671
+
+"""
+
+import sqlalchemy as sa
+from alembic import op
+
+revision = "a4f3e8d21c57"
+down_revision = "e2a95b7c4f18"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "metric_values",
+        sa.Column("name", sa.String(length=255), nullable=False),
+        sa.Column("labels", sa.String(length=1024), nullable=False),
+        sa.Column("value", sa.Float(), nullable=False),
+        sa.PrimaryKeyConstraint("name", "labels", name=op.f("pk_metric_values")),
+    )
+
+
+def downgrade():
+    op.drop_table("metric_values")
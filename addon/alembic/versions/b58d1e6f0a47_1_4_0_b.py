@@ -0,0 +1,39 @@
+"""1.4.0 B
+
+Revision ID: b58d1e6f0a47
+Revises: 7c2e4a9b1f30
+Create Date: 2026-10-19 10:03:17.846120
+
+"""
+
+import sqlalchemy as sa
+from alembic import op
+
+revision = "b58d1e6f0a47"
+down_revision = "7c2e4a9b1f30"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table("users", schema=None) as batch_op:
+        batch_op.add_column(sa.Column("connection_limit", sa.Integer(), nullable=True))
+        batch_op.add_column(
+            sa.Column("statement_timeout", sa.String(length=32), nullable=True)
+        )
+        batch_op.add_column(
+            sa.Column(
+                "idle_in_transaction_session_timeout",
+                sa.String(length=32),
+                nullable=True,
+            )
+        )
+        batch_op.add_column(sa.Column("work_mem", sa.String(length=32), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table("users", schema=None) as batch_op:
+        batch_op.drop_column("work_mem")
+        batch_op.drop_column("idle_in_transaction_session_timeout")
+        batch_op.drop_column("statement_timeout")
+        batch_op.drop_column("connection_limit")
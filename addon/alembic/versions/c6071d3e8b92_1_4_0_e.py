@@ -0,0 +1,49 @@
+"""1.4.0 E
+
+Revision ID: c6071d3e8b92
+Revises: 9f14b6a2c803
+Create Date: 2026-10-19 12:20:44.731958
+
+"""
+
+import sqlalchemy as sa
+from alembic import op
+
+revision = "c6071d3e8b92"
+down_revision = "9f14b6a2c803"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "maintenance_runs",
+        sa.Column("id", sa.String(length=32), nullable=False),
+        sa.Column("created", sa.DateTime(), nullable=False),
+        sa.Column("updated", sa.DateTime(), nullable=False),
+        sa.Column("db_name", sa.String(length=255), nullable=False),
+        sa.Column("operation", sa.String(length=32), nullable=False),
+        sa.Column("status", sa.String(length=32), nullable=False),
+        sa.Column("duration", sa.Float(), nullable=False),
+        sa.Column("error", sa.UnicodeText(), nullable=True),
+        sa.Column("instance_id", sa.String(length=32), nullable=False),
+        sa.ForeignKeyConstraint(
+            ["instance_id"],
+            ["instances.id"],
+            name=op.f("fk_maintenance_runs_instance_id_instances"),
+        ),
+        sa.PrimaryKeyConstraint("id", name=op.f("pk_maintenance_runs")),
+    )
+    with op.batch_alter_table("maintenance_runs", schema=None) as batch_op:
+        batch_op.create_index(
+            batch_op.f("ix_maintenance_runs_instance_id"),
+            ["instance_id"],
+            unique=False,
+        )
+
+
+def downgrade():
+    with op.batch_alter_table("maintenance_runs", schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f("ix_maintenance_runs_instance_id"))
+
+    op.drop_table("maintenance_runs")
@@ -0,0 +1,29 @@
+"""1.4.0 G
+
+Revision ID: e2a95b7c4f18
+Revises: 54d8c2f9e1a6
+Create Date: 2026-10-19 14:57:30.118205
+
+"""
+
+import sqlalchemy as sa
+from alembic import op
+
+revision = "e2a95b7c4f18"
+down_revision = "54d8c2f9e1a6"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table("instances", schema=None) as batch_op:
+        batch_op.add_column(sa.Column("cpus", sa.Float(), nullable=True))
+        batch_op.add_column(sa.Column("memory", sa.String(length=32), nullable=True))
+        batch_op.add_column(sa.Column("shm_size", sa.String(length=32), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table("instances", schema=None) as batch_op:
+        batch_op.drop_column("shm_size")
+        batch_op.drop_column("memory")
+        batch_op.drop_column("cpus")
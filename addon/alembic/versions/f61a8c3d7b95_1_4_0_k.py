@@ -0,0 +1,70 @@
+"""1.4.0 K
+
+Revision ID: f61a8c3d7b95
+Revises: 8d3c61f5b2e4
+Create Date: 2026-10-19 19:14:08.316472
+
+"""
+
+import sqlalchemy as sa
+from alembic import op
+
+revision = "f61a8c3d7b95"
+down_revision = "8d3c61f5b2e4"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "schemas",
+        sa.Column("id", sa.String(length=32), nullable=False),
+        sa.Column("created", sa.DateTime(), nullable=False),
+        sa.Column("updated", sa.DateTime(), nullable=False),
+        sa.Column("name", sa.String(length=255), nullable=False),
+        sa.Column("database_id", sa.String(length=32), nullable=False),
+        sa.ForeignKeyConstraint(
+            ["database_id"],
+            ["databases.id"],
+            name=op.f("fk_schemas_database_id_databases"),
+        ),
+        sa.PrimaryKeyConstraint("id", name=op.f("pk_schemas")),
+    )
+    with op.batch_alter_table("schemas", schema=None) as batch_op:
+        batch_op.create_index(
+            batch_op.f("ix_schemas_database_id"), ["database_id"], unique=False
+        )
+
+    with op.batch_alter_table("databases", schema=None) as batch_op:
+        batch_op.add_column(
+            sa.Column("shared", sa.Boolean(), server_default="0", nullable=False)
+        )
+
+    with op.batch_alter_table("users", schema=None) as batch_op:
+        batch_op.add_column(sa.Column("schema_id", sa.String(length=32), nullable=True))
+        batch_op.create_index(
+            batch_op.f("ix_users_schema_id"), ["schema_id"], unique=False
+        )
+        batch_op.create_foreign_key(
+            batch_op.f("fk_users_schema_id_schemas"),
+            "schemas",
+            ["schema_id"],
+            ["id"],
+        )
+
+
+def downgrade():
+    with op.batch_alter_table("users", schema=None) as batch_op:
+        batch_op.drop_constraint(
+            batch_op.f("fk_users_schema_id_schemas"), type_="foreignkey"
+        )
+        batch_op.drop_index(batch_op.f("ix_users_schema_id"))
+        batch_op.drop_column("schema_id")
+
+    with op.batch_alter_table("databases", schema=None) as batch_op:
+        batch_op.drop_column("shared")
+
+    with op.batch_alter_table("schemas", schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f("ix_schemas_database_id"))
+
+    op.drop_table("schemas")
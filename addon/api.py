@@ -1,17 +1,49 @@
 from fastapi import FastAPI
 
+from addon import metrics, timing
 from addon.endpoints import (
+    activity,
     addon,
     attachments,
+    backup,
     databases,
+    health,
+    indexes,
     instances,
+    maintenance,
+    moves,
+    operations,
+    profiles,
+    reconcile,
+    schemas,
+    statements,
     tunnels,
+    upgrades,
+)
+from addon.endpoints import (
+    metrics as metrics_endpoints,
 )
 
 app = FastAPI()
 
+app.add_middleware(metrics.MetricsMiddleware)
+app.add_middleware(timing.TimingMiddleware)
+
 app.include_router(addon.router)
 app.include_router(instances.router)
 app.include_router(databases.router)
 app.include_router(attachments.router)
 app.include_router(tunnels.router)
+app.include_router(statements.router)
+app.include_router(activity.router)
+app.include_router(maintenance.router)
+app.include_router(indexes.router)
+app.include_router(upgrades.router)
+app.include_router(moves.router)
+app.include_router(metrics_endpoints.router)
+app.include_router(profiles.router)
+app.include_router(backup.router)
+app.include_router(reconcile.router)
+app.include_router(health.router)
+app.include_router(schemas.router)
+app.include_router(operations.router)
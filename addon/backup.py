@@ -0,0 +1,400 @@
+import argparse
+import base64
+import hashlib
+import json
+import logging
+import os
+import re
+import secrets
+import sys
+from datetime import datetime, timezone
+from typing import Any, Iterable, Iterator
+from urllib.parse import parse_qsl
+
+from sqlalchemy import delete, insert, select
+from sqlalchemy.orm.session import Session as DBSession
+
+from addon import __version__, config, disco, misc, postgres, reconcile
+from addon.models import (
+    Attachment,
+    Database,
+    DatabaseSize,
+    Instance,
+    MaintenanceRun,
+    PoolDatabase,
+    Schema,
+    User,
+)
+from addon.models.db import Session
+from addon.models.meta import Base, DateTimeTzAware
+
+log = logging.getLogger(__name__)
+
+EXPORT_FORMAT = "disco-addon-postgres"
+
+# In dependency order, an import can insert each type as it is read.
+RECORD_TYPES: dict[str, type[Base]] = {
+    "instance": Instance,
+    "pool_database": PoolDatabase,
+    "database": Database,
+    "schema": Schema,
+    "user": User,
+    "attachment": Attachment,
+}
+
+BATCH_SIZE = 1000
+
+CONN_STR_RE = re.compile(
+    r"^postgresql://([^:@/]+):([^@/]+)@postgres-instance-([^/]+)-postgres/([^/?]+)"
+    r"(?:\?(.*))?$"
+)
+
+
+def export_lines(passphrase: str | None) -> Iterator[str]:
+    salt = secrets.token_bytes(16)
+    header: dict[str, Any] = {
+        "type": "header",
+        "format": EXPORT_FORMAT,
+        "version": __version__,
+        "exported": datetime.now(timezone.utc).isoformat(),
+        "encryption": None,
+    }
+    fernet = None
+    if passphrase is not None:
+        fernet = get_fernet(passphrase, salt)
+        header["encryption"] = {
+            "method": "fernet-scrypt",
+            "salt": base64.b64encode(salt).decode(),
+        }
+    yield json.dumps(header) + "\n"
+    with Session.begin() as dbsession:
+        for record_type, model in RECORD_TYPES.items():
+            stmt = select(model).execution_options(yield_per=BATCH_SIZE)
+            for obj in dbsession.scalars(stmt):
+                line = json.dumps({"type": record_type, **record_from_obj(obj)})
+                if fernet is not None:
+                    line = fernet.encrypt(line.encode()).decode()
+                yield line + "\n"
+
+
+def record_from_obj(obj: Base) -> dict[str, Any]:
+    record = {}
+    for column in obj.__table__.columns:
+        value = getattr(obj, column.key)
+        if isinstance(value, datetime):
+            value = value.isoformat()
+        record[column.key] = value
+    return record
+
+
+def obj_values_from_record(model: type[Base], record: dict[str, Any]):
+    values = {}
+    for column in model.__table__.columns:
+        if column.key not in record:
+            # exported by an older version, the column default applies
+            continue
+        value = record[column.key]
+        if value is not None and isinstance(column.type, DateTimeTzAware):
+            value = datetime.fromisoformat(value).astimezone(timezone.utc)
+        values[column.key] = value
+    return values
+
+
+def get_fernet(passphrase: str, salt: bytes):
+    # Only needed for encrypted exports.
+    from cryptography.fernet import Fernet
+
+    key = hashlib.scrypt(passphrase.encode(), salt=salt, n=2**14, r=8, p=1, dklen=32)
+    return Fernet(base64.urlsafe_b64encode(key))
+
+
+def read_records(lines: Iterable[str], passphrase: str | None) -> Iterator[dict]:
+    line_iter = iter(lines)
+    header = json.loads(next(line_iter))
+    if header.get("type") != "header" or header.get("format") != EXPORT_FORMAT:
+        raise Exception("Not an export of the Postgres addon")
+    fernet = None
+    if header["encryption"] is not None:
+        if passphrase is None:
+            raise Exception("Export is encrypted, a passphrase is required")
+        salt = base64.b64decode(header["encryption"]["salt"])
+        fernet = get_fernet(passphrase, salt)
+    for line in line_iter:
+        line = line.strip()
+        if len(line) == 0:
+            continue
+        if fernet is not None:
+            line = fernet.decrypt(line.encode()).decode()
+        yield json.loads(line)
+
+
+def import_records(records: Iterable[dict], replace: bool) -> dict[str, int]:
+    counts = {record_type: 0 for record_type in RECORD_TYPES}
+    with Session.begin() as dbsession:
+        prepare_storage(dbsession, replace=replace)
+        batch_type: str | None = None
+        batch: list[dict[str, Any]] = []
+        for record in records:
+            record_type = record["type"]
+            if record_type not in RECORD_TYPES:
+                raise Exception(f"Unknown record type {record_type}")
+            if record_type != batch_type or len(batch) >= BATCH_SIZE:
+                insert_batch(dbsession, batch_type, batch)
+                batch_type = record_type
+                batch = []
+            batch.append(obj_values_from_record(RECORD_TYPES[record_type], record))
+            counts[record_type] += 1
+        insert_batch(dbsession, batch_type, batch)
+    return counts
+
+
+def insert_batch(
+    dbsession: DBSession, record_type: str | None, batch: list[dict[str, Any]]
+) -> None:
+    if record_type is None or len(batch) == 0:
+        return
+    dbsession.execute(insert(RECORD_TYPES[record_type]), batch)
+
+
+def prepare_storage(dbsession: DBSession, replace: bool) -> None:
+    if replace:
+        log.info("Removing existing instances before import")
+        dbsession.execute(delete(MaintenanceRun))
+        dbsession.execute(delete(DatabaseSize))
+        for model in reversed(RECORD_TYPES.values()):
+            dbsession.execute(delete(model))
+        return
+    if dbsession.scalars(select(Instance).limit(1)).first() is not None:
+        raise Exception("Storage already has instances, use --replace to overwrite")
+
+
+def rebuild_records(api_key: str) -> Iterator[dict[str, Any]]:
+    # Without an export, instances come from the Disco projects (admin
+    # credentials are in their env), databases from each instance's
+    # catalog, and users and attachments from the connection strings set
+    # on other projects. Databases with schemas owned by <schema>_owner
+    # roles are shared, others are regular if a connection string points
+    # to them, or pool databases if empty. The pool size is the number of
+    # pool databases found. The image and other settings are not
+    # recoverable and get their defaults.
+    now = datetime.now(timezone.utc).isoformat()
+    project_names = disco.get_project_names(api_key=api_key)
+    env_by_project = {
+        project_name: disco.get_env_variables(project_name, api_key=api_key)
+        for project_name in project_names
+    }
+    conn_strs = [
+        (project_name, env_var, match.groups())
+        for project_name, env in env_by_project.items()
+        for env_var, value in env.items()
+        if (match := CONN_STR_RE.match(value)) is not None
+    ]
+    referenced = set(
+        (instance_name, db_name)
+        for _, _, (_, _, instance_name, db_name, _) in conn_strs
+    )
+    databases: dict[tuple[str, str], str] = {}
+    # schema name -> id, by database id
+    schemas: dict[str, dict[str, str]] = {}
+    # roles each role is a member of, by instance name
+    memberships: dict[str, dict[str, list[str]]] = {}
+    users: dict[tuple[str, str, str], str] = {}
+    instance_records = []
+    pool_database_records = []
+    database_records = []
+    schema_records = []
+    for project_name, env in env_by_project.items():
+        if not project_name.startswith("postgres-instance-"):
+            continue
+        if "POSTGRES_USER" not in env or "POSTGRES_PASSWORD" not in env:
+            continue
+        instance_name = misc.instance_name_from_project_name(project_name)
+        admin_conn_str = misc.conn_string(
+            user=env["POSTGRES_USER"],
+            password=env["POSTGRES_PASSWORD"],
+            postgres_project_name=project_name,
+            db_name=None,
+        )
+        try:
+            version = postgres.get_server_version(admin_conn_str)
+            live_databases, live_roles = postgres.get_catalog(admin_conn_str)
+            memberships[instance_name] = postgres.get_role_memberships(admin_conn_str)
+        except Exception:
+            log.exception("Could not read catalog of %s, skipping", instance_name)
+            continue
+        instance_id = secrets.token_hex(16)
+        pool_size = 0
+        for db_name in live_databases:
+            if reconcile.GENERATED_NAME.match(db_name) is None:
+                continue
+            if f"{db_name}_owner" not in live_roles:
+                continue
+            try:
+                contents = postgres.get_database_contents(admin_conn_str, db_name)
+            except Exception:
+                log.exception(
+                    "Could not read %s (%s), skipping", db_name, instance_name
+                )
+                continue
+            schema_names = [
+                schema_name
+                for schema_name in contents["schemas"]
+                if f"{schema_name}_owner" in live_roles
+            ]
+            shared = len(schema_names) > 0
+            if not shared and (instance_name, db_name) not in referenced:
+                if len(contents["schemas"]) > 0 or contents["relations"] > 0:
+                    log.warning(
+                        "%s (%s) is not attached and not empty, leaving it out",
+                        db_name,
+                        instance_name,
+                    )
+                    continue
+                pool_size += 1
+                pool_database_records.append(
+                    {
+                        "type": "pool_database",
+                        "id": secrets.token_hex(16),
+                        "created": now,
+                        "updated": now,
+                        "name": db_name,
+                        "instance_id": instance_id,
+                    }
+                )
+                continue
+            database_id = secrets.token_hex(16)
+            databases[(instance_name, db_name)] = database_id
+            database_records.append(
+                {
+                    "type": "database",
+                    "id": database_id,
+                    "created": now,
+                    "updated": now,
+                    "name": db_name,
+                    "shared": shared,
+                    "instance_id": instance_id,
+                }
+            )
+            schemas[database_id] = {}
+            for schema_name in schema_names:
+                schema_id = secrets.token_hex(16)
+                schemas[database_id][schema_name] = schema_id
+                schema_records.append(
+                    {
+                        "type": "schema",
+                        "id": schema_id,
+                        "created": now,
+                        "updated": now,
+                        "name": schema_name,
+                        "database_id": database_id,
+                    }
+                )
+        instance_records.append(
+            {
+                "type": "instance",
+                "id": instance_id,
+                "created": now,
+                "updated": now,
+                "name": instance_name,
+                "image": config.POSTGRES_IMAGE,
+                "version": version,
+                "admin_user": env["POSTGRES_USER"],
+                "admin_password": env["POSTGRES_PASSWORD"],
+                "pool_size": pool_size,
+                "stat_statements": False,
+            }
+        )
+    user_records = []
+    attachment_records = []
+    for project_name, env_var, groups in conn_strs:
+        user_name, password, instance_name, db_name, query = groups
+        user_database_id = databases.get((instance_name, db_name))
+        if user_database_id is None:
+            log.warning(
+                "%s of %s points to unknown database %s (%s)",
+                env_var,
+                project_name,
+                db_name,
+                instance_name,
+            )
+            continue
+        user_key = (instance_name, db_name, user_name)
+        if user_key not in users:
+            # schema users are members of their schema's owner role
+            schema_ids = [
+                schema_id
+                for schema_name, schema_id in schemas[user_database_id].items()
+                if f"{schema_name}_owner"
+                in memberships[instance_name].get(user_name, [])
+            ]
+            if len(schemas[user_database_id]) > 0 and len(schema_ids) != 1:
+                log.warning(
+                    "%s of %s uses shared database %s (%s) without a schema",
+                    env_var,
+                    project_name,
+                    db_name,
+                    instance_name,
+                )
+                continue
+            users[user_key] = secrets.token_hex(16)
+            user_records.append(
+                {
+                    "type": "user",
+                    "id": users[user_key],
+                    "created": now,
+                    "updated": now,
+                    "name": user_name,
+                    "password": password,
+                    "database_id": user_database_id,
+                    "schema_id": schema_ids[0] if len(schema_ids) > 0 else None,
+                }
+            )
+        attachment_records.append(
+            {
+                "type": "attachment",
+                "id": secrets.token_hex(16),
+                "created": now,
+                "updated": now,
+                "project_name": project_name,
+                "env_var": env_var,
+                "conn_params": json.dumps(dict(parse_qsl(query))) if query else None,
+                "user_id": users[user_key],
+            }
+        )
+    yield from instance_records
+    yield from pool_database_records
+    yield from database_records
+    yield from schema_records
+    yield from user_records
+    yield from attachment_records
+
+
+def import_main():
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(
+        description="Restore Postgres addon storage from an export, "
+        "or rebuild it from Disco and the live instances."
+    )
+    parser.add_argument("path", nargs="?", help="export file, - for stdin")
+    parser.add_argument("--rebuild", action="store_true")
+    parser.add_argument("--replace", action="store_true")
+    args = parser.parse_args()
+    if args.rebuild:
+        api_key = os.environ.get("DISCO_API_KEY")
+        if api_key is None:
+            parser.error("DISCO_API_KEY must be set to rebuild")
+        counts = import_records(rebuild_records(api_key), replace=args.replace)
+    else:
+        if args.path is None:
+            parser.error("path is required unless --rebuild is used")
+        passphrase = os.environ.get("ADDON_EXPORT_PASSPHRASE")
+        if args.path == "-":
+            counts = import_records(
+                read_records(sys.stdin, passphrase), replace=args.replace
+            )
+        else:
+            with open(args.path) as export_file:
+                counts = import_records(
+                    read_records(export_file, passphrase), replace=args.replace
+                )
+    log.info("Imported %s", counts)
@@ -8,13 +8,29 @@ log.info("Handling CGI request from Postgres addon")
 
 
 def main():
+    from addon import profiling
+
+    if profiling.requested():
+        profiling.run_profiled(handle_request)
+    else:
+        handle_request()
+
+
+def handle_request():
+    import time
+
+    start = time.perf_counter()
+
     from wsgiref.handlers import CGIHandler
 
     from a2wsgi import ASGIMiddleware
 
+    from addon import timing
     from addon.api import app
     from addon.exchandler import stderr_traceback_on_exception
 
+    timing.startup_duration = time.perf_counter() - start
+
     app.add_exception_handler(Exception, stderr_traceback_on_exception)
 
     wsgi_application = ASGIMiddleware(app)  # type: ignore
@@ -1,3 +1,41 @@
-SQLALCHEMY_DATABASE_URL = "sqlite:////addon/data/db.sqlite3"
+import os
+
+SQLALCHEMY_DATABASE_URL = os.environ.get(
+    "ADDON_DATABASE_URL", "sqlite:////addon/data/db.sqlite3"
+)
 POSTGRES_IMAGE = "postgres"
 POSTGRES_VERSION = "17.2"
+DATABASE_POOL_SIZE = 0
+CRON_LOCK_PATH = "/addon/data/cron.lock"
+MAINTENANCE_LOCK_PATH = "/addon/data/maintenance.lock"
+MAINTENANCE_WORKERS = 4
+MAINTENANCE_TIMEOUT_SECONDS = 1800
+MAINTENANCE_HISTORY_DAYS = 30
+AUTOVACUUM_MIN_LIVE_TUPLES = 1_000_000
+AUTOVACUUM_VACUUM_SCALE_FACTOR = 0.02
+AUTOVACUUM_ANALYZE_SCALE_FACTOR = 0.01
+INDEX_REPORT_CACHE_SECONDS = 300
+INDEX_REPORT_MIN_LIVE_TUPLES = 10_000
+UPGRADE_IMAGE = "tianon/postgres-upgrade"
+UPGRADE_TIMEOUT_SECONDS = 3600
+UPGRADE_LOCK_PATH = "/addon/data/upgrade.lock"
+READY_TIMEOUT_SECONDS = 300
+PROFILES_DIR = "/addon/data/profiles"
+PROFILES_MAX_BYTES = 50 * 1024 * 1024
+PLACEMENT_POLICY = "balanced"
+PLACEMENT_SAMPLE_MAX_AGE_SECONDS = 300
+MOVE_MAX_LAG_BYTES = 1024 * 1024
+MOVE_TIMEOUT_SECONDS = 3600
+MOVE_CUTOVER_TIMEOUT_SECONDS = 60
+MOVE_LOCK_PATH = "/addon/data/move.lock"
+DEPLOY_BACKUPS_DIR = "/addon/data/backups"
+DEPLOY_BACKUPS_KEEP = 3
+RECONCILE_GRACE_SECONDS = 600
+HEALTH_TIMEOUT_SECONDS = 10
+HEALTH_WORKERS = 16
+SHARED_DATABASE_MAX_SCHEMAS = 500
+SIZE_SAMPLE_SECONDS = 900
+SIZE_GROWTH_WINDOW_SECONDS = 24 * 3600
+SIZE_HISTORY_DAYS = 30
+OPERATION_STALE_SECONDS = 120
+OPERATION_HISTORY_DAYS = 14
@@ -0,0 +1,77 @@
+import fcntl
+import logging
+from typing import Callable
+
+logging.basicConfig(level=logging.INFO)
+
+log = logging.getLogger(__name__)
+
+
+log.info("Disco Postgres addon cron")
+
+
+def main():
+    from addon import config
+
+    run_locked(config.CRON_LOCK_PATH, run_jobs)
+    # Same lock as the nightly maintenance, both VACUUM and REINDEX
+    run_locked(config.MAINTENANCE_LOCK_PATH, run_queued_maintenance)
+    # Separate lock, an upgrade must not hold back the other jobs for an hour
+    run_locked(config.UPGRADE_LOCK_PATH, run_upgrades)
+    run_locked(config.MOVE_LOCK_PATH, run_moves)
+
+
+def maintenance():
+    from addon import config
+
+    run_locked(config.MAINTENANCE_LOCK_PATH, run_maintenance)
+
+
+def run_locked(lock_path: str, func: Callable[[], None]) -> None:
+    with open(lock_path, "w") as lock_file:
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            log.info("Previous run still in progress, skipping")
+            return
+        func()
+
+
+def run_jobs() -> None:
+    from addon import journal, placement, policies, pool, sizes
+
+    policies.enforce_termination_policies()
+    pool.refill_pools()
+    placement.record_all_samples()
+    sizes.record_all_instances()
+    journal.prune_operations()
+
+
+def run_upgrades() -> None:
+    from addon.endpoints import upgrades
+
+    upgrades.run_queued_upgrades()
+
+
+def run_moves() -> None:
+    from addon.endpoints import moves
+
+    moves.run_queued_moves()
+
+
+def run_queued_maintenance() -> None:
+    from addon import maintenance
+
+    maintenance.run_queued_maintenance()
+
+
+def run_maintenance() -> None:
+    from addon import maintenance, reconcile
+
+    maintenance.run_all_instances()
+    maintenance.prune_maintenance_runs()
+    reconcile.reconcile_all_instances()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,9 @@
 import logging
 import os.path
+import sqlite3
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
 
 logging.basicConfig(level=logging.INFO)
 
@@ -8,12 +12,105 @@ log = logging.getLogger(__name__)
 
 log.info("Disco Postgres addon deploy script")
 
+# Latest Alembic revision, update when adding a migration.
+ALEMBIC_HEAD = "6a2f9c4d8b17"
+
 
 def main():
-    if sqlite_db_exists():
-        upgrade()
-    else:
+    if not sqlite_db_exists():
         create_sqlite_db()
+        return
+    with timed_step("Version check"):
+        up_to_date = is_up_to_date()
+    if up_to_date:
+        log.info("Nothing to migrate for now")
+        return
+    with timed_step("Integrity check"):
+        check_integrity()
+    with timed_step("Backup"):
+        backup_sqlite_db()
+    with timed_step("Upgrade"):
+        upgrade()
+
+
+@contextmanager
+def timed_step(name: str):
+    start = time.perf_counter()
+    yield
+    log.info("%s took %.3fs", name, time.perf_counter() - start)
+
+
+def sqlite_path() -> str:
+    from addon import config
+
+    return config.SQLALCHEMY_DATABASE_URL.removeprefix("sqlite:///")
+
+
+def is_up_to_date() -> bool:
+    # Reads the version with the sqlite3 module so that deployments that
+    # don't migrate never import SQLAlchemy or Alembic.
+    import addon
+
+    conn = sqlite3.connect(f"file:{sqlite_path()}?mode=ro", uri=True)
+    try:
+        row = conn.execute(
+            "SELECT value FROM key_values WHERE key = 'ADDON_VERSION'"
+        ).fetchone()
+        installed_version = None if row is None else row[0]
+        row = conn.execute("SELECT version_num FROM alembic_version").fetchone()
+        revision = None if row is None else row[0]
+    except sqlite3.Error:
+        log.exception("Could not read installed version")
+        return False
+    finally:
+        conn.close()
+    log.info("Installed version %s, revision %s", installed_version, revision)
+    return installed_version == addon.__version__ and revision == ALEMBIC_HEAD
+
+
+def check_integrity() -> None:
+    conn = sqlite3.connect(sqlite_path())
+    try:
+        # integrity_check also verifies that every index matches its table.
+        problems = [row[0] for row in conn.execute("PRAGMA integrity_check")]
+        foreign_key_problems = conn.execute("PRAGMA foreign_key_check").fetchall()
+    finally:
+        conn.close()
+    if problems != ["ok"]:
+        raise Exception(f"SQLite integrity check failed: {problems[:20]}")
+    if len(foreign_key_problems) > 0:
+        log.warning(
+            "SQLite foreign key check found %d problem(s): %s",
+            len(foreign_key_problems),
+            foreign_key_problems[:20],
+        )
+
+
+def backup_sqlite_db() -> None:
+    import addon
+    from addon import config
+
+    os.makedirs(config.DEPLOY_BACKUPS_DIR, exist_ok=True)
+    timestamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+    backup_path = os.path.join(
+        config.DEPLOY_BACKUPS_DIR, f"db-{timestamp}-before-{addon.__version__}.sqlite3"
+    )
+    source = sqlite3.connect(sqlite_path())
+    target = sqlite3.connect(backup_path)
+    try:
+        source.backup(target)
+    finally:
+        target.close()
+        source.close()
+    log.info("Backed up SQLite database to %s", backup_path)
+    backups = sorted(
+        file_name
+        for file_name in os.listdir(config.DEPLOY_BACKUPS_DIR)
+        if file_name.startswith("db-") and file_name.endswith(".sqlite3")
+    )
+    for file_name in backups[: -config.DEPLOY_BACKUPS_KEEP]:
+        log.info("Removing old backup %s", file_name)
+        os.remove(os.path.join(config.DEPLOY_BACKUPS_DIR, file_name))
 
 
 def upgrade() -> None:
@@ -27,7 +124,8 @@ def upgrade() -> None:
     with Session.begin() as dbsession:
         installed_version = keyvalues.get_value(dbsession, key="ADDON_VERSION")
     if installed_version == addon.__version__:
-        log.info("Nothing to migrate for now")
+        log.info("Version up to date, applying pending migrations")
+        alembic_upgrade(ALEMBIC_HEAD)
         return
     log.info("Upgrading addon")
     if installed_version == "1.0.0":
@@ -39,8 +137,14 @@ def upgrade() -> None:
         installed_version = "1.1.0"
     if installed_version == "1.1.0":
         log.info("1.1.0 to 1.2.0")
+        installed_version = "1.2.0"
     if installed_version == "1.2.0":
         log.info("1.2.0 to 1.3.0")
+        installed_version = "1.3.0"
+    if installed_version == "1.3.0":
+        log.info("1.3.0 to 1.4.0")
+        alembic_upgrade(ALEMBIC_HEAD)
+        installed_version = "1.4.0"
     with Session.begin() as dbsession:
         keyvalues.set_value(dbsession, key="ADDON_VERSION", value=addon.__version__)
     log.info("Done upgrading addon")
@@ -64,7 +168,7 @@ def create_sqlite_db() -> None:
 
 
 def sqlite_db_exists() -> bool:
-    return os.path.exists("/addon/data/db.sqlite3")
+    return os.path.exists(sqlite_path())
 
 
 def alembic_upgrade(version_hash: str) -> None:
@@ -72,7 +176,8 @@ def alembic_upgrade(version_hash: str) -> None:
     from alembic.config import Config
 
     config = Config("/code/alembic.ini")
-    command.upgrade(config, version_hash)
+    with timed_step(f"Migration to {version_hash}"):
+        command.upgrade(config, version_hash)
 
 
 if __name__ == "__main__":
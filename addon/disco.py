@@ -4,11 +4,16 @@ from typing import Any
 
 import requests
 
-from addon import misc
+from addon import misc, timing
 
 log = logging.getLogger(__name__)
 
 
+def record_status_code(response: requests.Response, *args, **kwargs) -> None:
+    timing.record_status(str(response.status_code))
+
+
+@timing.timed("disco")
 def create_postgres_project(api_key: str) -> str:
     log.info("Creating Postgres project")
     assert api_key is not None
@@ -22,6 +27,7 @@ def create_postgres_project(api_key: str) -> str:
         auth=(api_key, ""),
         headers={"Accept": "application/json"},
         timeout=10,
+        hooks={"response": record_status_code},
     )
     misc.assert_status_code(response, 201)
     project_name = response.json()["project"]["name"]
@@ -29,6 +35,7 @@ def create_postgres_project(api_key: str) -> str:
     return project_name
 
 
+@timing.timed("disco")
 def remove_project(project_name: str, api_key: str) -> None:
     log.info("Removing Postgres project %s", project_name)
     assert api_key is not None
@@ -37,10 +44,12 @@ def remove_project(project_name: str, api_key: str) -> None:
         auth=(api_key, ""),
         headers={"Accept": "application/json"},
         timeout=10,
+        hooks={"response": record_status_code},
     )
     misc.assert_status_code(response, 200)
 
 
+@timing.timed("disco")
 def init_postgres_env_variables(
     postgres_project_name: str, admin_user: str, admin_password: str, api_key: str
 ) -> None:
@@ -69,6 +78,7 @@ def init_postgres_env_variables(
         auth=(api_key, ""),
         headers={"Accept": "application/json"},
         timeout=10,
+        hooks={"response": record_status_code},
     )
     misc.assert_status_code(response, 200)
 
@@ -88,13 +98,99 @@ POSTGRES_DISCO_FILE = {
 
 
 def deploy_postgres_project(
-    postgres_project_name: str, image: str, version: str, api_key: str
+    postgres_project_name: str,
+    image: str,
+    version: str,
+    shared_preload_libraries: list[str],
+    cpus: float | None,
+    memory: str | None,
+    shm_size: str | None,
+    api_key: str,
 ) -> int:
     log.info("Deploying Postgres %s (%s)", postgres_project_name, version)
-    assert api_key is not None
-    url = f"http://disco/api/projects/{postgres_project_name}/deployments"
+    disco_file = postgres_disco_file(
+        image=image,
+        version=version,
+        shared_preload_libraries=shared_preload_libraries,
+        cpus=cpus,
+        memory=memory,
+        shm_size=shm_size,
+    )
+    return deploy_disco_file(
+        project_name=postgres_project_name, disco_file=disco_file, api_key=api_key
+    )
+
+
+def deploy_postgres_upgrade(
+    postgres_project_name: str,
+    image: str,
+    version: str,
+    upgrade_image: str,
+    upgrade_command: str,
+    shared_preload_libraries: list[str],
+    cpus: float | None,
+    memory: str | None,
+    shm_size: str | None,
+    api_key: str,
+) -> int:
+    log.info(
+        "Deploying Postgres %s (%s) with pg_upgrade hook %s",
+        postgres_project_name,
+        version,
+        upgrade_image,
+    )
+    disco_file = postgres_disco_file(
+        image=image,
+        version=version,
+        shared_preload_libraries=shared_preload_libraries,
+        cpus=cpus,
+        memory=memory,
+        shm_size=shm_size,
+    )
+    disco_file["services"]["hook:deploy:start:before"] = {
+        "type": "command",
+        "image": upgrade_image,
+        "command": upgrade_command,
+        "volumes": copy.deepcopy(disco_file["services"]["postgres"]["volumes"]),
+    }
+    return deploy_disco_file(
+        project_name=postgres_project_name, disco_file=disco_file, api_key=api_key
+    )
+
+
+def postgres_disco_file(
+    image: str,
+    version: str,
+    shared_preload_libraries: list[str],
+    cpus: float | None,
+    memory: str | None,
+    shm_size: str | None,
+) -> dict[str, Any]:
     disco_file: dict[str, Any] = copy.deepcopy(POSTGRES_DISCO_FILE)
-    disco_file["services"]["postgres"]["image"] = f"{image}:{version}"
+    service = disco_file["services"]["postgres"]
+    service["image"] = f"{image}:{version}"
+    if len(shared_preload_libraries) > 0:
+        service["command"] = (
+            f"postgres -c shared_preload_libraries={','.join(shared_preload_libraries)}"
+        )
+    limits: dict[str, Any] = {}
+    if cpus is not None:
+        limits["cpus"] = cpus
+    if memory is not None:
+        limits["memory"] = memory
+    if len(limits) > 0:
+        service["resources"] = {"limits": limits}
+    if shm_size is not None:
+        service["shmSize"] = shm_size
+    return disco_file
+
+
+@timing.timed("disco")
+def deploy_disco_file(
+    project_name: str, disco_file: dict[str, Any], api_key: str
+) -> int:
+    assert api_key is not None
+    url = f"http://disco/api/projects/{project_name}/deployments"
     req_body = {
         "discoFile": disco_file,
     }
@@ -104,12 +200,81 @@ def deploy_postgres_project(
         auth=(api_key, ""),
         headers={"Accept": "application/json"},
         timeout=10,
+        hooks={"response": record_status_code},
     )
     misc.assert_status_code(response, 201)
     resp_body = response.json()
     return resp_body["deployment"]["number"]
 
 
+@timing.timed("disco")
+def get_deployment_status(
+    project_name: str, deployment_number: int, api_key: str
+) -> str:
+    assert api_key is not None
+    url = f"http://disco/api/projects/{project_name}/deployments/{deployment_number}"
+    response = requests.get(
+        url,
+        auth=(api_key, ""),
+        headers={"Accept": "application/json"},
+        timeout=10,
+        hooks={"response": record_status_code},
+    )
+    misc.assert_status_code(response, 200)
+    return response.json()["deployment"]["status"]
+
+
+@timing.timed("disco")
+def scale_service(
+    project_name: str, service_name: str, scale: int, api_key: str
+) -> None:
+    log.info("Scaling %s of %s to %d", service_name, project_name, scale)
+    assert api_key is not None
+    url = f"http://disco/api/projects/{project_name}/scale"
+    req_body = {
+        "services": {
+            service_name: scale,
+        },
+    }
+    response = requests.post(
+        url,
+        json=req_body,
+        auth=(api_key, ""),
+        headers={"Accept": "application/json"},
+        timeout=10,
+        hooks={"response": record_status_code},
+    )
+    misc.assert_status_code(response, 200)
+
+
+@timing.timed("disco")
+def set_env_variables(
+    project_name: str, env_variables: dict[str, str], api_key: str
+) -> None:
+    log.info("Setting env variables %s for %s", list(env_variables), project_name)
+    assert api_key is not None
+    url = f"http://disco/api/projects/{project_name}/env"
+    req_body = dict(
+        envVariables=[
+            {
+                "name": name,
+                "value": value,
+            }
+            for name, value in env_variables.items()
+        ],
+    )
+    response = requests.post(
+        url,
+        json=req_body,
+        auth=(api_key, ""),
+        headers={"Accept": "application/json"},
+        timeout=10,
+        hooks={"response": record_status_code},
+    )
+    misc.assert_status_code(response, 200)
+
+
+@timing.timed("disco")
 def project_exists(project_name: str, api_key: str):
     assert api_key is not None
     response = requests.get(
@@ -117,11 +282,44 @@ def project_exists(project_name: str, api_key: str):
         auth=(api_key, ""),
         headers={"Accept": "application/json"},
         timeout=10,
+        hooks={"response": record_status_code},
     )
     misc.assert_status_code(response, 200)
     return project_name in [project["name"] for project in response.json()["projects"]]
 
 
+@timing.timed("disco")
+def get_project_names(api_key: str) -> list[str]:
+    assert api_key is not None
+    response = requests.get(
+        "http://disco/api/projects",
+        auth=(api_key, ""),
+        headers={"Accept": "application/json"},
+        timeout=10,
+        hooks={"response": record_status_code},
+    )
+    misc.assert_status_code(response, 200)
+    return [project["name"] for project in response.json()["projects"]]
+
+
+@timing.timed("disco")
+def get_env_variables(project_name: str, api_key: str) -> dict[str, str]:
+    assert api_key is not None
+    response = requests.get(
+        f"http://disco/api/projects/{project_name}/env",
+        auth=(api_key, ""),
+        headers={"Accept": "application/json"},
+        timeout=10,
+        hooks={"response": record_status_code},
+    )
+    misc.assert_status_code(response, 200)
+    return {
+        env_variable["name"]: env_variable["value"]
+        for env_variable in response.json()["envVariables"]
+    }
+
+
+@timing.timed("disco")
 def set_conn_str_env_var(
     project_name: str,
     var_name: str,
@@ -145,6 +343,44 @@ def set_conn_str_env_var(
         auth=(api_key, ""),
         headers={"Accept": "application/json"},
         timeout=10,
+        hooks={"response": record_status_code},
+    )
+    misc.assert_status_code(response, 200)
+    resp_body = response.json()
+    if resp_body["deployment"] is None:
+        return None
+    return resp_body["deployment"]["number"]
+
+
+@timing.timed("disco")
+def set_conn_str_env_vars(
+    project_name: str,
+    conn_strs: dict[str, str],
+    api_key: str,
+) -> int | None:
+    log.info(
+        "Setting connection string env variables %s for %s",
+        list(conn_strs),
+        project_name,
+    )
+    assert api_key is not None
+    url = f"http://disco/api/projects/{project_name}/env"
+    req_body = dict(
+        envVariables=[
+            {
+                "name": var_name,
+                "value": conn_str,
+            }
+            for var_name, conn_str in conn_strs.items()
+        ],
+    )
+    response = requests.post(
+        url,
+        json=req_body,
+        auth=(api_key, ""),
+        headers={"Accept": "application/json"},
+        timeout=10,
+        hooks={"response": record_status_code},
     )
     misc.assert_status_code(response, 200)
     resp_body = response.json()
@@ -153,6 +389,7 @@ def set_conn_str_env_var(
     return resp_body["deployment"]["number"]
 
 
+@timing.timed("disco")
 def get_conn_str_env_var(
     project_name: str,
     var_name: str,
@@ -166,12 +403,14 @@ def get_conn_str_env_var(
         auth=(api_key, ""),
         headers={"Accept": "application/json"},
         timeout=10,
+        hooks={"response": record_status_code},
     )
     if response.status_code == 404:
         return None
     return response.json()["envVariable"]["value"]
 
 
+@timing.timed("disco")
 def unset_conn_str_env_var(
     project_name: str,
     var_name: str,
@@ -187,6 +426,7 @@ def unset_conn_str_env_var(
         auth=(api_key, ""),
         headers={"Accept": "application/json"},
         timeout=10,
+        hooks={"response": record_status_code},
     )
     misc.assert_status_code(response, 200)
     resp_body = response.json()
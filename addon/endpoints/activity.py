@@ -0,0 +1,131 @@
+import logging
+from typing import Annotated
+
+from fastapi import APIRouter, HTTPException, Path
+from pydantic import BaseModel, Field
+
+from addon import postgres, storage
+from addon.models.db import Session
+
+log = logging.getLogger(__name__)
+
+router = APIRouter()
+
+
+@router.get("/instances/{instance_name}/activity")
+def activity_get(
+    instance_name: Annotated[str, Path()],
+):
+    with Session.begin() as dbsession:
+        instance = storage.get_instance_by_name(dbsession, instance_name)
+        if instance is None:
+            raise HTTPException(
+                status_code=404, detail=f"Instance {instance_name} not found"
+            )
+        admin_user = instance.admin_user
+        db_names = set(database.name for database in instance.databases)
+        attachments_by_user_name = {
+            user_name: [
+                {"project": attachment.project_name, "envVar": attachment.env_var}
+                for attachment in attachments
+            ]
+            for user_name, attachments in storage.get_attachments_by_user_name(
+                dbsession, instance
+            ).items()
+        }
+    admin_conn_str = storage.get_admin_conn_str(instance_name)
+    assert admin_conn_str is not None
+    backends = postgres.get_activity(admin_conn_str)
+    return {
+        "backends": [
+            {
+                "pid": backend["pid"],
+                "database": backend["db_name"],
+                "managedDatabase": backend["db_name"] in db_names,
+                "user": backend["user_name"],
+                "superUser": backend["user_name"] == admin_user,
+                "attachments": attachments_by_user_name.get(backend["user_name"], []),
+                "applicationName": backend["application_name"],
+                "clientAddr": backend["client_addr"],
+                "state": backend["state"],
+                "waitEventType": backend["wait_event_type"],
+                "waitEvent": backend["wait_event"],
+                "backendStart": isoformat(backend["backend_start"]),
+                "transactionStart": isoformat(backend["xact_start"]),
+                "queryStart": isoformat(backend["query_start"]),
+                "stateChange": isoformat(backend["state_change"]),
+                "querySeconds": backend["query_seconds"],
+                "transactionSeconds": backend["transaction_seconds"],
+                "query": backend["query"],
+                "blockedBy": backend["blocked_by"],
+                "locks": backend["locks"],
+            }
+            for backend in backends
+        ]
+    }
+
+
+def isoformat(value) -> str | None:
+    if value is None:
+        return None
+    return value.isoformat()
+
+
+@router.post("/instances/{instance_name}/activity/{pid}/cancel")
+def activity_cancel_post(
+    instance_name: Annotated[str, Path()],
+    pid: Annotated[int, Path()],
+):
+    admin_conn_str = get_admin_conn_str_or_404(instance_name)
+    if not postgres.cancel_backend(admin_conn_str=admin_conn_str, pid=pid):
+        raise HTTPException(status_code=404, detail=f"Backend {pid} not found")
+    return {}
+
+
+@router.post("/instances/{instance_name}/activity/{pid}/terminate")
+def activity_terminate_post(
+    instance_name: Annotated[str, Path()],
+    pid: Annotated[int, Path()],
+):
+    admin_conn_str = get_admin_conn_str_or_404(instance_name)
+    if not postgres.terminate_backend(admin_conn_str=admin_conn_str, pid=pid):
+        raise HTTPException(status_code=404, detail=f"Backend {pid} not found")
+    return {}
+
+
+def get_admin_conn_str_or_404(instance_name: str) -> str:
+    with Session.begin() as dbsession:
+        instance = storage.get_instance_by_name(dbsession, instance_name)
+        if instance is None:
+            raise HTTPException(
+                status_code=404, detail=f"Instance {instance_name} not found"
+            )
+    admin_conn_str = storage.get_admin_conn_str(instance_name)
+    assert admin_conn_str is not None
+    return admin_conn_str
+
+
+class TerminationPolicyReqBody(BaseModel):
+    max_query_seconds: int | None = Field(None, ge=1, alias="maxQuerySeconds")
+    max_idle_in_transaction_seconds: int | None = Field(
+        None, ge=1, alias="maxIdleInTransactionSeconds"
+    )
+
+
+@router.post("/instances/{instance_name}/activity/policy")
+def activity_policy_post(
+    instance_name: Annotated[str, Path()],
+    req_body: TerminationPolicyReqBody,
+):
+    with Session.begin() as dbsession:
+        instance = storage.get_instance_by_name(dbsession, instance_name)
+        if instance is None:
+            raise HTTPException(
+                status_code=404, detail=f"Instance {instance_name} not found"
+            )
+    storage.set_termination_policy(
+        instance_name=instance_name,
+        max_query_seconds=req_body.max_query_seconds,
+        max_idle_in_transaction_seconds=req_body.max_idle_in_transaction_seconds,
+    )
+    return {"policy": req_body.model_dump(by_alias=True)}
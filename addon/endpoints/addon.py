@@ -1,48 +1,32 @@
 from fastapi import APIRouter
+from fastapi.responses import StreamingResponse
 
 from addon import keyvalues, storage
+from addon.endpoints.instances import (
+    INVENTORY_MEDIA_TYPES,
+    InventoryFormat,
+    instance_dict,
+    stream_inventory,
+)
 from addon.models.db import Session
 
 router = APIRouter()
 
 
 @router.get("/addon")
-def addon_get():
+def addon_get(stream: InventoryFormat | None = None):
+    with Session.begin() as dbsession:
+        addon = {
+            "version": keyvalues.get_value(dbsession, key="ADDON_VERSION"),
+        }
+    if stream is not None:
+        return StreamingResponse(
+            stream_inventory(stream, header={"addon": addon}),
+            media_type=INVENTORY_MEDIA_TYPES[stream],
+        )
     with Session.begin() as dbsession:
         instances = storage.get_instances(dbsession)
         return {
-            "addon": {
-                "version": keyvalues.get_value(dbsession, key="ADDON_VERSION"),
-            },
-            "instances": [
-                {
-                    "created": instance.created.isoformat(),
-                    "name": instance.name,
-                    "image": instance.image,
-                    "version": instance.version,
-                    "databases": [
-                        {
-                            "created": database.created.isoformat(),
-                            "name": database.name,
-                            "users": [
-                                {
-                                    "created": user.created.isoformat(),
-                                    "name": user.name,
-                                    "attachments": [
-                                        {
-                                            "created": attachment.created.isoformat(),
-                                            "project": attachment.project_name,
-                                            "envVar": attachment.env_var,
-                                        }
-                                        for attachment in user.attachments
-                                    ],
-                                }
-                                for user in database.users
-                            ],
-                        }
-                        for database in instance.databases
-                    ],
-                }
-                for instance in instances
-            ],
+            "addon": addon,
+            "instances": [instance_dict(instance) for instance in instances],
         }
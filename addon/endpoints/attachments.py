@@ -1,12 +1,13 @@
 import logging
-from dataclasses import dataclass
-from typing import Annotated
+from dataclasses import asdict, dataclass
+from typing import Annotated, Any, Literal
 
-from fastapi import APIRouter, Depends, HTTPException, Path
-from pydantic import BaseModel, Field
+from fastapi import APIRouter, Depends, Header, HTTPException, Path
+from pydantic import BaseModel, ConfigDict, Field
 
-from addon import disco, misc, postgres, storage
+from addon import disco, journal, misc, postgres, storage
 from addon.context import get_api_key
+from addon.models import Attachment, User
 from addon.models.db import Session
 
 log = logging.getLogger(__name__)
@@ -14,11 +15,75 @@ log = logging.getLogger(__name__)
 router = APIRouter()
 
 
+class UserLimits(BaseModel):
+    model_config = ConfigDict(populate_by_name=True)
+
+    connection_limit: int | None = Field(None, ge=-1, le=10000, alias="connectionLimit")
+    statement_timeout: str | None = Field(
+        None, pattern=r"^[0-9]+(us|ms|s|min|h|d)?$", alias="statementTimeout"
+    )
+    idle_in_transaction_session_timeout: str | None = Field(
+        None,
+        pattern=r"^[0-9]+(us|ms|s|min|h|d)?$",
+        alias="idleInTransactionSessionTimeout",
+    )
+    work_mem: str | None = Field(
+        None, pattern=r"^[0-9]+(B|kB|MB|GB|TB)?$", alias="workMem"
+    )
+
+
+class ConnParams(BaseModel):
+    model_config = ConfigDict(populate_by_name=True)
+
+    connect_timeout: int | None = Field(None, ge=0, le=3600, alias="connectTimeout")
+    keepalives: bool | None = None
+    keepalives_idle: int | None = Field(None, ge=0, le=86400, alias="keepalivesIdle")
+    keepalives_interval: int | None = Field(
+        None, ge=0, le=86400, alias="keepalivesInterval"
+    )
+    keepalives_count: int | None = Field(None, ge=0, le=1000, alias="keepalivesCount")
+    application_name: str | None = Field(
+        None, pattern=r"^[a-zA-Z0-9_\-\.]+$", max_length=63, alias="applicationName"
+    )
+    sslmode: (
+        Literal["disable", "allow", "prefer", "require", "verify-ca", "verify-full"]
+        | None
+    ) = Field(None, alias="sslMode")
+    sslcompression: bool | None = Field(None, alias="sslCompression")
+    statement_timeout: str | None = Field(
+        None, pattern=r"^[0-9]+(us|ms|s|min|h|d)?$", alias="statementTimeout"
+    )
+    target_session_attrs: (
+        Literal[
+            "any", "read-write", "read-only", "primary", "standby", "prefer-standby"
+        ]
+        | None
+    ) = Field(None, alias="targetSessionAttrs")
+
+
+def libpq_conn_params(params: ConnParams) -> dict[str, str] | None:
+    conn_params: dict[str, str] = {}
+    for key, value in params.model_dump(exclude_none=True).items():
+        if key == "statement_timeout":
+            # not a libpq keyword, passed to the server as a startup option
+            conn_params["options"] = f"-c statement_timeout={value}"
+        elif isinstance(value, bool):
+            conn_params[key] = "1" if value else "0"
+        else:
+            conn_params[key] = str(value)
+    if len(conn_params) == 0:
+        return None
+    return conn_params
+
+
 class AttachDatabaseReqBody(BaseModel):
     project: str = Field(..., pattern=r"^[a-z][a-z0-9\-]*$", max_length=255)
     env_var: str = Field(
         ..., pattern=r"^[a-zA-Z_]+[a-zA-Z0-9_]*$", max_length=255, alias="envVar"
     )
+    limits: UserLimits | None = None
+    params: ConnParams | None = None
+    share_role: bool = Field(False, alias="shareRole")
 
 
 @router.post("/instances/{instance_name}/databases/{db_name}/attach")
@@ -27,7 +92,38 @@ def attach_post(
     db_name: Annotated[str, Path()],
     req_body: AttachDatabaseReqBody,
     api_key: Annotated[str, Depends(get_api_key)],
+    idempotency_key: Annotated[str | None, Header(max_length=255)] = None,
 ):
+    operation = journal.begin(
+        kind="attach",
+        instance_name=instance_name,
+        request={
+            "database": db_name,
+            "schema": None,
+            **req_body.model_dump(mode="json", by_alias=True),
+        },
+        idempotency_key=idempotency_key,
+    )
+    return operation.run(
+        lambda: attach(
+            instance_name=instance_name,
+            db_name=db_name,
+            schema_name=None,
+            req_body=req_body,
+            operation=operation,
+            api_key=api_key,
+        )
+    )
+
+
+def attach(
+    instance_name: str,
+    db_name: str,
+    schema_name: str | None,
+    req_body: AttachDatabaseReqBody,
+    operation: journal.Journal,
+    api_key: str,
+) -> dict[str, Any]:
     if not disco.project_exists(req_body.project, api_key=api_key):
         raise HTTPException(
             status_code=404, detail=f"Project {req_body.project} not found"
@@ -44,23 +140,53 @@ def attach_post(
                 status_code=404,
                 detail=f"Database {db_name} not found in {instance_name}",
             )
-        existing_conn_str: str | None = None
+        existing_user: tuple[str, str] | None = None
+        existing_attachment_id: str | None = None
+        existing_conn_params: dict[str, str] | None = None
+        existing_user_limits: UserLimits | None = None
+        existing_user_name: str | None = None
+        shared_user: tuple[str, str] | None = None
         for database in instance.databases:
             if database.name != db_name:
                 continue
+            if database.quota_blocked:
+                raise HTTPException(
+                    status_code=422,
+                    detail=f"Database {db_name} is over its hard quota",
+                )
+            if database.shared and schema_name is None:
+                raise HTTPException(
+                    status_code=422,
+                    detail=f"Database {db_name} is shared, attach one of its schemas",
+                )
             for user in database.users:
+                user_schema_name = user.schema.name if user.schema is not None else None
+                if user_schema_name != schema_name:
+                    continue
                 for attachment in user.attachments:
+                    if (
+                        req_body.share_role
+                        and attachment.project_name == req_body.project
+                    ):
+                        shared_user = (user.name, user.password)
                     if (
                         attachment.project_name == req_body.project
                         and attachment.env_var == req_body.env_var
                     ):
-                        existing_conn_str = misc.conn_string(
-                            user=user.name,
-                            password=user.password,
-                            postgres_project_name=postgres_project_name,
-                            db_name=db_name,
+                        existing_user = (user.name, user.password)
+                        existing_attachment_id = attachment.id
+                        existing_conn_params = misc.load_conn_params(
+                            attachment.conn_params
                         )
-    if existing_conn_str is not None:
+                        existing_user_name = user.name
+                        existing_user_limits = user_limits_from_user(user)
+    conn_params = (
+        libpq_conn_params(req_body.params) if req_body.params is not None else None
+    )
+    if existing_user is not None:
+        assert existing_attachment_id is not None
+        assert existing_user_name is not None
+        assert existing_user_limits is not None
         log.info(
             "%s (%s) was already attached to %s as %s, setting env var again",
             db_name,
@@ -68,11 +194,48 @@ def attach_post(
             req_body.project,
             req_body.env_var,
         )
-        deployment_number = disco.set_conn_str_env_var(
-            project_name=req_body.project,
-            var_name=req_body.env_var,
-            conn_str=existing_conn_str,
-            api_key=api_key,
+        if req_body.limits is not None:
+            existing_user_limits = req_body.limits
+            operation.step(
+                "store_limits",
+                lambda: store_user_limits(
+                    instance_name=instance_name,
+                    db_name=db_name,
+                    user_name=existing_user_name,
+                    limits=existing_user_limits,
+                ),
+            )
+        operation.step(
+            "apply_limits",
+            lambda: apply_user_limits(
+                instance_name=instance_name,
+                user_name=existing_user_name,
+                limits=existing_user_limits,
+            ),
+        )
+        if req_body.params is not None:
+            existing_conn_params = conn_params
+            operation.step(
+                "store_params",
+                lambda: storage.set_attachment_conn_params(
+                    attachment_ids=[existing_attachment_id],
+                    conn_params=existing_conn_params,
+                ),
+            )
+        deployment_number = operation.step(
+            "set_env_var",
+            lambda: disco.set_conn_str_env_var(
+                project_name=req_body.project,
+                var_name=req_body.env_var,
+                conn_str=misc.conn_string(
+                    user=existing_user[0],
+                    password=existing_user[1],
+                    postgres_project_name=postgres_project_name,
+                    db_name=db_name,
+                    params=existing_conn_params,
+                ),
+                api_key=api_key,
+            ),
         )
         return {
             "deployment": {"number": deployment_number}
@@ -86,47 +249,262 @@ def attach_post(
         req_body.project,
         req_body.env_var,
     )
+    if shared_user is not None:
+        user_name, password = shared_user
+        log.info("Sharing existing user %s with %s", user_name, req_body.env_var)
+    else:
+        # generated inside the step, a resumed attempt reuses the same role
+        credentials = operation.step(
+            "create_role",
+            lambda: create_role(
+                instance_name=instance_name,
+                db_name=db_name,
+                schema_name=schema_name,
+            ),
+        )
+        user_name = credentials["user"]
+        password = credentials["password"]
+        operation.step(
+            "store_user",
+            lambda: storage.add_user(
+                instance_name=instance_name,
+                db_name=db_name,
+                user_name=user_name,
+                password=password,
+                schema_name=schema_name,
+            ),
+        )
+    if req_body.limits is not None:
+        limits = req_body.limits
+        operation.step(
+            "apply_limits",
+            lambda: apply_user_limits(
+                instance_name=instance_name,
+                user_name=user_name,
+                limits=limits,
+            ),
+        )
+        operation.step(
+            "store_limits",
+            lambda: store_user_limits(
+                instance_name=instance_name,
+                db_name=db_name,
+                user_name=user_name,
+                limits=limits,
+            ),
+        )
+    deployment_number = operation.step(
+        "set_env_var",
+        lambda: disco.set_conn_str_env_var(
+            project_name=req_body.project,
+            var_name=req_body.env_var,
+            conn_str=misc.conn_string(
+                user=user_name,
+                password=password,
+                postgres_project_name=postgres_project_name,
+                db_name=db_name,
+                params=conn_params,
+            ),
+            api_key=api_key,
+        ),
+    )
+    operation.step(
+        "store_attachment",
+        lambda: storage.add_attachment(
+            instance_name=instance_name,
+            db_name=db_name,
+            user_name=user_name,
+            project_name=req_body.project,
+            var_name=req_body.env_var,
+            conn_params=conn_params,
+        ),
+    )
+    return {
+        "deployment": {"number": deployment_number}
+        if deployment_number is not None
+        else None
+    }
+
+
+def create_role(
+    instance_name: str, db_name: str, schema_name: str | None
+) -> dict[str, str]:
     admin_conn_str = storage.get_admin_conn_str(instance_name)
     assert admin_conn_str is not None
     user_name = misc.generate_user_name()
     password = misc.generate_password()
-    postgres.add_user(
-        admin_conn_str=admin_conn_str,
-        db_name=db_name,
-        user=user_name,
-        password=password,
-    )
-    storage.add_user(
-        instance_name=instance_name,
-        db_name=db_name,
-        user_name=user_name,
-        password=password,
-    )
-    deployment_number = disco.set_conn_str_env_var(
-        project_name=req_body.project,
-        var_name=req_body.env_var,
-        conn_str=misc.conn_string(
+    if schema_name is None:
+        postgres.add_user(
+            admin_conn_str=admin_conn_str,
+            db_name=db_name,
             user=user_name,
             password=password,
-            postgres_project_name=postgres_project_name,
+        )
+    else:
+        postgres.add_schema_user(
+            admin_conn_str=admin_conn_str,
+            schema_name=schema_name,
+            user=user_name,
+            password=password,
+        )
+    return {"user": user_name, "password": password}
+
+
+class UpdateParamsReqBody(BaseModel):
+    project: str = Field(..., pattern=r"^[a-z][a-z0-9\-]*$", max_length=255)
+    env_var: str | None = Field(
+        None, pattern=r"^[a-zA-Z_]+[a-zA-Z0-9_]*$", max_length=255, alias="envVar"
+    )
+    params: ConnParams
+
+
+@router.post("/instances/{instance_name}/databases/{db_name}/params")
+def params_post(
+    instance_name: Annotated[str, Path()],
+    db_name: Annotated[str, Path()],
+    req_body: UpdateParamsReqBody,
+    api_key: Annotated[str, Depends(get_api_key)],
+):
+    postgres_project_name = f"postgres-instance-{instance_name}"
+    conn_params = libpq_conn_params(req_body.params)
+    with Session.begin() as dbsession:
+        instance = storage.get_instance_by_name(dbsession, instance_name)
+        if instance is None:
+            raise HTTPException(
+                status_code=404, detail=f"Instance {instance_name} not found"
+            )
+        attachments = storage.get_attachments(
+            dbsession=dbsession,
+            instance_name=instance_name,
             db_name=db_name,
-        ),
-        api_key=api_key,
+            project_name=req_body.project,
+            env_var=req_body.env_var,
+        )
+        if len(attachments) == 0:
+            raise HTTPException(
+                status_code=404,
+                detail=f"{req_body.project} not attached to {db_name}",
+            )
+        attachment_ids = [attachment.id for attachment in attachments]
+        conn_strs = {
+            attachment.env_var: misc.conn_string(
+                user=attachment.user.name,
+                password=attachment.user.password,
+                postgres_project_name=postgres_project_name,
+                db_name=db_name,
+                params=conn_params,
+            )
+            for attachment in attachments
+        }
+    storage.set_attachment_conn_params(
+        attachment_ids=attachment_ids, conn_params=conn_params
     )
-    storage.add_attachment(
-        instance_name=instance_name,
-        db_name=db_name,
-        user_name=user_name,
+    # one request for all env vars, so the project is only redeployed once
+    deployment_number = disco.set_conn_str_env_vars(
         project_name=req_body.project,
-        var_name=req_body.env_var,
+        conn_strs=conn_strs,
+        api_key=api_key,
     )
     return {
+        "params": conn_params,
         "deployment": {"number": deployment_number}
         if deployment_number is not None
-        else None
+        else None,
     }
 
 
+class UpdateLimitsReqBody(BaseModel):
+    project: str = Field(..., pattern=r"^[a-z][a-z0-9\-]*$", max_length=255)
+    env_var: str = Field(
+        ..., pattern=r"^[a-zA-Z_]+[a-zA-Z0-9_]*$", max_length=255, alias="envVar"
+    )
+    limits: UserLimits
+
+
+@router.post("/instances/{instance_name}/databases/{db_name}/limits")
+def limits_post(
+    instance_name: Annotated[str, Path()],
+    db_name: Annotated[str, Path()],
+    req_body: UpdateLimitsReqBody,
+):
+    with Session.begin() as dbsession:
+        instance = storage.get_instance_by_name(dbsession, instance_name)
+        if instance is None:
+            raise HTTPException(
+                status_code=404, detail=f"Instance {instance_name} not found"
+            )
+        attachments = storage.get_attachments(
+            dbsession=dbsession,
+            instance_name=instance_name,
+            db_name=db_name,
+            project_name=req_body.project,
+            env_var=req_body.env_var,
+        )
+        if len(attachments) == 0:
+            raise HTTPException(
+                status_code=404,
+                detail=f"{req_body.project} not attached to {db_name} "
+                f"as {req_body.env_var}",
+            )
+        user_name = attachments[0].user.name
+    apply_user_limits(
+        instance_name=instance_name,
+        user_name=user_name,
+        limits=req_body.limits,
+    )
+    store_user_limits(
+        instance_name=instance_name,
+        db_name=db_name,
+        user_name=user_name,
+        limits=req_body.limits,
+    )
+    return {"limits": req_body.limits.model_dump(by_alias=True)}
+
+
+def user_limits_from_user(user: User) -> UserLimits:
+    return UserLimits.model_validate(
+        {
+            "connection_limit": user.connection_limit,
+            "statement_timeout": user.statement_timeout,
+            "idle_in_transaction_session_timeout": (
+                user.idle_in_transaction_session_timeout
+            ),
+            "work_mem": user.work_mem,
+        }
+    )
+
+
+def apply_user_limits(instance_name: str, user_name: str, limits: UserLimits) -> None:
+    admin_conn_str = storage.get_admin_conn_str(instance_name)
+    assert admin_conn_str is not None
+    postgres.set_user_limits(
+        admin_conn_str=admin_conn_str,
+        user=user_name,
+        connection_limit=limits.connection_limit,
+        settings={
+            "statement_timeout": limits.statement_timeout,
+            "idle_in_transaction_session_timeout": (
+                limits.idle_in_transaction_session_timeout
+            ),
+            "work_mem": limits.work_mem,
+        },
+    )
+
+
+def store_user_limits(
+    instance_name: str, db_name: str, user_name: str, limits: UserLimits
+) -> None:
+    storage.set_user_limits(
+        instance_name=instance_name,
+        db_name=db_name,
+        user_name=user_name,
+        connection_limit=limits.connection_limit,
+        statement_timeout=limits.statement_timeout,
+        idle_in_transaction_session_timeout=limits.idle_in_transaction_session_timeout,
+        work_mem=limits.work_mem,
+    )
+
+
 class DetachDatabaseReqBody(BaseModel):
     project: str = Field(..., pattern=r"^[a-z][a-z0-9\-]*$", max_length=255)
     env_var: str | None = Field(
@@ -140,6 +518,21 @@ class AttachmentInfo:
     user: str
     password: str
     project_name: str
+    conn_params: dict[str, str] | None
+    schema_name: str | None
+
+
+def attachment_info_from_attachment(attachment: Attachment) -> AttachmentInfo:
+    return AttachmentInfo(
+        env_var=attachment.env_var,
+        user=attachment.user.name,
+        password=attachment.user.password,
+        project_name=attachment.project_name,
+        conn_params=misc.load_conn_params(attachment.conn_params),
+        schema_name=attachment.user.schema.name
+        if attachment.user.schema is not None
+        else None,
+    )
 
 
 @router.post("/instances/{instance_name}/databases/{db_name}/detach")
@@ -148,8 +541,72 @@ def detach_post(
     db_name: Annotated[str, Path()],
     req_body: DetachDatabaseReqBody,
     api_key: Annotated[str, Depends(get_api_key)],
+    idempotency_key: Annotated[str | None, Header(max_length=255)] = None,
 ):
+    operation = journal.begin(
+        kind="detach",
+        instance_name=instance_name,
+        request={
+            "database": db_name,
+            "schema": None,
+            **req_body.model_dump(mode="json", by_alias=True),
+        },
+        idempotency_key=idempotency_key,
+    )
+    return operation.run(
+        lambda: detach(
+            instance_name=instance_name,
+            db_name=db_name,
+            req_body=req_body,
+            operation=operation,
+            api_key=api_key,
+        )
+    )
+
+
+def detach(
+    instance_name: str,
+    db_name: str,
+    req_body: DetachDatabaseReqBody,
+    operation: journal.Journal,
+    api_key: str,
+) -> dict[str, Any]:
     postgres_project_name = f"postgres-instance-{instance_name}"
+    # listed once, a resumed attempt detaches the same attachments even
+    # though some are already gone from storage
+    attachments_info = [
+        AttachmentInfo(**attachment_info)
+        for attachment_info in operation.step(
+            "find_attachments",
+            lambda: find_attachments(
+                instance_name=instance_name,
+                db_name=db_name,
+                project_name=req_body.project,
+                env_var=req_body.env_var,
+            ),
+        )
+    ]
+    deployment_number = None
+    for attachment_info in attachments_info:
+        deployment_number = remove_attachment(
+            attachment_info=attachment_info,
+            db_name=db_name,
+            instance_name=instance_name,
+            postgres_project_name=postgres_project_name,
+            project_name=attachment_info.project_name,
+            operation=operation,
+            api_key=api_key,
+        )
+    return {
+        "deployment": {"number": deployment_number}
+        if deployment_number is not None
+        else None
+    }
+
+
+def find_attachments(
+    instance_name: str, db_name: str, project_name: str, env_var: str | None
+) -> list[dict[str, Any]]:
     with Session.begin() as dbsession:
         instance = storage.get_instance_by_name(dbsession, instance_name)
         if instance is None:
@@ -165,33 +622,13 @@ def detach_post(
             dbsession=dbsession,
             instance_name=instance_name,
             db_name=db_name,
-            project_name=req_body.project,
-            env_var=req_body.env_var,
+            project_name=project_name,
+            env_var=env_var,
         )
-        attachments_info = [
-            AttachmentInfo(
-                env_var=attachment.env_var,
-                user=attachment.user.name,
-                password=attachment.user.password,
-                project_name=attachment.project_name,
-            )
+        return [
+            asdict(attachment_info_from_attachment(attachment))
             for attachment in attachments
         ]
-    deployment_number = None
-    for attachment_info in attachments_info:
-        deployment_number = remove_attachment(
-            attachment_info=attachment_info,
-            db_name=db_name,
-            instance_name=instance_name,
-            postgres_project_name=postgres_project_name,
-            project_name=attachment_info.project_name,
-            api_key=api_key,
-        )
-    return {
-        "deployment": {"number": deployment_number}
-        if deployment_number is not None
-        else None
-    }
 
 
 def remove_attachment(
@@ -200,6 +637,7 @@ def remove_attachment(
     instance_name: str,
     postgres_project_name: str,
     project_name: str,
+    operation: journal.Journal,
     api_key: str,
 ) -> int | None:
     log.info(
@@ -209,6 +647,61 @@ def remove_attachment(
         project_name,
         attachment_info.env_var,
     )
+    # one operation can detach several attachments
+    prefix = f"{project_name}/{attachment_info.env_var}/"
+    deployment_number = operation.step(
+        f"{prefix}unset_env_var",
+        lambda: unset_env_var(
+            attachment_info=attachment_info,
+            db_name=db_name,
+            postgres_project_name=postgres_project_name,
+            project_name=project_name,
+            api_key=api_key,
+        ),
+    )
+    remaining_attachments = operation.step(
+        f"{prefix}remove_attachment",
+        lambda: storage.remove_attachment(
+            instance_name=instance_name,
+            db_name=db_name,
+            user_name=attachment_info.user,
+            project_name=project_name,
+            var_name=attachment_info.env_var,
+        ),
+    )
+    if remaining_attachments > 0:
+        log.info(
+            "User %s still used by %d attachment(s), keeping it",
+            attachment_info.user,
+            remaining_attachments,
+        )
+        return deployment_number
+    operation.step(
+        f"{prefix}remove_role",
+        lambda: remove_role(
+            instance_name=instance_name,
+            db_name=db_name,
+            attachment_info=attachment_info,
+        ),
+    )
+    operation.step(
+        f"{prefix}remove_user",
+        lambda: storage.remove_user(
+            instance_name=instance_name,
+            db_name=db_name,
+            user_name=attachment_info.user,
+        ),
+    )
+    return deployment_number
+
+
+def unset_env_var(
+    attachment_info: AttachmentInfo,
+    db_name: str,
+    postgres_project_name: str,
+    project_name: str,
+    api_key: str,
+) -> int | None:
     existing_env_var_value = disco.get_conn_str_env_var(
         project_name=project_name,
         var_name=attachment_info.env_var,
@@ -219,25 +712,27 @@ def remove_attachment(
         password=attachment_info.password,
         postgres_project_name=postgres_project_name,
         db_name=db_name,
+        params=attachment_info.conn_params,
     )
-    if existing_env_var_value == expected_conn_str:
-        deployment_number = disco.unset_conn_str_env_var(
-            project_name=project_name,
-            var_name=attachment_info.env_var,
-            api_key=api_key,
-        )
-    else:
-        deployment_number = None
+    if existing_env_var_value != expected_conn_str:
+        return None
+    return disco.unset_conn_str_env_var(
+        project_name=project_name,
+        var_name=attachment_info.env_var,
+        api_key=api_key,
+    )
+
+
+def remove_role(
+    instance_name: str, db_name: str, attachment_info: AttachmentInfo
+) -> None:
     admin_conn_str = storage.get_admin_conn_str(instance_name)
     assert admin_conn_str is not None
-    postgres.remove_user(
-        admin_conn_str=admin_conn_str,
-        db_name=db_name,
-        user=attachment_info.user,
-    )
-    storage.remove_user(
-        instance_name=instance_name,
-        db_name=db_name,
-        user_name=attachment_info.user,
-    )
-    return deployment_number
+    if attachment_info.schema_name is None:
+        postgres.remove_user(
+            admin_conn_str=admin_conn_str,
+            db_name=db_name,
+            user=attachment_info.user,
+        )
+    else:
+        postgres.drop_roles(admin_conn_str, [attachment_info.user])
@@ -0,0 +1,18 @@
+from typing import Annotated
+
+from fastapi import APIRouter, Header
+from fastapi.responses import StreamingResponse
+
+from addon import backup
+
+router = APIRouter()
+
+
+@router.get("/export")
+def export_get(
+    x_export_passphrase: Annotated[str | None, Header()] = None,
+):
+    return StreamingResponse(
+        backup.export_lines(passphrase=x_export_passphrase),
+        media_type="application/x-ndjson",
+    )
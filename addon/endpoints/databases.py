@@ -1,10 +1,26 @@
-from typing import Annotated
+from dataclasses import asdict
+from typing import Annotated, Any
 
-from fastapi import APIRouter, Depends, HTTPException, Path
+from fastapi import APIRouter, Depends, Header, HTTPException, Path, Query
+from pydantic import BaseModel, Field
 
-from addon import misc, postgres, storage
+from addon import (
+    config,
+    indexreport,
+    journal,
+    misc,
+    placement,
+    postgres,
+    sizes,
+    storage,
+)
 from addon.context import get_api_key
-from addon.endpoints.attachments import AttachmentInfo, remove_attachment
+from addon.endpoints.attachments import (
+    AttachmentInfo,
+    attachment_info_from_attachment,
+    remove_attachment,
+)
+from addon.endpoints.instances import quota_dict, size_dict
 from addon.models.db import Session
 
 router = APIRouter()
@@ -27,15 +43,24 @@ def instance_databases_get(
                 {
                     "created": database.created.isoformat(),
                     "name": database.name,
+                    "shared": database.shared,
+                    "size": size_dict(database),
+                    "quota": quota_dict(database),
                     "users": [
                         {
                             "created": user.created.isoformat(),
                             "name": user.name,
+                            "schema": user.schema.name
+                            if user.schema is not None
+                            else None,
                             "attachments": [
                                 {
                                     "created": attachment.created.isoformat(),
                                     "project": attachment.project_name,
                                     "envVar": attachment.env_var,
+                                    "params": misc.load_conn_params(
+                                        attachment.conn_params
+                                    ),
                                 }
                                 for attachment in user.attachments
                             ],
@@ -58,6 +83,55 @@ def instance_databases_post(
             raise HTTPException(
                 status_code=404, detail=f"Instance {instance_name} not found"
             )
+    db_name = create_database(instance_name)
+    return {"database": {"name": db_name}}
+
+
+class PlaceDatabaseReqBody(BaseModel):
+    policy: str = config.PLACEMENT_POLICY
+    instances: list[str] | None = None
+
+
+@router.post("/databases", status_code=201)
+def databases_post(
+    req_body: PlaceDatabaseReqBody,
+):
+    if req_body.policy not in placement.POLICIES:
+        raise HTTPException(
+            status_code=422,
+            detail=f"Unknown placement policy {req_body.policy}, "
+            f"expected one of {sorted(placement.POLICIES)}",
+        )
+    with Session.begin() as dbsession:
+        instance_names = [
+            instance.name for instance in storage.get_instances(dbsession)
+        ]
+    if req_body.instances is not None:
+        for candidate in req_body.instances:
+            if candidate not in instance_names:
+                raise HTTPException(
+                    status_code=404, detail=f"Instance {candidate} not found"
+                )
+        instance_names = req_body.instances
+    instance_name, scores = placement.choose_instance(
+        instance_names=instance_names, policy=req_body.policy
+    )
+    if instance_name is None:
+        raise HTTPException(
+            status_code=503, detail="No reachable instance to place the database on"
+        )
+    db_name = create_database(instance_name)
+    return {
+        "instance": {"name": instance_name},
+        "database": {"name": db_name},
+        "placement": {"policy": req_body.policy, "scores": scores},
+    }
+
+
+def create_database(instance_name: str) -> str:
+    pool_db_name = storage.claim_pool_db(instance_name)
+    if pool_db_name is not None:
+        return pool_db_name
     admin_conn_str = storage.get_admin_conn_str(
         instance_name,
     )
@@ -65,7 +139,7 @@ def instance_databases_post(
     db_name = misc.generate_db_name()
     postgres.create_db(admin_conn_str=admin_conn_str, db_name=db_name)
     storage.add_db(instance_name, db_name)
-    return {"database": {"name": db_name}}
+    return db_name
 
 
 @router.delete("/instances/{instance_name}/databases/{db_name}")
@@ -74,8 +148,66 @@ def database_delete(
     instance_name: Annotated[str, Path()],
     db_name: Annotated[str, Path()],
     detach: bool = False,
+    idempotency_key: Annotated[str | None, Header(max_length=255)] = None,
 ):
+    operation = journal.begin(
+        kind="delete_database",
+        instance_name=instance_name,
+        request={"database": db_name, "detach": detach},
+        idempotency_key=idempotency_key,
+    )
+    return operation.run(
+        lambda: delete_database(
+            instance_name=instance_name,
+            db_name=db_name,
+            detach=detach,
+            operation=operation,
+            api_key=api_key,
+        )
+    )
+
+
+def delete_database(
+    instance_name: str,
+    db_name: str,
+    detach: bool,
+    operation: journal.Journal,
+    api_key: str,
+) -> dict[str, Any]:
     postgres_project_name = f"postgres-instance-{instance_name}"
+    attachments_info = [
+        AttachmentInfo(**attachment_info)
+        for attachment_info in operation.step(
+            "find_attachments",
+            lambda: find_database_attachments(
+                instance_name=instance_name, db_name=db_name, detach=detach
+            ),
+        )
+    ]
+    for attachment_info in attachments_info:
+        remove_attachment(
+            attachment_info=attachment_info,
+            db_name=db_name,
+            instance_name=instance_name,
+            postgres_project_name=postgres_project_name,
+            project_name=attachment_info.project_name,
+            operation=operation,
+            api_key=api_key,
+        )
+    admin_conn_str = storage.get_admin_conn_str(instance_name)
+    assert admin_conn_str is not None
+    operation.step(
+        "drop_database",
+        lambda: postgres.drop_db(admin_conn_str=admin_conn_str, db_name=db_name),
+    )
+    operation.step("remove_database", lambda: storage.remove_db(instance_name, db_name))
+    indexreport.clear_cached_report(instance_name, db_name)
+    return {}
+
+
+def find_database_attachments(
+    instance_name: str, db_name: str, detach: bool
+) -> list[dict[str, Any]]:
     with Session.begin() as dbsession:
         instance = storage.get_instance_by_name(dbsession, instance_name)
         if instance is None:
@@ -87,6 +219,13 @@ def database_delete(
                 status_code=404,
                 detail=f"Database {db_name} not found in {instance_name}",
             )
+        database = storage.get_database(dbsession, instance_name, db_name)
+        assert database is not None
+        if len(database.schemas) > 0:
+            raise HTTPException(
+                422,
+                f"Database {db_name} still holds {len(database.schemas)} schema(s)",
+            )
         attachments = storage.get_attachments_for_database(dbsession, instance, db_name)
         if not detach and len(attachments) > 0:
             usage = [
@@ -94,26 +233,76 @@ def database_delete(
                 for attachment in attachments
             ]
             raise HTTPException(422, f"Database {db_name} still in use: {usage}")
-        attachments_info = [
-            AttachmentInfo(
-                env_var=attachment.env_var,
-                user=attachment.user.name,
-                password=attachment.user.password,
-                project_name=attachment.project_name,
-            )
+        return [
+            asdict(attachment_info_from_attachment(attachment))
             for attachment in attachments
         ]
-        for attachment_info in attachments_info:
-            remove_attachment(
-                attachment_info=attachment_info,
-                db_name=db_name,
-                instance_name=instance_name,
-                postgres_project_name=postgres_project_name,
-                project_name=attachment_info.project_name,
-                api_key=api_key,
+
+
+class SetQuotaReqBody(BaseModel):
+    soft: int | None = Field(None, ge=0)
+    hard: int | None = Field(None, ge=0)
+
+
+@router.post("/instances/{instance_name}/databases/{db_name}/quota")
+def database_quota_post(
+    instance_name: Annotated[str, Path()],
+    db_name: Annotated[str, Path()],
+    req_body: SetQuotaReqBody,
+):
+    if (
+        req_body.soft is not None
+        and req_body.hard is not None
+        and req_body.soft > req_body.hard
+    ):
+        raise HTTPException(422, "Soft quota must not exceed the hard quota")
+    with Session.begin() as dbsession:
+        database = storage.get_database(dbsession, instance_name, db_name)
+        if database is None:
+            raise HTTPException(
+                status_code=404,
+                detail=f"Database {db_name} not found in {instance_name}",
             )
-    admin_conn_str = storage.get_admin_conn_str(instance_name)
-    assert admin_conn_str is not None
-    postgres.drop_db(admin_conn_str=admin_conn_str, db_name=db_name)
-    storage.remove_db(instance_name, db_name)
-    return {}
+        if database.shared:
+            raise HTTPException(
+                422, f"Database {db_name} is shared by schemas, quotas do not apply"
+            )
+    storage.set_quota(
+        instance_name=instance_name,
+        db_name=db_name,
+        soft_quota=req_body.soft,
+        hard_quota=req_body.hard,
+    )
+    # against the last measured size, the next sample may change the outcome
+    sizes.enforce_quotas(instance_name)
+    with Session.begin() as dbsession:
+        database = storage.get_database(dbsession, instance_name, db_name)
+        assert database is not None
+        return {"size": size_dict(database), "quota": quota_dict(database)}
+
+
+@router.get("/instances/{instance_name}/databases/{db_name}/sizes")
+def database_sizes_get(
+    instance_name: Annotated[str, Path()],
+    db_name: Annotated[str, Path()],
+    limit: Annotated[int, Query(ge=1, le=10000)] = 100,
+):
+    with Session.begin() as dbsession:
+        database = storage.get_database(dbsession, instance_name, db_name)
+        if database is None:
+            raise HTTPException(
+                status_code=404,
+                detail=f"Database {db_name} not found in {instance_name}",
+            )
+        return {
+            "size": size_dict(database),
+            "samples": [
+                {
+                    "measured": database_size.created.isoformat(),
+                    "bytes": database_size.size,
+                }
+                for database_size in storage.get_database_sizes(
+                    dbsession, database, limit=limit
+                )
+            ],
+        }
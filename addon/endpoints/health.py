@@ -0,0 +1,55 @@
+from typing import Annotated
+
+from fastapi import APIRouter, Depends, Query, Response
+
+from addon import config, health
+from addon.context import get_api_key
+
+router = APIRouter()
+
+
+@router.get("/health")
+def health_get(
+    response: Response,
+    api_key: Annotated[str, Depends(get_api_key)],
+    databases: Annotated[bool, Query()] = False,
+    timeout: Annotated[float, Query(gt=0, le=60)] = config.HEALTH_TIMEOUT_SECONDS,
+):
+    results = health.check_health(
+        include_databases=databases, timeout_seconds=timeout, api_key=api_key
+    )
+    healthy = all(result.status == "ok" for result in results)
+    if not healthy:
+        # so that uptime checks only need to look at the status code
+        response.status_code = 503
+    return {
+        "status": "ok" if healthy else "unhealthy",
+        "instances": [
+            {
+                "name": result.instance_name,
+                "status": result.status,
+                "error": result.error,
+                "projectExists": result.project_exists,
+                "connectSeconds": result.connect_seconds,
+                "querySeconds": result.query_seconds,
+                "inRecovery": result.in_recovery,
+                "replicas": result.replicas,
+                "replicationLagBytes": result.replication_lag_bytes,
+                "dataSize": result.data_size,
+                "volume": result.volume,
+                "databases": [
+                    {
+                        "name": database.db_name,
+                        "status": database.status,
+                        "error": database.error,
+                        "connectSeconds": database.connect_seconds,
+                        "querySeconds": database.query_seconds,
+                    }
+                    for database in result.databases
+                ]
+                if result.databases is not None
+                else None,
+            }
+            for result in results
+        ],
+    }
@@ -0,0 +1,82 @@
+from typing import Annotated
+
+from fastapi import APIRouter, HTTPException, Path
+
+from addon import indexreport, storage
+from addon.models.db import Session
+
+router = APIRouter()
+
+
+@router.get("/instances/{instance_name}/databases/{db_name}/index-report")
+def index_report_get(
+    instance_name: Annotated[str, Path()],
+    db_name: Annotated[str, Path()],
+    refresh: bool = False,
+):
+    with Session.begin() as dbsession:
+        instance = storage.get_instance_by_name(dbsession, instance_name)
+        if instance is None:
+            raise HTTPException(
+                status_code=404, detail=f"Instance {instance_name} not found"
+            )
+        if db_name not in [database.name for database in instance.databases]:
+            raise HTTPException(
+                status_code=404,
+                detail=f"Database {db_name} not found in {instance_name}",
+            )
+    report = indexreport.get_report(
+        instance_name=instance_name, db_name=db_name, refresh=refresh
+    )
+    return {
+        "generated": report["generated"],
+        "unusedIndexes": [
+            {
+                "schema": index["schema_name"],
+                "table": index["table_name"],
+                "index": index["index_name"],
+                "scans": index["scans"],
+                "size": index["size"],
+            }
+            for index in report["unused_indexes"]
+        ],
+        "duplicateIndexes": [
+            {
+                "table": duplicate["table_name"],
+                "indexes": duplicate["indexes"],
+                "size": duplicate["size"],
+            }
+            for duplicate in report["duplicate_indexes"]
+        ],
+        "seqScanTables": [
+            {
+                "schema": table["schema_name"],
+                "table": table["table_name"],
+                "seqScans": table["seq_scan"],
+                "seqTuplesRead": table["seq_tup_read"],
+                "indexScans": table["idx_scan"],
+                "liveTuples": table["live_tuples"],
+                "seqScanRatio": table["seq_scan_ratio"],
+            }
+            for table in report["seq_scan_tables"]
+        ],
+        "tableBloat": [
+            {
+                "schema": table["schema_name"],
+                "table": table["table_name"],
+                "size": table["size"],
+                "estimatedBloat": table["bloat"],
+            }
+            for table in report["table_bloat"]
+        ],
+        "indexBloat": [
+            {
+                "schema": index["schema_name"],
+                "table": index["table_name"],
+                "index": index["index_name"],
+                "size": index["size"],
+                "estimatedBloat": index["bloat"],
+            }
+            for index in report["index_bloat"]
+        ],
+    }
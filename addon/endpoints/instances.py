@@ -1,57 +1,138 @@
-from typing import Annotated
+import json
+from typing import Annotated, Any, Iterator, Literal
 
 from fastapi import APIRouter, Depends, HTTPException, Path
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, Field
 
-from addon import config, disco, misc, storage
+from addon import config, disco, misc, placement, storage
 from addon.context import get_api_key
+from addon.models import Database, Instance
 from addon.models.db import Session
 
 router = APIRouter()
 
+InventoryFormat = Literal["json", "ndjson"]
+
+INVENTORY_MEDIA_TYPES: dict[InventoryFormat, str] = {
+    "json": "application/json",
+    "ndjson": "application/x-ndjson",
+}
+
 
 @router.get("/instances")
-def instances_get():
+def instances_get(stream: InventoryFormat | None = None):
+    if stream is not None:
+        return StreamingResponse(
+            stream_inventory(stream, header=None),
+            media_type=INVENTORY_MEDIA_TYPES[stream],
+        )
     with Session.begin() as dbsession:
         instances = storage.get_instances(dbsession)
-        return {
-            "instances": [
-                {
-                    "created": instance.created.isoformat(),
-                    "name": instance.name,
-                    "image": instance.image,
-                    "version": instance.version,
-                    "databases": [
-                        {
-                            "created": database.created.isoformat(),
-                            "name": database.name,
-                            "users": [
-                                {
-                                    "created": user.created.isoformat(),
-                                    "name": user.name,
-                                    "attachments": [
-                                        {
-                                            "created": attachment.created.isoformat(),
-                                            "project": attachment.project_name,
-                                            "envVar": attachment.env_var,
-                                        }
-                                        for attachment in user.attachments
-                                    ],
-                                }
-                                for user in database.users
-                            ],
-                        }
-                        for database in instance.databases
-                    ],
-                }
-                for instance in instances
-            ]
-        }
+        return {"instances": [instance_dict(instance) for instance in instances]}
+
+
+def stream_inventory(
+    stream: InventoryFormat, header: dict[str, Any] | None
+) -> Iterator[str]:
+    # With json, header keys are emitted before the "instances" array.
+    # With ndjson, the header is the first line and each instance follows
+    # on its own line.
+    if stream == "ndjson":
+        if header is not None:
+            yield json.dumps(header) + "\n"
+    else:
+        prefix = "" if header is None else json.dumps(header)[1:-1] + ", "
+        yield "{" + prefix + '"instances": ['
+    with Session.begin() as dbsession:
+        for index, instance in enumerate(storage.iter_instances(dbsession)):
+            if stream == "ndjson":
+                yield json.dumps(instance_dict(instance)) + "\n"
+            else:
+                separator = "" if index == 0 else ", "
+                yield separator + json.dumps(instance_dict(instance))
+    if stream == "json":
+        yield "]}"
+
+
+def instance_dict(instance: Instance) -> dict[str, Any]:
+    return {
+        "created": instance.created.isoformat(),
+        "name": instance.name,
+        "image": instance.image,
+        "version": instance.version,
+        "statStatements": instance.stat_statements,
+        "resources": {
+            "cpus": instance.cpus,
+            "memory": instance.memory,
+            "shmSize": instance.shm_size,
+        },
+        "pool": {
+            "size": instance.pool_size,
+            "available": len(instance.pool_databases),
+        },
+        "databases": [
+            {
+                "created": database.created.isoformat(),
+                "name": database.name,
+                "shared": database.shared,
+                "size": size_dict(database),
+                "quota": quota_dict(database),
+                "users": [
+                    {
+                        "created": user.created.isoformat(),
+                        "name": user.name,
+                        "schema": user.schema.name if user.schema is not None else None,
+                        "attachments": [
+                            {
+                                "created": attachment.created.isoformat(),
+                                "project": attachment.project_name,
+                                "envVar": attachment.env_var,
+                                "params": misc.load_conn_params(attachment.conn_params),
+                            }
+                            for attachment in user.attachments
+                        ],
+                    }
+                    for user in database.users
+                ],
+            }
+            for database in instance.databases
+        ],
+    }
+
+
+def size_dict(database: Database) -> dict[str, Any]:
+    # measured by the cron job, not when the inventory is requested
+    return {
+        "bytes": database.size,
+        "measured": database.size_measured.isoformat()
+        if database.size_measured is not None
+        else None,
+        "growthPerDay": database.size_growth_per_day,
+    }
+
+
+def quota_dict(database: Database) -> dict[str, Any]:
+    return {
+        "soft": database.soft_quota,
+        "hard": database.hard_quota,
+        "softExceeded": database.soft_quota is not None
+        and database.size is not None
+        and database.size >= database.soft_quota,
+        "blocked": database.quota_blocked,
+    }
 
 
 class AddInstanceReqBody(BaseModel):
     image: str | None = Field(None, pattern=r"^[^\s:]+$", max_length=255)
     version: str | None = Field(None, pattern=r"^[^\s:]+$", max_length=128)
+    pool_size: int | None = Field(None, ge=0, le=100, alias="poolSize")
+    stat_statements: bool = Field(False, alias="statStatements")
+    cpus: float | None = Field(None, gt=0, le=256)
+    memory: str | None = Field(None, pattern=r"^[0-9]+[bkmg]?$", max_length=32)
+    shm_size: str | None = Field(
+        None, pattern=r"^[0-9]+[bkmg]?$", max_length=32, alias="shmSize"
+    )
 
 
 @router.post("/instances", status_code=201)
@@ -67,6 +148,43 @@ def instances_post(
         version = config.POSTGRES_VERSION
     else:
         version = req_body.version
+    if req_body.pool_size is None:
+        pool_size = config.DATABASE_POOL_SIZE
+    else:
+        pool_size = req_body.pool_size
+    instance_name, postgres_project_name, deployment_number = create_instance(
+        image=image,
+        version=version,
+        pool_size=pool_size,
+        stat_statements=req_body.stat_statements,
+        cpus=req_body.cpus,
+        memory=req_body.memory,
+        shm_size=req_body.shm_size,
+        api_key=api_key,
+    )
+    return {
+        "instance": {
+            "name": instance_name,
+        },
+        "project": {
+            "name": postgres_project_name,
+        },
+        "deployment": {
+            "number": deployment_number,
+        },
+    }
+
+
+def create_instance(
+    image: str,
+    version: str,
+    pool_size: int,
+    stat_statements: bool,
+    cpus: float | None,
+    memory: str | None,
+    shm_size: str | None,
+    api_key: str,
+) -> tuple[str, str, int]:
     postgres_project_name = disco.create_postgres_project(api_key=api_key)
     instance_name = misc.instance_name_from_project_name(postgres_project_name)
     admin_user = misc.generate_user_name()
@@ -77,6 +195,11 @@ def instances_post(
         version=version,
         admin_user=admin_user,
         admin_password=admin_password,
+        pool_size=pool_size,
+        stat_statements=stat_statements,
+        cpus=cpus,
+        memory=memory,
+        shm_size=shm_size,
     )
     disco.init_postgres_env_variables(
         postgres_project_name=postgres_project_name,
@@ -88,15 +211,89 @@ def instances_post(
         postgres_project_name=postgres_project_name,
         image=image,
         version=version,
+        shared_preload_libraries=misc.shared_preload_libraries(
+            stat_statements=stat_statements
+        ),
+        cpus=cpus,
+        memory=memory,
+        shm_size=shm_size,
+        api_key=api_key,
+    )
+    return instance_name, postgres_project_name, deployment_number
+
+
+def redeploy_instance(instance_name: str, api_key: str) -> int:
+    with Session.begin() as dbsession:
+        instance = storage.get_instance_by_name(dbsession, instance_name)
+        assert instance is not None
+        image = instance.image
+        version = instance.version
+        stat_statements = instance.stat_statements
+        cpus = instance.cpus
+        memory = instance.memory
+        shm_size = instance.shm_size
+    return disco.deploy_postgres_project(
+        postgres_project_name=misc.instance_project_name(instance_name),
+        image=image,
+        version=version,
+        shared_preload_libraries=misc.shared_preload_libraries(
+            stat_statements=stat_statements
+        ),
+        cpus=cpus,
+        memory=memory,
+        shm_size=shm_size,
         api_key=api_key,
     )
+
+
+class SetPoolSizeReqBody(BaseModel):
+    size: int = Field(..., ge=0, le=100)
+
+
+@router.post("/instances/{instance_name}/pool")
+def instance_pool_post(
+    instance_name: Annotated[str, Path()],
+    req_body: SetPoolSizeReqBody,
+):
+    with Session.begin() as dbsession:
+        instance = storage.get_instance_by_name(dbsession, instance_name)
+        if instance is None:
+            raise HTTPException(
+                status_code=404, detail=f"Instance {instance_name} not found"
+            )
+    storage.set_pool_size(instance_name, req_body.size)
+    return {"pool": {"size": req_body.size}}
+
+
+class SetResourcesReqBody(BaseModel):
+    cpus: float | None = Field(None, gt=0, le=256)
+    memory: str | None = Field(None, pattern=r"^[0-9]+[bkmg]?$", max_length=32)
+    shm_size: str | None = Field(
+        None, pattern=r"^[0-9]+[bkmg]?$", max_length=32, alias="shmSize"
+    )
+
+
+@router.post("/instances/{instance_name}/resources")
+def instance_resources_post(
+    instance_name: Annotated[str, Path()],
+    req_body: SetResourcesReqBody,
+    api_key: Annotated[str, Depends(get_api_key)],
+):
+    with Session.begin() as dbsession:
+        instance = storage.get_instance_by_name(dbsession, instance_name)
+        if instance is None:
+            raise HTTPException(
+                status_code=404, detail=f"Instance {instance_name} not found"
+            )
+    storage.set_resources(
+        instance_name=instance_name,
+        cpus=req_body.cpus,
+        memory=req_body.memory,
+        shm_size=req_body.shm_size,
+    )
+    deployment_number = redeploy_instance(instance_name, api_key=api_key)
     return {
-        "instance": {
-            "name": instance_name,
-        },
-        "project": {
-            "name": postgres_project_name,
-        },
+        "resources": req_body.model_dump(by_alias=True),
         "deployment": {
             "number": deployment_number,
         },
@@ -125,4 +322,5 @@ def instance_delete(
     if disco.project_exists(postgres_project_name, api_key=api_key):
         disco.remove_project(postgres_project_name, api_key=api_key)
     storage.remove_postgres_instance(instance_name)
+    placement.clear_sample(instance_name)
     return {}
@@ -0,0 +1,94 @@
+from typing import Annotated
+
+from fastapi import APIRouter, HTTPException, Path, Query
+from pydantic import BaseModel, Field
+
+from addon import config, maintenance, storage
+from addon.models.db import Session
+
+router = APIRouter()
+
+
+class RunMaintenanceReqBody(BaseModel):
+    operations: list[maintenance.Operation] = Field(
+        default_factory=lambda: list(maintenance.OPERATIONS), min_length=1
+    )
+    databases: list[str] | None = None
+    timeout_seconds: int = Field(
+        config.MAINTENANCE_TIMEOUT_SECONDS, ge=1, alias="timeoutSeconds"
+    )
+
+
+@router.post("/instances/{instance_name}/maintenance", status_code=202)
+def maintenance_post(
+    instance_name: Annotated[str, Path()],
+    req_body: RunMaintenanceReqBody,
+):
+    with Session.begin() as dbsession:
+        instance = storage.get_instance_by_name(dbsession, instance_name)
+        if instance is None:
+            raise HTTPException(
+                status_code=404, detail=f"Instance {instance_name} not found"
+            )
+        db_names = [database.name for database in instance.databases]
+    if req_body.databases is not None:
+        for db_name in req_body.databases:
+            if db_name not in db_names:
+                raise HTTPException(
+                    status_code=404,
+                    detail=f"Database {db_name} not found in {instance_name}",
+                )
+        db_names = req_body.databases
+    # Run by the cron service within a minute, VACUUM and REINDEX can take
+    # longer than a request can. Results are in GET below.
+    run_ids = maintenance.queue_maintenance(
+        instance_name=instance_name,
+        db_names=db_names,
+        operations=req_body.operations,
+        timeout_seconds=req_body.timeout_seconds,
+    )
+    queued = [
+        (db_name, operation)
+        for db_name in db_names
+        for operation in req_body.operations
+    ]
+    return {
+        "runs": [
+            {
+                "id": run_id,
+                "database": db_name,
+                "operation": operation,
+                "status": "queued",
+            }
+            for run_id, (db_name, operation) in zip(run_ids, queued)
+        ]
+    }
+
+
+@router.get("/instances/{instance_name}/maintenance")
+def maintenance_get(
+    instance_name: Annotated[str, Path()],
+    limit: Annotated[int, Query(ge=1, le=1000)] = 100,
+):
+    with Session.begin() as dbsession:
+        instance = storage.get_instance_by_name(dbsession, instance_name)
+        if instance is None:
+            raise HTTPException(
+                status_code=404, detail=f"Instance {instance_name} not found"
+            )
+        return {
+            "runs": [
+                {
+                    "id": maintenance_run.id,
+                    "created": maintenance_run.created.isoformat(),
+                    "database": maintenance_run.db_name,
+                    "operation": maintenance_run.operation,
+                    "status": maintenance_run.status,
+                    "duration": maintenance_run.duration,
+                    "error": maintenance_run.error,
+                }
+                for maintenance_run in storage.get_maintenance_runs(
+                    dbsession, instance, limit=limit
+                )
+            ]
+        }
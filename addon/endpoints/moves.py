@@ -0,0 +1,569 @@
+import json
+import logging
+import time
+from contextlib import contextmanager
+from typing import Annotated
+
+from fastapi import APIRouter, Depends, HTTPException, Path
+from pydantic import BaseModel, Field
+
+from addon import config, disco, indexreport, misc, postgres, storage
+from addon.context import get_api_key
+from addon.endpoints.attachments import (
+    UserLimits,
+    user_limits_from_user,
+)
+from addon.endpoints.schemas import create_database_roles
+from addon.models.db import Session
+
+log = logging.getLogger(__name__)
+
+router = APIRouter()
+
+
+class MoveDatabaseReqBody(BaseModel):
+    target_instance: str = Field(..., alias="targetInstance")
+    max_lag_bytes: int = Field(config.MOVE_MAX_LAG_BYTES, ge=0, alias="maxLagBytes")
+    # Logical replication needs wal_level=logical, setting it restarts the
+    # source instance and takes down every database on it for a moment.
+    allow_restart: bool = Field(False, alias="allowRestart")
+
+
+@router.post("/instances/{instance_name}/databases/{db_name}/move", status_code=202)
+def database_move_post(
+    instance_name: Annotated[str, Path()],
+    db_name: Annotated[str, Path()],
+    req_body: MoveDatabaseReqBody,
+    api_key: Annotated[str, Depends(get_api_key)],
+):
+    target_instance_name = req_body.target_instance
+    if target_instance_name == instance_name:
+        raise HTTPException(422, "Target instance must differ from the source")
+    with Session.begin() as dbsession:
+        instance = storage.get_instance_by_name(dbsession, instance_name)
+        if instance is None:
+            raise HTTPException(
+                status_code=404, detail=f"Instance {instance_name} not found"
+            )
+        target_instance = storage.get_instance_by_name(dbsession, target_instance_name)
+        if target_instance is None:
+            raise HTTPException(
+                status_code=404, detail=f"Instance {target_instance_name} not found"
+            )
+        database = storage.get_database(
+            dbsession=dbsession, instance_name=instance_name, db_name=db_name
+        )
+        if database is None:
+            raise HTTPException(
+                status_code=404,
+                detail=f"Database {db_name} not found in {instance_name}",
+            )
+        if storage.get_database(
+            dbsession=dbsession, instance_name=target_instance_name, db_name=db_name
+        ):
+            raise HTTPException(409, f"{target_instance_name} already has {db_name}")
+        if storage.get_unfinished_database_move(dbsession, instance_name, db_name):
+            raise HTTPException(409, f"{db_name} is already being moved")
+    admin_conn_str = storage.get_admin_conn_str(instance_name)
+    assert admin_conn_str is not None
+    if (
+        not req_body.allow_restart
+        and postgres.get_wal_level(admin_conn_str) != "logical"
+    ):
+        raise HTTPException(
+            422,
+            f"wal_level of {instance_name} is not logical, setting it restarts"
+            " the instance and every database on it. Set allowRestart to go ahead.",
+        )
+    # Run by the cron service, catching up can take hours.
+    # Progress is in GET /instances/{instance_name}/moves.
+    move_id = storage.add_database_move(
+        source_instance_name=instance_name,
+        target_instance_name=target_instance_name,
+        db_name=db_name,
+        max_lag_bytes=req_body.max_lag_bytes,
+        allow_restart=req_body.allow_restart,
+        api_key=api_key,
+    )
+    move = MoveRun(
+        move_id=move_id,
+        instance_name=instance_name,
+        target_instance_name=target_instance_name,
+        db_name=db_name,
+        status="queued",
+        phases=[],
+    )
+    return {"move": move.to_dict()}
+
+
+@router.get("/instances/{instance_name}/moves")
+def database_moves_get(
+    instance_name: Annotated[str, Path()],
+):
+    with Session.begin() as dbsession:
+        return {
+            "moves": [
+                {
+                    "id": database_move.id,
+                    "created": database_move.created.isoformat(),
+                    "database": database_move.db_name,
+                    "targetInstance": database_move.target_instance_name,
+                    "status": database_move.status,
+                    "phases": json.loads(database_move.phases),
+                    "lagBytes": database_move.lag_bytes,
+                    "error": database_move.error,
+                }
+                for database_move in storage.get_database_moves(
+                    dbsession, instance_name
+                )
+            ]
+        }
+
+
+class MoveRun:
+    def __init__(
+        self,
+        move_id: str,
+        instance_name: str,
+        target_instance_name: str,
+        db_name: str,
+        status: str,
+        phases: list[dict[str, str | float]],
+    ):
+        self.id = move_id
+        self.instance_name = instance_name
+        self.target_instance_name = target_instance_name
+        self.db_name = db_name
+        self.status = status
+        self.error: str | None = None
+        self.lag_bytes: int | None = None
+        self.phases = phases
+
+    @contextmanager
+    def phase(self, name: str):
+        log.info("Move %s of %s: %s", self.id, self.db_name, name)
+        start = time.perf_counter()
+        yield
+        self.phases.append({"name": name, "duration": time.perf_counter() - start})
+        self.save(status="running")
+
+    def done(self, name: str) -> bool:
+        return any(phase["name"] == name for phase in self.phases)
+
+    def save(self, status: str, error: str | None = None) -> None:
+        self.status = status
+        self.error = error
+        storage.update_database_move(
+            move_id=self.id,
+            status=status,
+            phases=json.dumps(self.phases),
+            lag_bytes=self.lag_bytes,
+            error=error,
+        )
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "database": self.db_name,
+            "targetInstance": self.target_instance_name,
+            "status": self.status,
+            "phases": self.phases,
+            "lagBytes": self.lag_bytes,
+            "error": self.error,
+        }
+
+
+def run_queued_moves() -> None:
+    # Called with the move lock held, moves still "running" were interrupted.
+    recover_interrupted_moves()
+    while True:
+        move_id = storage.claim_database_move()
+        if move_id is None:
+            return
+        try:
+            run_move(move_id)
+        except Exception:
+            log.exception("Move %s failed", move_id)
+
+
+def load_move(move_id: str) -> tuple[MoveRun, int, bool, str | None]:
+    with Session.begin() as dbsession:
+        database_move = storage.get_database_move(dbsession, move_id)
+        assert database_move is not None
+        move = MoveRun(
+            move_id=move_id,
+            instance_name=database_move.source_instance_name,
+            target_instance_name=database_move.target_instance_name,
+            db_name=database_move.db_name,
+            status=database_move.status,
+            phases=json.loads(database_move.phases),
+        )
+        move.lag_bytes = database_move.lag_bytes
+        max_lag_bytes = (
+            database_move.max_lag_bytes
+            if database_move.max_lag_bytes is not None
+            else config.MOVE_MAX_LAG_BYTES
+        )
+        return move, max_lag_bytes, database_move.allow_restart, database_move.api_key
+
+
+def database_info(
+    instance_name: str, db_name: str
+) -> tuple[bool, list[str], list[tuple[str, str, UserLimits, str | None]]] | None:
+    with Session.begin() as dbsession:
+        database = storage.get_database(
+            dbsession=dbsession, instance_name=instance_name, db_name=db_name
+        )
+        if database is None:
+            return None
+        return (
+            database.shared,
+            [schema.name for schema in database.schemas],
+            [
+                (
+                    user.name,
+                    user.password,
+                    user_limits_from_user(user),
+                    user.schema.name if user.schema is not None else None,
+                )
+                for user in database.users
+            ],
+        )
+
+
+def move_role_names(
+    db_name: str,
+    schema_names: list[str],
+    users: list[tuple[str, str, UserLimits, str | None]],
+) -> list[str]:
+    return (
+        [user_name for user_name, _, _, _ in users]
+        + [f"{db_name}_owner"]
+        + [f"{schema_name}_owner" for schema_name in schema_names]
+    )
+
+
+def run_move(move_id: str) -> None:
+    move, max_lag_bytes, allow_restart, api_key = load_move(move_id)
+    assert api_key is not None
+    info = database_info(move.instance_name, move.db_name)
+    if info is None:
+        move.save(status="failed", error="Database was removed")
+        return
+    shared, schema_names, users = info
+    try:
+        move_database(
+            move=move,
+            shared=shared,
+            schema_names=schema_names,
+            users=users,
+            max_lag_bytes=max_lag_bytes,
+            allow_restart=allow_restart,
+            api_key=api_key,
+        )
+        finish_move(move, api_key=api_key)
+    except Exception as e:
+        if move.done("move_storage"):
+            # No going back once tenants may write to the target,
+            # the next cron run retries finish_move.
+            move.save(status="running", error=str(e))
+        else:
+            move.save(status="failed", error=str(e))
+        raise
+    move.save(status="complete")
+
+
+def recover_interrupted_moves() -> None:
+    with Session.begin() as dbsession:
+        move_ids = [
+            database_move.id
+            for database_move in storage.get_running_database_moves(dbsession)
+        ]
+    for move_id in move_ids:
+        try:
+            recover_move(move_id)
+        except Exception:
+            log.exception("Could not recover move %s", move_id)
+
+
+def recover_move(move_id: str) -> None:
+    move, _, _, api_key = load_move(move_id)
+    log.info("Recovering interrupted move %s of %s", move.id, move.db_name)
+    if move.done("move_storage"):
+        if api_key is None:
+            move.save(
+                status="failed",
+                error="Interrupted after moving, attachments were not repointed",
+            )
+            return
+        finish_move(move, api_key=api_key)
+        move.save(status="complete")
+        return
+    info = database_info(move.instance_name, move.db_name)
+    if info is None:
+        move.save(status="failed", error="Interrupted, database was removed")
+        return
+    shared, schema_names, users = info
+    source_admin_conn_str = storage.get_admin_conn_str(move.instance_name)
+    target_admin_conn_str = storage.get_admin_conn_str(move.target_instance_name)
+    assert source_admin_conn_str is not None
+    assert target_admin_conn_str is not None
+    roll_back(
+        move=move,
+        source_admin_conn_str=source_admin_conn_str,
+        target_admin_conn_str=target_admin_conn_str,
+        user_names=[user_name for user_name, _, _, _ in users],
+        role_names=move_role_names(move.db_name, schema_names, users),
+        # phases are only recorded once done, cutover may have started
+        cut_over=move.done("catch_up"),
+    )
+    move.save(status="failed", error="Interrupted, rolled back")
+
+
+def roll_back(
+    move: MoveRun,
+    source_admin_conn_str: str,
+    target_admin_conn_str: str,
+    user_names: list[str],
+    role_names: list[str],
+    cut_over: bool,
+) -> None:
+    db_name = move.db_name
+    name = f"move_{db_name}"
+    if cut_over:
+        postgres.set_users_login(
+            admin_conn_str=source_admin_conn_str,
+            db_name=db_name,
+            users=user_names,
+            login=True,
+        )
+    target_databases, target_roles = postgres.get_catalog(target_admin_conn_str)
+    if db_name in target_databases:
+        postgres.drop_subscription(
+            admin_conn_str=target_admin_conn_str, db_name=db_name, name=name
+        )
+        postgres.drop_db(admin_conn_str=target_admin_conn_str, db_name=db_name)
+    postgres.drop_roles(
+        target_admin_conn_str,
+        [role_name for role_name in role_names if role_name in target_roles],
+    )
+    postgres.drop_publication(
+        admin_conn_str=source_admin_conn_str, db_name=db_name, name=name
+    )
+    postgres.drop_replication_slot(source_admin_conn_str, name)
+
+
+def move_database(
+    move: MoveRun,
+    shared: bool,
+    schema_names: list[str],
+    users: list[tuple[str, str, UserLimits, str | None]],
+    max_lag_bytes: int,
+    allow_restart: bool,
+    api_key: str,
+) -> None:
+    db_name = move.db_name
+    source_instance_name = move.instance_name
+    target_instance_name = move.target_instance_name
+    source_admin_conn_str = storage.get_admin_conn_str(source_instance_name)
+    target_admin_conn_str = storage.get_admin_conn_str(target_instance_name)
+    assert source_admin_conn_str is not None
+    assert target_admin_conn_str is not None
+    user_names = [user_name for user_name, _, _, _ in users]
+    # Subscription and slot share the name, db names are already valid identifiers
+    name = f"move_{db_name}"
+    with move.phase("enable_logical"):
+        if postgres.get_wal_level(source_admin_conn_str) != "logical":
+            if not allow_restart:
+                raise Exception("wal_level is not logical and allowRestart not set")
+            postgres.enable_logical_replication(source_admin_conn_str)
+            restart_instance(source_instance_name, api_key=api_key)
+    target_created = False
+    published = False
+    cut_over = False
+    try:
+        with move.phase("create_database"):
+            postgres.create_db(admin_conn_str=target_admin_conn_str, db_name=db_name)
+            target_created = True
+            create_database_roles(
+                admin_conn_str=target_admin_conn_str,
+                instance_name=target_instance_name,
+                db_name=db_name,
+                shared=shared,
+                schema_names=schema_names,
+                users=users,
+            )
+        with move.phase("copy_schema"):
+            postgres.copy_schema(
+                source_conn_str=f"{source_admin_conn_str}/{db_name}",
+                target_conn_str=f"{target_admin_conn_str}/{db_name}",
+            )
+        with move.phase("subscribe"):
+            postgres.create_publication(
+                admin_conn_str=source_admin_conn_str, db_name=db_name, name=name
+            )
+            published = True
+            postgres.create_subscription(
+                admin_conn_str=target_admin_conn_str,
+                db_name=db_name,
+                name=name,
+                publisher_conn_str=f"{source_admin_conn_str}/{db_name}",
+            )
+        with move.phase("initial_sync"):
+            wait_for_initial_sync(move, target_admin_conn_str, name)
+        with move.phase("catch_up"):
+            wait_for_lag(move, source_admin_conn_str, name, max_lag_bytes)
+        with move.phase("cutover"):
+            cut_over = True
+            postgres.set_users_login(
+                admin_conn_str=source_admin_conn_str,
+                db_name=db_name,
+                users=user_names,
+                login=False,
+            )
+            # no writes to the database after this LSN, roles are NOLOGIN
+            cutover_lsn = postgres.get_current_wal_lsn(source_admin_conn_str)
+            wait_for_lsn(move, source_admin_conn_str, name, cutover_lsn)
+            postgres.copy_sequences(
+                source_conn_str=f"{source_admin_conn_str}/{db_name}",
+                target_conn_str=f"{target_admin_conn_str}/{db_name}",
+            )
+            postgres.drop_subscription(
+                admin_conn_str=target_admin_conn_str, db_name=db_name, name=name
+            )
+        with move.phase("move_storage"):
+            storage.move_database(
+                source_instance_name=source_instance_name,
+                target_instance_name=target_instance_name,
+                db_name=db_name,
+            )
+    except Exception:
+        log.exception("Move of %s failed, rolling back", db_name)
+        if target_created or published:
+            roll_back(
+                move=move,
+                source_admin_conn_str=source_admin_conn_str,
+                target_admin_conn_str=target_admin_conn_str,
+                user_names=user_names,
+                role_names=move_role_names(db_name, schema_names, users),
+                cut_over=cut_over,
+            )
+        raise
+
+
+def finish_move(move: MoveRun, api_key: str) -> None:
+    # Storage knows the database is on the target from here on. Every step
+    # can run again if interrupted.
+    db_name = move.db_name
+    source_admin_conn_str = storage.get_admin_conn_str(move.instance_name)
+    assert source_admin_conn_str is not None
+    with Session.begin() as dbsession:
+        database = storage.get_database(
+            dbsession=dbsession,
+            instance_name=move.target_instance_name,
+            db_name=db_name,
+        )
+        assert database is not None
+        role_names = (
+            [user.name for user in database.users]
+            + [f"{db_name}_owner"]
+            + [f"{schema.name}_owner" for schema in database.schemas]
+        )
+        attachments = [
+            (
+                attachment.project_name,
+                attachment.env_var,
+                user.name,
+                user.password,
+                misc.load_conn_params(attachment.conn_params),
+            )
+            for user in database.users
+            for attachment in user.attachments
+        ]
+    indexreport.clear_cached_report(move.instance_name, db_name)
+    if not move.done("repoint_attachments"):
+        with move.phase("repoint_attachments"):
+            for project_name, env_var, user_name, password, conn_params in attachments:
+                disco.set_conn_str_env_var(
+                    project_name=project_name,
+                    var_name=env_var,
+                    conn_str=misc.conn_string(
+                        user=user_name,
+                        password=password,
+                        postgres_project_name=misc.instance_project_name(
+                            move.target_instance_name
+                        ),
+                        db_name=db_name,
+                        params=conn_params,
+                    ),
+                    api_key=api_key,
+                )
+    with move.phase("cleanup_source"):
+        source_databases, source_roles = postgres.get_catalog(source_admin_conn_str)
+        if db_name in source_databases:
+            postgres.drop_db(admin_conn_str=source_admin_conn_str, db_name=db_name)
+        postgres.drop_roles(
+            source_admin_conn_str,
+            [role_name for role_name in role_names if role_name in source_roles],
+        )
+        postgres.drop_replication_slot(source_admin_conn_str, f"move_{db_name}")
+
+
+def restart_instance(instance_name: str, api_key: str) -> None:
+    postgres_project_name = misc.instance_project_name(instance_name)
+    disco.scale_service(postgres_project_name, "postgres", 0, api_key=api_key)
+    disco.scale_service(postgres_project_name, "postgres", 1, api_key=api_key)
+    admin_conn_str = storage.get_admin_conn_str(instance_name)
+    assert admin_conn_str is not None
+    postgres.wait_until_ready(
+        admin_conn_str, timeout_seconds=config.READY_TIMEOUT_SECONDS
+    )
+
+
+def wait_for_initial_sync(move: MoveRun, target_admin_conn_str: str, name: str):
+    deadline = time.monotonic() + config.MOVE_TIMEOUT_SECONDS
+    while True:
+        synced, total = postgres.get_subscription_sync(
+            admin_conn_str=target_admin_conn_str, db_name=move.db_name, name=name
+        )
+        log.info("Move %s: %d/%d tables synced", move.id, synced, total)
+        if synced == total:
+            return
+        if time.monotonic() > deadline:
+            raise Exception(f"Timed out syncing tables, {synced}/{total} done")
+        time.sleep(2)
+
+
+def wait_for_lag(
+    move: MoveRun, source_admin_conn_str: str, name: str, max_lag_bytes: int
+):
+    deadline = time.monotonic() + config.MOVE_TIMEOUT_SECONDS
+    while True:
+        move.lag_bytes = postgres.get_replication_lag(
+            admin_conn_str=source_admin_conn_str, slot_name=name
+        )
+        move.save(status="running")
+        log.info("Move %s: lag %s bytes", move.id, move.lag_bytes)
+        if move.lag_bytes is not None and move.lag_bytes <= max_lag_bytes:
+            return
+        if time.monotonic() > deadline:
+            raise Exception(f"Timed out catching up, lag {move.lag_bytes} bytes")
+        time.sleep(1)
+
+
+def wait_for_lsn(move: MoveRun, source_admin_conn_str: str, name: str, lsn: str):
+    # Users are locked out while waiting, hence the much shorter timeout.
+    deadline = time.monotonic() + config.MOVE_CUTOVER_TIMEOUT_SECONDS
+    while True:
+        move.lag_bytes = postgres.get_slot_bytes_behind(
+            admin_conn_str=source_admin_conn_str, slot_name=name, lsn=lsn
+        )
+        move.save(status="running")
+        log.info("Move %s: %s bytes behind %s", move.id, move.lag_bytes, lsn)
+        if move.lag_bytes is not None and move.lag_bytes <= 0:
+            return
+        if time.monotonic() > deadline:
+            raise Exception(
+                f"Timed out waiting for {lsn} at cutover, {move.lag_bytes} bytes behind"
+            )
+        time.sleep(0.5)
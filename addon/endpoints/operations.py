@@ -0,0 +1,45 @@
+import json
+from typing import Annotated
+
+from fastapi import APIRouter, Path, Query
+
+from addon import storage
+from addon.models.db import Session
+
+router = APIRouter()
+
+
+@router.get("/instances/{instance_name}/operations")
+def operations_get(
+    instance_name: Annotated[str, Path()],
+    limit: Annotated[int, Query(ge=1, le=1000)] = 100,
+):
+    # not checking that the instance exists, the journal outlives it
+    with Session.begin() as dbsession:
+        return {
+            "operations": [
+                {
+                    "id": operation.id,
+                    "created": operation.created.isoformat(),
+                    "updated": operation.updated.isoformat(),
+                    "kind": operation.kind,
+                    "idempotencyKey": operation.idempotency_key,
+                    "request": json.loads(operation.request),
+                    "status": operation.status,
+                    "error": operation.error,
+                    "steps": [
+                        {
+                            "created": step.created.isoformat(),
+                            "name": step.name,
+                            "status": step.status,
+                            "duration": step.duration,
+                            "error": step.error,
+                        }
+                        for step in operation.steps
+                    ],
+                }
+                for operation in storage.get_operations(
+                    dbsession, instance_name, limit=limit
+                )
+            ]
+        }
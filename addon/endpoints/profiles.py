@@ -0,0 +1,28 @@
+from typing import Annotated
+
+from fastapi import APIRouter, HTTPException, Path
+from fastapi.responses import FileResponse
+
+from addon import profiling
+
+router = APIRouter()
+
+
+@router.get("/profiles")
+def profiles_get():
+    return {
+        "profiles": [
+            {"name": file_name, "size": size}
+            for file_name, size in reversed(profiling.list_profiles())
+        ]
+    }
+
+
+@router.get("/profiles/{file_name}")
+def profile_get(
+    file_name: Annotated[str, Path()],
+):
+    path = profiling.profile_path(file_name)
+    if path is None:
+        raise HTTPException(status_code=404, detail=f"Profile {file_name} not found")
+    return FileResponse(path, media_type="application/octet-stream")
@@ -0,0 +1,50 @@
+import fcntl
+from typing import Annotated
+
+from fastapi import APIRouter, HTTPException, Path
+
+from addon import config, reconcile, storage
+from addon.models.db import Session
+
+router = APIRouter()
+
+
+@router.post("/instances/{instance_name}/reconcile")
+def reconcile_post(
+    instance_name: Annotated[str, Path()],
+    repair: bool = False,
+):
+    with Session.begin() as dbsession:
+        instance = storage.get_instance_by_name(dbsession, instance_name)
+        if instance is None:
+            raise HTTPException(
+                status_code=404, detail=f"Instance {instance_name} not found"
+            )
+    if repair:
+        with open(config.CRON_LOCK_PATH, "w") as lock_file:
+            # pool refills create databases before storing them
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                raise HTTPException(409, "Cron jobs in progress, retry shortly")
+            report = reconcile.reconcile_instance(instance_name, repair=True)
+    else:
+        report = reconcile.reconcile_instance(instance_name, repair=False)
+    return {
+        "orphans": {
+            "databases": report.orphan_databases,
+            "roles": report.orphan_roles,
+        },
+        "missing": {
+            "databases": report.missing_databases,
+            "roles": report.missing_roles,
+        },
+        "repairs": {
+            "registeredDatabases": report.registered_databases,
+            "droppedRoles": report.dropped_roles,
+            "recreatedRoles": report.recreated_roles,
+            "skippedRecent": report.skipped,
+            "moveOrUpgradeInProgress": report.busy,
+        },
+        "errors": report.errors,
+    }
@@ -0,0 +1,356 @@
+import logging
+from dataclasses import asdict
+from typing import Annotated, Any
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Path
+from sqlalchemy.orm.session import Session as DBSession
+
+from addon import config, journal, misc, postgres, storage
+from addon.context import get_api_key
+from addon.endpoints.attachments import (
+    AttachDatabaseReqBody,
+    AttachmentInfo,
+    DetachDatabaseReqBody,
+    UserLimits,
+    apply_user_limits,
+    attach,
+    attachment_info_from_attachment,
+    remove_attachment,
+)
+from addon.models.db import Session
+
+log = logging.getLogger(__name__)
+
+router = APIRouter()
+
+
+@router.get("/instances/{instance_name}/schemas")
+def instance_schemas_get(
+    instance_name: Annotated[str, Path()],
+):
+    with Session.begin() as dbsession:
+        instance = storage.get_instance_by_name(dbsession, instance_name)
+        if instance is None:
+            raise HTTPException(
+                status_code=404, detail=f"Instance {instance_name} not found"
+            )
+        return {
+            "schemas": [
+                {
+                    "created": schema.created.isoformat(),
+                    "name": schema.name,
+                    "database": schema.database.name,
+                    "users": [
+                        {
+                            "created": user.created.isoformat(),
+                            "name": user.name,
+                            "attachments": [
+                                {
+                                    "created": attachment.created.isoformat(),
+                                    "project": attachment.project_name,
+                                    "envVar": attachment.env_var,
+                                    "params": misc.load_conn_params(
+                                        attachment.conn_params
+                                    ),
+                                }
+                                for attachment in user.attachments
+                            ],
+                        }
+                        for user in schema.users
+                    ],
+                }
+                for schema in storage.get_schemas(dbsession, instance_name)
+            ]
+        }
+
+
+@router.post("/instances/{instance_name}/schemas", status_code=201)
+def instance_schemas_post(
+    instance_name: Annotated[str, Path()],
+):
+    with Session.begin() as dbsession:
+        instance = storage.get_instance_by_name(dbsession, instance_name)
+        if instance is None:
+            raise HTTPException(
+                status_code=404, detail=f"Instance {instance_name} not found"
+            )
+    db_name, schema_name = create_schema(instance_name)
+    return {"schema": {"name": schema_name, "database": db_name}}
+
+
+def create_schema(instance_name: str) -> tuple[str, str]:
+    admin_conn_str = storage.get_admin_conn_str(instance_name)
+    assert admin_conn_str is not None
+    db_name = storage.get_shared_db_name(
+        instance_name, max_schemas=config.SHARED_DATABASE_MAX_SCHEMAS
+    )
+    if db_name is None:
+        db_name = misc.generate_db_name()
+        postgres.create_db(admin_conn_str=admin_conn_str, db_name=db_name)
+        postgres.restrict_db(admin_conn_str=admin_conn_str, db_name=db_name)
+        storage.add_db(instance_name, db_name, shared=True)
+    schema_name = misc.generate_db_name()
+    postgres.add_schema_owner(
+        admin_conn_str=admin_conn_str, db_name=db_name, schema_name=schema_name
+    )
+    postgres.create_schema(
+        admin_conn_str=admin_conn_str, db_name=db_name, schema_name=schema_name
+    )
+    storage.add_schema(instance_name, db_name, schema_name)
+    return db_name, schema_name
+
+
+@router.delete("/instances/{instance_name}/schemas/{schema_name}")
+def schema_delete(
+    api_key: Annotated[str, Depends(get_api_key)],
+    instance_name: Annotated[str, Path()],
+    schema_name: Annotated[str, Path()],
+    detach: bool = False,
+    idempotency_key: Annotated[str | None, Header(max_length=255)] = None,
+):
+    operation = journal.begin(
+        kind="delete_schema",
+        instance_name=instance_name,
+        request={"schema": schema_name, "detach": detach},
+        idempotency_key=idempotency_key,
+    )
+    return operation.run(
+        lambda: delete_schema(
+            instance_name=instance_name,
+            schema_name=schema_name,
+            detach=detach,
+            operation=operation,
+            api_key=api_key,
+        )
+    )
+
+
+def delete_schema(
+    instance_name: str,
+    schema_name: str,
+    detach: bool,
+    operation: journal.Journal,
+    api_key: str,
+) -> dict[str, Any]:
+    postgres_project_name = f"postgres-instance-{instance_name}"
+    found = operation.step(
+        "find_attachments",
+        lambda: find_schema_attachments(
+            instance_name=instance_name,
+            schema_name=schema_name,
+            project_name=None,
+            env_var=None,
+            in_use_error=not detach,
+        ),
+    )
+    db_name = found["database"]
+    for attachment_info in found["attachments"]:
+        remove_attachment(
+            attachment_info=AttachmentInfo(**attachment_info),
+            db_name=db_name,
+            instance_name=instance_name,
+            postgres_project_name=postgres_project_name,
+            project_name=attachment_info["project_name"],
+            operation=operation,
+            api_key=api_key,
+        )
+    admin_conn_str = storage.get_admin_conn_str(instance_name)
+    assert admin_conn_str is not None
+    operation.step(
+        "drop_schema",
+        lambda: postgres.drop_schema(
+            admin_conn_str=admin_conn_str, db_name=db_name, schema_name=schema_name
+        ),
+    )
+    operation.step(
+        "drop_owner",
+        lambda: postgres.drop_roles(admin_conn_str, [f"{schema_name}_owner"]),
+    )
+    operation.step(
+        "remove_schema", lambda: storage.remove_schema(instance_name, schema_name)
+    )
+    return {}
+
+
+@router.post("/instances/{instance_name}/schemas/{schema_name}/attach")
+def schema_attach_post(
+    instance_name: Annotated[str, Path()],
+    schema_name: Annotated[str, Path()],
+    req_body: AttachDatabaseReqBody,
+    api_key: Annotated[str, Depends(get_api_key)],
+    idempotency_key: Annotated[str | None, Header(max_length=255)] = None,
+):
+    with Session.begin() as dbsession:
+        db_name = get_schema_db_name(dbsession, instance_name, schema_name)
+    operation = journal.begin(
+        kind="attach",
+        instance_name=instance_name,
+        request={
+            "database": db_name,
+            "schema": schema_name,
+            **req_body.model_dump(mode="json", by_alias=True),
+        },
+        idempotency_key=idempotency_key,
+    )
+    return operation.run(
+        lambda: attach(
+            instance_name=instance_name,
+            db_name=db_name,
+            schema_name=schema_name,
+            req_body=req_body,
+            operation=operation,
+            api_key=api_key,
+        )
+    )
+
+
+@router.post("/instances/{instance_name}/schemas/{schema_name}/detach")
+def schema_detach_post(
+    instance_name: Annotated[str, Path()],
+    schema_name: Annotated[str, Path()],
+    req_body: DetachDatabaseReqBody,
+    api_key: Annotated[str, Depends(get_api_key)],
+    idempotency_key: Annotated[str | None, Header(max_length=255)] = None,
+):
+    operation = journal.begin(
+        kind="detach",
+        instance_name=instance_name,
+        request={
+            "schema": schema_name,
+            **req_body.model_dump(mode="json", by_alias=True),
+        },
+        idempotency_key=idempotency_key,
+    )
+    return operation.run(
+        lambda: detach_schema(
+            instance_name=instance_name,
+            schema_name=schema_name,
+            req_body=req_body,
+            operation=operation,
+            api_key=api_key,
+        )
+    )
+
+
+def detach_schema(
+    instance_name: str,
+    schema_name: str,
+    req_body: DetachDatabaseReqBody,
+    operation: journal.Journal,
+    api_key: str,
+) -> dict[str, Any]:
+    postgres_project_name = f"postgres-instance-{instance_name}"
+    found = operation.step(
+        "find_attachments",
+        lambda: find_schema_attachments(
+            instance_name=instance_name,
+            schema_name=schema_name,
+            project_name=req_body.project,
+            env_var=req_body.env_var,
+            in_use_error=False,
+        ),
+    )
+    db_name = found["database"]
+    deployment_number = None
+    for attachment_info in found["attachments"]:
+        deployment_number = remove_attachment(
+            attachment_info=AttachmentInfo(**attachment_info),
+            db_name=db_name,
+            instance_name=instance_name,
+            postgres_project_name=postgres_project_name,
+            project_name=attachment_info["project_name"],
+            operation=operation,
+            api_key=api_key,
+        )
+    return {
+        "deployment": {"number": deployment_number}
+        if deployment_number is not None
+        else None
+    }
+
+
+def find_schema_attachments(
+    instance_name: str,
+    schema_name: str,
+    project_name: str | None,
+    env_var: str | None,
+    in_use_error: bool,
+) -> dict[str, Any]:
+    with Session.begin() as dbsession:
+        db_name = get_schema_db_name(dbsession, instance_name, schema_name)
+        attachments = storage.get_schema_attachments(
+            dbsession=dbsession,
+            instance_name=instance_name,
+            schema_name=schema_name,
+            project_name=project_name,
+            env_var=env_var,
+        )
+        if in_use_error and len(attachments) > 0:
+            usage = [
+                {"project": attachment.project_name, "envVar": attachment.env_var}
+                for attachment in attachments
+            ]
+            raise HTTPException(422, f"Schema {schema_name} still in use: {usage}")
+        return {
+            "database": db_name,
+            "attachments": [
+                asdict(attachment_info_from_attachment(attachment))
+                for attachment in attachments
+            ],
+        }
+
+
+def get_schema_db_name(
+    dbsession: DBSession, instance_name: str, schema_name: str
+) -> str:
+    instance = storage.get_instance_by_name(dbsession, instance_name)
+    if instance is None:
+        raise HTTPException(
+            status_code=404, detail=f"Instance {instance_name} not found"
+        )
+    schema = storage.get_schema(dbsession, instance_name, schema_name)
+    if schema is None:
+        raise HTTPException(
+            status_code=404,
+            detail=f"Schema {schema_name} not found in {instance_name}",
+        )
+    return schema.database.name
+
+
+def create_database_roles(
+    admin_conn_str: str,
+    instance_name: str,
+    db_name: str,
+    shared: bool,
+    schema_names: list[str],
+    users: list[tuple[str, str, UserLimits, str | None]],
+) -> None:
+    # Used when a database is recreated on another instance before its
+    # content is restored: schemas come with the restore, roles and their
+    # settings do not.
+    if shared:
+        postgres.restrict_db(admin_conn_str=admin_conn_str, db_name=db_name)
+    for schema_name in schema_names:
+        postgres.add_schema_owner(
+            admin_conn_str=admin_conn_str, db_name=db_name, schema_name=schema_name
+        )
+    for user_name, password, limits, user_schema_name in users:
+        if user_schema_name is None:
+            postgres.add_user(
+                admin_conn_str=admin_conn_str,
+                db_name=db_name,
+                user=user_name,
+                password=password,
+            )
+        else:
+            postgres.add_schema_user(
+                admin_conn_str=admin_conn_str,
+                schema_name=user_schema_name,
+                user=user_name,
+                password=password,
+            )
+        apply_user_limits(
+            instance_name=instance_name,
+            user_name=user_name,
+            limits=limits,
+        )
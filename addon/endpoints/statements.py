@@ -0,0 +1,123 @@
+import logging
+from typing import Annotated, Literal
+
+from fastapi import APIRouter, Depends, HTTPException, Path, Query
+from pydantic import BaseModel
+
+from addon import postgres, storage
+from addon.context import get_api_key
+from addon.endpoints.instances import redeploy_instance
+from addon.models.db import Session
+
+log = logging.getLogger(__name__)
+
+router = APIRouter()
+
+
+class SetStatStatementsReqBody(BaseModel):
+    enabled: bool
+
+
+@router.post("/instances/{instance_name}/stat-statements")
+def stat_statements_post(
+    instance_name: Annotated[str, Path()],
+    req_body: SetStatStatementsReqBody,
+    api_key: Annotated[str, Depends(get_api_key)],
+):
+    with Session.begin() as dbsession:
+        instance = storage.get_instance_by_name(dbsession, instance_name)
+        if instance is None:
+            raise HTTPException(
+                status_code=404, detail=f"Instance {instance_name} not found"
+            )
+    storage.set_stat_statements(instance_name, req_body.enabled)
+    deployment_number = redeploy_instance(instance_name, api_key=api_key)
+    return {
+        "statStatements": req_body.enabled,
+        "deployment": {
+            "number": deployment_number,
+        },
+    }
+
+
+@router.get("/instances/{instance_name}/top-queries")
+def top_queries_get(
+    instance_name: Annotated[str, Path()],
+    database: str | None = None,
+    order_by: Annotated[
+        Literal["totalTime", "meanTime", "calls", "io"], Query(alias="orderBy")
+    ] = "totalTime",
+    limit: Annotated[int, Query(ge=1, le=500)] = 20,
+):
+    with Session.begin() as dbsession:
+        instance = storage.get_instance_by_name(dbsession, instance_name)
+        if instance is None:
+            raise HTTPException(
+                status_code=404, detail=f"Instance {instance_name} not found"
+            )
+        if not instance.stat_statements:
+            raise HTTPException(
+                status_code=422,
+                detail=f"pg_stat_statements not enabled on {instance_name}",
+            )
+        admin_user = instance.admin_user
+        attachments_by_user_name = {
+            user_name: [
+                {"project": attachment.project_name, "envVar": attachment.env_var}
+                for attachment in attachments
+            ]
+            for user_name, attachments in storage.get_attachments_by_user_name(
+                dbsession, instance
+            ).items()
+        }
+    admin_conn_str = storage.get_admin_conn_str(instance_name)
+    assert admin_conn_str is not None
+    statements = postgres.get_top_statements(
+        admin_conn_str=admin_conn_str,
+        db_name=database,
+        order_by=order_by,
+        limit=limit,
+    )
+    return {
+        "statements": [
+            {
+                "database": statement["db_name"],
+                "user": statement["user_name"],
+                "superUser": statement["user_name"] == admin_user,
+                "attachments": attachments_by_user_name.get(statement["user_name"], []),
+                "queryId": statement["queryid"],
+                "query": statement["query"],
+                "calls": statement["calls"],
+                "rows": statement["rows"],
+                "totalTime": statement["total_exec_time"],
+                "meanTime": statement["mean_exec_time"],
+                "sharedBlocksHit": statement["shared_blks_hit"],
+                "sharedBlocksRead": statement["shared_blks_read"],
+                "sharedBlocksWritten": statement["shared_blks_written"],
+                "tempBlocksRead": statement["temp_blks_read"],
+                "tempBlocksWritten": statement["temp_blks_written"],
+            }
+            for statement in statements
+        ]
+    }
+
+
+@router.delete("/instances/{instance_name}/top-queries")
+def top_queries_delete(
+    instance_name: Annotated[str, Path()],
+):
+    with Session.begin() as dbsession:
+        instance = storage.get_instance_by_name(dbsession, instance_name)
+        if instance is None:
+            raise HTTPException(
+                status_code=404, detail=f"Instance {instance_name} not found"
+            )
+        if not instance.stat_statements:
+            raise HTTPException(
+                status_code=422,
+                detail=f"pg_stat_statements not enabled on {instance_name}",
+            )
+    admin_conn_str = storage.get_admin_conn_str(instance_name)
+    assert admin_conn_str is not None
+    postgres.reset_statements(admin_conn_str)
+    return {}
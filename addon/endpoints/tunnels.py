@@ -27,10 +27,21 @@ def tunnels_post(
         attachments = storage.get_attachments_for_project(
             dbsession=dbsession, project_name=req_body.project, env_var=req_body.env_var
         )
-        db_names = set([attachment.user.database.name for attachment in attachments])
-        if len(db_names) == 0:
+        # schema tenants share their database, so the schema tells them apart
+        targets = set(
+            [
+                (
+                    attachment.user.database.name,
+                    attachment.user.schema.name
+                    if attachment.user.schema is not None
+                    else None,
+                )
+                for attachment in attachments
+            ]
+        )
+        if len(targets) == 0:
             raise HTTPException(status_code=404, detail="Database not found.")
-        if len(db_names) > 1:
+        if len(targets) > 1:
             raise HTTPException(
                 status_code=422,
                 detail="More than one database found. Please specify env variable to use.",
@@ -40,6 +51,9 @@ def tunnels_post(
             "dbInfo": {
                 "instance": attachment.user.database.instance.name,
                 "database": attachment.user.database.name,
+                "schema": attachment.user.schema.name
+                if attachment.user.schema is not None
+                else None,
                 "user": attachment.user.database.instance.admin_user
                 if req_body.super_user
                 else attachment.user.name,
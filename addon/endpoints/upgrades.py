@@ -0,0 +1,466 @@
+import json
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Annotated, Literal
+
+from fastapi import APIRouter, Depends, HTTPException, Path
+from pydantic import BaseModel, Field
+
+from addon import config, disco, misc, postgres, storage
+from addon.context import get_api_key
+from addon.endpoints.attachments import user_limits_from_user
+from addon.endpoints.instances import create_instance
+from addon.endpoints.schemas import create_database_roles
+from addon.models.db import Session
+
+log = logging.getLogger(__name__)
+
+router = APIRouter()
+
+
+class UpgradeInstanceReqBody(BaseModel):
+    image: str | None = Field(None, pattern=r"^[^\s:]+$", max_length=255)
+    version: str = Field(..., pattern=r"^[^\s:]+$", max_length=128)
+    # Both take the databases offline: link while Postgres is stopped, dump
+    # from the moment users are set NOLOGIN until attachments are repointed
+    # to the new instance, i.e. for the whole copy.
+    method: Literal["link", "dump"] = "link"
+    jobs: int = Field(4, ge=1, le=32)
+
+
+@router.post("/instances/{instance_name}/upgrade", status_code=202)
+def instance_upgrade_post(
+    instance_name: Annotated[str, Path()],
+    req_body: UpgradeInstanceReqBody,
+    api_key: Annotated[str, Depends(get_api_key)],
+):
+    with Session.begin() as dbsession:
+        instance = storage.get_instance_by_name(dbsession, instance_name)
+        if instance is None:
+            raise HTTPException(
+                status_code=404, detail=f"Instance {instance_name} not found"
+            )
+        if storage.get_unfinished_instance_upgrade(dbsession, instance_name):
+            raise HTTPException(409, f"{instance_name} is already being upgraded")
+        image = instance.image if req_body.image is None else req_body.image
+        from_version = instance.version
+    from_major = misc.major_version(from_version)
+    to_major = misc.major_version(req_body.version)
+    if from_major is None or to_major is None or to_major <= from_major:
+        raise HTTPException(
+            422,
+            f"Cannot upgrade {instance_name} from {from_version} "
+            f"to {req_body.version}, target must be a newer major version",
+        )
+    if req_body.method == "link" and image != "postgres":
+        raise HTTPException(422, "In place upgrades require the postgres image")
+    # Run by the cron service, an upgrade takes longer than a request can.
+    # Progress is in GET /instances/{instance_name}/upgrades.
+    upgrade_id = storage.add_instance_upgrade(
+        instance_name=instance_name,
+        method=req_body.method,
+        from_version=from_version,
+        to_version=req_body.version,
+        image=image,
+        jobs=req_body.jobs,
+        api_key=api_key,
+    )
+    upgrade = UpgradeRun(
+        upgrade_id=upgrade_id,
+        instance_name=instance_name,
+        method=req_body.method,
+        from_version=from_version,
+        to_version=req_body.version,
+        status="queued",
+    )
+    return {"upgrade": upgrade.to_dict()}
+
+
+def run_queued_upgrades() -> None:
+    while True:
+        claimed = storage.claim_instance_upgrade()
+        if claimed is None:
+            return
+        upgrade_id, api_key = claimed
+        try:
+            run_upgrade(upgrade_id, api_key=api_key)
+        except Exception:
+            log.exception("Upgrade %s failed", upgrade_id)
+
+
+def run_upgrade(upgrade_id: str, api_key: str) -> None:
+    with Session.begin() as dbsession:
+        instance_upgrade = storage.get_instance_upgrade(dbsession, upgrade_id)
+        assert instance_upgrade is not None
+        assert instance_upgrade.image is not None
+        assert instance_upgrade.jobs is not None
+        upgrade = UpgradeRun(
+            upgrade_id=upgrade_id,
+            instance_name=instance_upgrade.instance_name,
+            method=instance_upgrade.method,
+            from_version=instance_upgrade.from_version,
+            to_version=instance_upgrade.to_version,
+            status="running",
+        )
+        image = instance_upgrade.image
+        jobs = instance_upgrade.jobs
+        instance = storage.get_instance_by_name(
+            dbsession, instance_upgrade.instance_name
+        )
+        if instance is None:
+            upgrade.save(status="failed", error="Instance was removed")
+            return
+        admin_user = instance.admin_user
+        pool_size = instance.pool_size
+        stat_statements = instance.stat_statements
+        cpus = instance.cpus
+        memory = instance.memory
+        shm_size = instance.shm_size
+    from_major = misc.major_version(upgrade.from_version)
+    to_major = misc.major_version(upgrade.to_version)
+    assert from_major is not None
+    assert to_major is not None
+    try:
+        if upgrade.method == "link":
+            link_upgrade(
+                upgrade=upgrade,
+                instance_name=upgrade.instance_name,
+                admin_user=admin_user,
+                image=image,
+                version=upgrade.to_version,
+                from_major=from_major,
+                to_major=to_major,
+                stat_statements=stat_statements,
+                cpus=cpus,
+                memory=memory,
+                shm_size=shm_size,
+                api_key=api_key,
+            )
+        else:
+            dump_upgrade(
+                upgrade=upgrade,
+                instance_name=upgrade.instance_name,
+                image=image,
+                version=upgrade.to_version,
+                pool_size=pool_size,
+                stat_statements=stat_statements,
+                cpus=cpus,
+                memory=memory,
+                shm_size=shm_size,
+                jobs=jobs,
+                api_key=api_key,
+            )
+    except Exception as e:
+        upgrade.save(status="failed", error=str(e))
+        raise
+    upgrade.save(status="complete")
+
+
+@router.get("/instances/{instance_name}/upgrades")
+def instance_upgrades_get(
+    instance_name: Annotated[str, Path()],
+):
+    with Session.begin() as dbsession:
+        return {
+            "upgrades": [
+                {
+                    "id": instance_upgrade.id,
+                    "created": instance_upgrade.created.isoformat(),
+                    "method": instance_upgrade.method,
+                    "fromVersion": instance_upgrade.from_version,
+                    "toVersion": instance_upgrade.to_version,
+                    "targetInstance": instance_upgrade.target_instance_name,
+                    "status": instance_upgrade.status,
+                    "phases": json.loads(instance_upgrade.phases),
+                    "error": instance_upgrade.error,
+                }
+                for instance_upgrade in storage.get_instance_upgrades(
+                    dbsession, instance_name
+                )
+            ]
+        }
+
+
+class UpgradeRun:
+    def __init__(
+        self,
+        upgrade_id: str,
+        instance_name: str,
+        method: str,
+        from_version: str,
+        to_version: str,
+        status: str,
+    ):
+        self.id = upgrade_id
+        self.instance_name = instance_name
+        self.method = method
+        self.from_version = from_version
+        self.to_version = to_version
+        self.target_instance_name: str | None = None
+        self.status = status
+        self.error: str | None = None
+        self.phases: list[dict[str, str | float]] = []
+
+    @contextmanager
+    def phase(self, name: str):
+        log.info("Upgrade %s of %s: %s", self.id, self.instance_name, name)
+        start = time.perf_counter()
+        yield
+        self.phases.append({"name": name, "duration": time.perf_counter() - start})
+        self.save(status="running")
+
+    def save(self, status: str, error: str | None = None) -> None:
+        self.status = status
+        self.error = error
+        storage.update_instance_upgrade(
+            upgrade_id=self.id,
+            status=status,
+            phases=json.dumps(self.phases),
+            error=error,
+            target_instance_name=self.target_instance_name,
+        )
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "method": self.method,
+            "fromVersion": self.from_version,
+            "toVersion": self.to_version,
+            "targetInstance": self.target_instance_name,
+            "status": self.status,
+            "phases": self.phases,
+            "error": self.error,
+        }
+
+
+def link_upgrade(
+    upgrade: UpgradeRun,
+    instance_name: str,
+    admin_user: str,
+    image: str,
+    version: str,
+    from_major: int,
+    to_major: int,
+    stat_statements: bool,
+    cpus: float | None,
+    memory: str | None,
+    shm_size: str | None,
+    api_key: str,
+) -> None:
+    postgres_project_name = misc.instance_project_name(instance_name)
+    with upgrade.phase("scale_down"):
+        disco.scale_service(postgres_project_name, "postgres", 0, api_key=api_key)
+    try:
+        with upgrade.phase("pg_upgrade"):
+            deployment_number = disco.deploy_postgres_upgrade(
+                postgres_project_name=postgres_project_name,
+                image=image,
+                version=version,
+                upgrade_image=f"{config.UPGRADE_IMAGE}:{from_major}-to-{to_major}",
+                upgrade_command=pg_upgrade_command(
+                    admin_user=admin_user, from_major=from_major, to_major=to_major
+                ),
+                shared_preload_libraries=misc.shared_preload_libraries(
+                    stat_statements=stat_statements
+                ),
+                cpus=cpus,
+                memory=memory,
+                shm_size=shm_size,
+                api_key=api_key,
+            )
+            wait_for_deployment(
+                project_name=postgres_project_name,
+                deployment_number=deployment_number,
+                api_key=api_key,
+            )
+    finally:
+        with upgrade.phase("scale_up"):
+            disco.scale_service(postgres_project_name, "postgres", 1, api_key=api_key)
+    admin_conn_str = storage.get_admin_conn_str(instance_name)
+    assert admin_conn_str is not None
+    with upgrade.phase("wait_ready"):
+        postgres.wait_until_ready(
+            admin_conn_str, timeout_seconds=config.READY_TIMEOUT_SECONDS
+        )
+    storage.set_instance_version(instance_name, image=image, version=version)
+
+
+def pg_upgrade_command(admin_user: str, from_major: int, to_major: int) -> str:
+    # Runs in the tianon/postgres-upgrade image while the old server is stopped.
+    # The upgraded cluster replaces the old one at the same PGDATA path, and
+    # the old cluster is kept next to it as pgdata-<old major>.
+    pgdata = "/var/lib/postgresql/data/pgdata"
+    script = "; ".join(
+        [
+            "set -e",
+            "cd /var/lib/postgresql",
+            f"export PGDATAOLD={pgdata} PGDATANEW={pgdata}-upgrade",
+            f"export POSTGRES_INITDB_ARGS=--username={admin_user} PGUSER={admin_user}",
+            f"if [ $(cat $PGDATAOLD/PG_VERSION) = {to_major} ]; then exit 0; fi",
+            "rm -rf $PGDATANEW",
+            "docker-upgrade pg_upgrade --link",
+            "cp $PGDATAOLD/pg_hba.conf $PGDATANEW/pg_hba.conf",
+            f"mv $PGDATAOLD {pgdata}-{from_major}",
+            "mv $PGDATANEW $PGDATAOLD",
+        ]
+    )
+    return f'bash -c "{script}"'
+
+
+def wait_for_deployment(project_name: str, deployment_number: int, api_key: str):
+    deadline = time.monotonic() + config.UPGRADE_TIMEOUT_SECONDS
+    while True:
+        status = disco.get_deployment_status(
+            project_name=project_name,
+            deployment_number=deployment_number,
+            api_key=api_key,
+        )
+        if status == "COMPLETE":
+            return
+        if status in ["FAILED", "CANCELLED", "SKIPPED"]:
+            raise Exception(f"Deployment {deployment_number} {status.lower()}")
+        if time.monotonic() > deadline:
+            raise Exception(f"Timed out waiting for deployment {deployment_number}")
+        time.sleep(5)
+
+
+def dump_upgrade(
+    upgrade: UpgradeRun,
+    instance_name: str,
+    image: str,
+    version: str,
+    pool_size: int,
+    stat_statements: bool,
+    cpus: float | None,
+    memory: str | None,
+    shm_size: str | None,
+    jobs: int,
+    api_key: str,
+) -> None:
+    with upgrade.phase("create_instance"):
+        target_instance_name, target_project_name, _ = create_instance(
+            image=image,
+            version=version,
+            pool_size=pool_size,
+            stat_statements=stat_statements,
+            cpus=cpus,
+            memory=memory,
+            shm_size=shm_size,
+            api_key=api_key,
+        )
+        upgrade.target_instance_name = target_instance_name
+    source_admin_conn_str = storage.get_admin_conn_str(instance_name)
+    target_admin_conn_str = storage.get_admin_conn_str(target_instance_name)
+    assert source_admin_conn_str is not None
+    assert target_admin_conn_str is not None
+    with upgrade.phase("wait_ready"):
+        postgres.wait_until_ready(
+            target_admin_conn_str, timeout_seconds=config.READY_TIMEOUT_SECONDS
+        )
+    with Session.begin() as dbsession:
+        instance = storage.get_instance_by_name(dbsession, instance_name)
+        assert instance is not None
+        databases = {
+            database.name: (
+                database.shared,
+                [schema.name for schema in database.schemas],
+                [
+                    (
+                        user.name,
+                        user.password,
+                        user_limits_from_user(user),
+                        user.schema.name if user.schema is not None else None,
+                    )
+                    for user in database.users
+                ],
+            )
+            for database in instance.databases
+        }
+        attachments = [
+            (
+                attachment.project_name,
+                attachment.env_var,
+                attachment.user.name,
+                attachment.user.password,
+                attachment.user.database.name,
+                misc.load_conn_params(attachment.conn_params),
+            )
+            for attachment in storage.get_attachments_for_instance(dbsession, instance)
+        ]
+    with upgrade.phase("create_roles"):
+        for db_name, (shared, schema_names, users) in databases.items():
+            postgres.create_db(admin_conn_str=target_admin_conn_str, db_name=db_name)
+            create_database_roles(
+                admin_conn_str=target_admin_conn_str,
+                instance_name=target_instance_name,
+                db_name=db_name,
+                shared=shared,
+                schema_names=schema_names,
+                users=users,
+            )
+
+    # About `jobs` connections to each instance in total: several databases
+    # at once, or one at a time with pg_dump/pg_restore jobs of their own.
+    workers = max(1, min(jobs, len(databases)))
+    jobs_per_database = max(1, jobs // workers)
+
+    def copy_database(db_name: str) -> None:
+        postgres.copy_database(
+            source_conn_str=f"{source_admin_conn_str}/{db_name}",
+            target_conn_str=f"{target_admin_conn_str}/{db_name}",
+            jobs=jobs_per_database,
+        )
+
+    # Anything written after pg_dump takes its snapshot would be lost.
+    logins_disabled: list[str] = []
+    try:
+        with upgrade.phase("stop_writes"):
+            for db_name, (_, _, users) in databases.items():
+                logins_disabled.append(db_name)
+                postgres.set_users_login(
+                    admin_conn_str=source_admin_conn_str,
+                    db_name=db_name,
+                    users=[user_name for user_name, _, _, _ in users],
+                    login=False,
+                )
+        with upgrade.phase("copy_data"):
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                list(executor.map(copy_database, databases))
+        with upgrade.phase("move_storage"):
+            storage.move_databases(instance_name, target_instance_name)
+    except Exception:
+        log.exception("Upgrade of %s failed, allowing logins again", instance_name)
+        for db_name in logins_disabled:
+            _, _, users = databases[db_name]
+            postgres.set_users_login(
+                admin_conn_str=source_admin_conn_str,
+                db_name=db_name,
+                users=[user_name for user_name, _, _, _ in users],
+                login=True,
+            )
+        raise
+    # The source instance keeps its data but storage no longer knows about
+    # its databases, there is no rollback past this point.
+    with upgrade.phase("repoint_attachments"):
+        for (
+            project_name,
+            env_var,
+            user_name,
+            password,
+            db_name,
+            conn_params,
+        ) in attachments:
+            disco.set_conn_str_env_var(
+                project_name=project_name,
+                var_name=env_var,
+                conn_str=misc.conn_string(
+                    user=user_name,
+                    password=password,
+                    postgres_project_name=target_project_name,
+                    db_name=db_name,
+                    params=conn_params,
+                ),
+                api_key=api_key,
+            )
@@ -0,0 +1,166 @@
+import functools
+import logging
+import math
+import threading
+import time
+from concurrent.futures import Future, wait
+from dataclasses import dataclass
+from queue import Empty, SimpleQueue
+from typing import Any, Callable
+
+from addon import config, disco, misc, postgres, storage
+from addon.models.db import Session
+
+log = logging.getLogger(__name__)
+
+
+@dataclass
+class DatabaseHealth:
+    db_name: str
+    status: str
+    connect_seconds: float | None = None
+    query_seconds: float | None = None
+    error: str | None = None
+
+
+@dataclass
+class InstanceHealth:
+    instance_name: str
+    status: str
+    project_exists: bool | None = None
+    connect_seconds: float | None = None
+    query_seconds: float | None = None
+    in_recovery: bool | None = None
+    replicas: int | None = None
+    replication_lag_bytes: int | None = None
+    data_size: int | None = None
+    volume: dict[str, int] | None = None
+    error: str | None = None
+    databases: list[DatabaseHealth] | None = None
+
+
+def check_health(
+    include_databases: bool, timeout_seconds: float, api_key: str
+) -> list[InstanceHealth]:
+    deadline = time.monotonic() + timeout_seconds
+    with Session.begin() as dbsession:
+        instances = {
+            instance.name: (
+                misc.conn_string(
+                    user=instance.admin_user,
+                    password=instance.admin_password,
+                    postgres_project_name=misc.instance_project_name(instance.name),
+                    db_name=None,
+                ),
+                [database.name for database in instance.databases],
+            )
+            for instance in storage.get_instances(dbsession)
+        }
+    # libpq rounds connect_timeout up to at least 2 seconds
+    probe_timeout = max(2, math.ceil(timeout_seconds))
+    probes = ProbeRunner(workers=config.HEALTH_WORKERS)
+    projects_future = probes.submit(disco.get_project_names, api_key)
+    instance_futures: dict[str, Future] = {}
+    database_futures: dict[tuple[str, str], Future] = {}
+    for instance_name, (admin_conn_str, db_names) in instances.items():
+        instance_futures[instance_name] = probes.submit(
+            postgres.probe_instance, admin_conn_str, probe_timeout
+        )
+        if not include_databases:
+            continue
+        for db_name in db_names:
+            database_futures[(instance_name, db_name)] = probes.submit(
+                postgres.probe_database, admin_conn_str, db_name, probe_timeout
+            )
+    probes.start()
+    futures = [
+        projects_future,
+        *instance_futures.values(),
+        *database_futures.values(),
+    ]
+    wait(futures, timeout=max(0.0, deadline - time.monotonic()))
+    for future in futures:
+        # probes not started yet are skipped by the workers
+        future.cancel()
+    project_names: set[str] | None = None
+    if probe_result(projects_future)[0] == "ok":
+        project_names = set(projects_future.result())
+    else:
+        log.warning("Could not list Disco projects for health check")
+    results = []
+    for instance_name, (_, db_names) in instances.items():
+        health = instance_health(instance_name, instance_futures[instance_name])
+        if project_names is not None:
+            health.project_exists = (
+                misc.instance_project_name(instance_name) in project_names
+            )
+            if not health.project_exists and health.status == "ok":
+                health.status = "error"
+                health.error = "Disco project not found"
+        if include_databases:
+            health.databases = [
+                database_health(db_name, database_futures[(instance_name, db_name)])
+                for db_name in db_names
+            ]
+            if health.status == "ok" and any(
+                database.status != "ok" for database in health.databases
+            ):
+                health.status = "degraded"
+        results.append(health)
+    return results
+
+
+class ProbeRunner:
+    # Daemon threads rather than a ThreadPoolExecutor: the executor's threads
+    # are joined at interpreter exit, which would keep the CGI process, and
+    # so the response, waiting for probes still running past the deadline.
+    def __init__(self, workers: int):
+        self.workers = workers
+        self.queue: SimpleQueue[tuple[Future, Callable[[], Any]]] = SimpleQueue()
+        self.count = 0
+
+    def submit(self, func: Callable[..., Any], *args: Any) -> Future:
+        future: Future = Future()
+        self.queue.put((future, functools.partial(func, *args)))
+        self.count += 1
+        return future
+
+    def start(self) -> None:
+        for _ in range(min(self.workers, self.count)):
+            threading.Thread(target=self.work, daemon=True).start()
+
+    def work(self) -> None:
+        while True:
+            try:
+                future, func = self.queue.get_nowait()
+            except Empty:
+                return
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                future.set_result(func())
+            except Exception as e:
+                future.set_exception(e)
+
+
+def probe_result(future: Future) -> tuple[str, dict[str, Any], str | None]:
+    if not future.done() or future.cancelled():
+        return "timeout", {}, None
+    exception = future.exception()
+    if exception is not None:
+        return "error", {}, str(exception)
+    return "ok", future.result(), None
+
+
+def instance_health(instance_name: str, future: Future) -> InstanceHealth:
+    status, probe, error = probe_result(future)
+    if status != "ok":
+        log.warning("Health check of %s failed: %s", instance_name, error or status)
+    return InstanceHealth(
+        instance_name=instance_name, status=status, error=error, **probe
+    )
+
+
+def database_health(db_name: str, future: Future) -> DatabaseHealth:
+    status, probe, error = probe_result(future)
+    return DatabaseHealth(db_name=db_name, status=status, error=error, **probe)
@@ -0,0 +1,48 @@
+import json
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Any
+
+from addon import config, keyvalues, postgres, storage
+from addon.models.db import Session
+
+log = logging.getLogger(__name__)
+
+
+def get_report(instance_name: str, db_name: str, refresh: bool) -> dict[str, Any]:
+    key = cache_key(instance_name, db_name)
+    if not refresh:
+        with Session.begin() as dbsession:
+            cached = keyvalues.get_value(dbsession, key=key)
+        if cached is not None:
+            report = json.loads(cached)
+            generated = datetime.fromisoformat(report["generated"])
+            max_age = timedelta(seconds=config.INDEX_REPORT_CACHE_SECONDS)
+            if datetime.now(timezone.utc) - generated < max_age:
+                log.info(
+                    "Using cached index report for %s (%s)", db_name, instance_name
+                )
+                return report
+    admin_conn_str = storage.get_admin_conn_str(instance_name)
+    assert admin_conn_str is not None
+    report = {
+        "generated": datetime.now(timezone.utc).isoformat(),
+        **postgres.get_index_report(
+            admin_conn_str=admin_conn_str,
+            db_name=db_name,
+            min_live_tuples=config.INDEX_REPORT_MIN_LIVE_TUPLES,
+            limit=50,
+        ),
+    }
+    with Session.begin() as dbsession:
+        keyvalues.set_value(dbsession, key=key, value=json.dumps(report))
+    return report
+
+
+def clear_cached_report(instance_name: str, db_name: str) -> None:
+    with Session.begin() as dbsession:
+        keyvalues.delete_value(dbsession, key=cache_key(instance_name, db_name))
+
+
+def cache_key(instance_name: str, db_name: str) -> str:
+    return f"INDEX_REPORT_{instance_name}_{db_name}"
@@ -0,0 +1,152 @@
+import json
+import logging
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, TypeVar
+
+from fastapi import HTTPException
+from sqlalchemy.exc import IntegrityError
+
+from addon import config, storage
+from addon.models.db import Session
+
+log = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class Journal:
+    def __init__(
+        self,
+        operation_id: str,
+        completed: dict[str, Any],
+        response: dict[str, Any] | None,
+    ):
+        self.operation_id = operation_id
+        # results of the steps completed by a previous attempt
+        self.completed = completed
+        self.response = response
+
+    def step(self, name: str, func: Callable[[], T]) -> T:
+        # Results are stored as JSON and returned as is when resuming, steps
+        # must return something json.dumps accepts.
+        if name in self.completed:
+            log.info("Operation %s: %s already done", self.operation_id, name)
+            return self.completed[name]
+        log.info("Operation %s: %s", self.operation_id, name)
+        start = time.perf_counter()
+        try:
+            result = func()
+        except Exception as e:
+            storage.add_operation_step(
+                operation_id=self.operation_id,
+                name=name,
+                status="failed",
+                duration=time.perf_counter() - start,
+                result=None,
+                error=str(e),
+            )
+            raise
+        storage.add_operation_step(
+            operation_id=self.operation_id,
+            name=name,
+            status="complete",
+            duration=time.perf_counter() - start,
+            result=json.dumps(result),
+            error=None,
+        )
+        self.completed[name] = result
+        return result
+
+    def run(self, func: Callable[[], dict[str, Any]]) -> dict[str, Any]:
+        if self.response is not None:
+            log.info("Operation %s already complete", self.operation_id)
+            return self.response
+        try:
+            response = func()
+        except Exception as e:
+            storage.finish_operation(
+                operation_id=self.operation_id,
+                status="failed",
+                response=None,
+                error=str(e),
+            )
+            raise
+        storage.finish_operation(
+            operation_id=self.operation_id,
+            status="complete",
+            response=json.dumps(response),
+            error=None,
+        )
+        return response
+
+
+def begin(
+    kind: str,
+    instance_name: str,
+    request: dict[str, Any],
+    idempotency_key: str | None,
+) -> Journal:
+    request_str = json.dumps(request, sort_keys=True)
+    if idempotency_key is not None:
+        with Session.begin() as dbsession:
+            operation = storage.get_operation_by_idempotency_key(
+                dbsession, idempotency_key
+            )
+            if operation is not None:
+                if (
+                    operation.kind != kind
+                    or operation.instance_name != instance_name
+                    or operation.request != request_str
+                ):
+                    raise HTTPException(
+                        422,
+                        f"Idempotency key {idempotency_key} was used"
+                        " for a different request",
+                    )
+                operation_id = operation.id
+                status = operation.status
+                updated = operation.updated
+                response = (
+                    json.loads(operation.response)
+                    if operation.response is not None
+                    else None
+                )
+                completed = {
+                    step.name: json.loads(step.result)
+                    for step in operation.steps
+                    if step.status == "complete" and step.result is not None
+                }
+        if operation is not None:
+            if status == "complete":
+                return Journal(operation_id, completed, response)
+            stale_before = datetime.now(timezone.utc) - timedelta(
+                seconds=config.OPERATION_STALE_SECONDS
+            )
+            if status == "running" and updated > stale_before:
+                # the first attempt may still be going, e.g. the client timed out
+                raise HTTPException(
+                    409, f"Operation {idempotency_key} still in progress"
+                )
+            if not storage.restart_operation(operation_id, status, updated):
+                raise HTTPException(
+                    409, f"Operation {idempotency_key} still in progress"
+                )
+            return Journal(operation_id, completed, None)
+    try:
+        operation_id = storage.add_operation(
+            kind=kind,
+            instance_name=instance_name,
+            request=request_str,
+            idempotency_key=idempotency_key,
+        )
+    except IntegrityError:
+        raise HTTPException(409, f"Operation {idempotency_key} still in progress")
+    return Journal(operation_id, {}, None)
+
+
+def prune_operations() -> None:
+    storage.prune_operations(
+        before=datetime.now(timezone.utc)
+        - timedelta(days=config.OPERATION_HISTORY_DAYS)
+    )
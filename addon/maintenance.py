@@ -0,0 +1,210 @@
+import logging
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Literal
+
+import psycopg
+
+from addon import config, postgres, storage
+from addon.models.db import Session
+
+log = logging.getLogger(__name__)
+
+Operation = Literal["vacuum", "reindex", "autovacuum"]
+
+OPERATIONS: tuple[Operation, ...] = ("vacuum", "reindex", "autovacuum")
+
+
+@dataclass
+class MaintenanceResult:
+    db_name: str
+    operation: str
+    status: str
+    duration: float
+    error: str | None
+
+
+def run_all_instances() -> None:
+    with Session.begin() as dbsession:
+        instances = {
+            instance.name: [database.name for database in instance.databases]
+            for instance in storage.get_instances(dbsession)
+        }
+    for instance_name, db_names in instances.items():
+        run_maintenance(
+            instance_name=instance_name,
+            db_names=db_names,
+            operations=list(OPERATIONS),
+            timeout_seconds=config.MAINTENANCE_TIMEOUT_SECONDS,
+        )
+
+
+def run_maintenance(
+    instance_name: str,
+    db_names: list[str],
+    operations: list[Operation],
+    timeout_seconds: int,
+) -> list[MaintenanceResult]:
+    log.info(
+        "Running maintenance %s on %d database(s) of %s",
+        operations,
+        len(db_names),
+        instance_name,
+    )
+    admin_conn_str = storage.get_admin_conn_str(instance_name)
+    assert admin_conn_str is not None
+
+    def run_database(db_name: str) -> list[MaintenanceResult]:
+        results = []
+        for operation in operations:
+            result = run_operation(
+                admin_conn_str=admin_conn_str,
+                instance_name=instance_name,
+                db_name=db_name,
+                operation=operation,
+                timeout_seconds=timeout_seconds,
+            )
+            storage.add_maintenance_run(
+                instance_name=instance_name,
+                db_name=db_name,
+                operation=operation,
+                status=result.status,
+                duration=result.duration,
+                error=result.error,
+            )
+            results.append(result)
+        return results
+
+    with ThreadPoolExecutor(max_workers=config.MAINTENANCE_WORKERS) as executor:
+        return [
+            result
+            for results in executor.map(run_database, db_names)
+            for result in results
+        ]
+
+
+def queue_maintenance(
+    instance_name: str,
+    db_names: list[str],
+    operations: list[Operation],
+    timeout_seconds: int,
+) -> list[str]:
+    return storage.add_queued_maintenance_runs(
+        instance_name=instance_name,
+        db_names=db_names,
+        operations=list(operations),
+        timeout_seconds=timeout_seconds,
+    )
+
+
+def run_queued_maintenance() -> None:
+    # Runs left "running" by a cron run that was killed would stay so forever.
+    storage.fail_stale_maintenance_runs(
+        before=datetime.now(timezone.utc)
+        - timedelta(seconds=config.MAINTENANCE_TIMEOUT_SECONDS)
+    )
+    while True:
+        claimed = storage.claim_maintenance_runs()
+        if claimed is None:
+            return
+        instance_name, runs = claimed
+        with Session.begin() as dbsession:
+            instance = storage.get_instance_by_name(dbsession, instance_name)
+            instance_exists = instance is not None
+        if not instance_exists:
+            for run_id, _, _, _ in runs:
+                storage.finish_maintenance_run(
+                    run_id=run_id,
+                    status="error",
+                    duration=0.0,
+                    error=f"Instance {instance_name} was removed",
+                )
+            continue
+        admin_conn_str = storage.get_admin_conn_str(instance_name)
+        assert admin_conn_str is not None
+        # operations on a database one after the other, like run_maintenance
+        runs_by_db: dict[str, list[tuple[str, str, int | None]]] = defaultdict(list)
+        for run_id, db_name, operation, timeout_seconds in runs:
+            runs_by_db[db_name].append((run_id, operation, timeout_seconds))
+
+        def run_database(db_name: str) -> None:
+            for run_id, operation, timeout_seconds in runs_by_db[db_name]:
+                result = run_operation(
+                    admin_conn_str=admin_conn_str,
+                    instance_name=instance_name,
+                    db_name=db_name,
+                    operation=operation,
+                    timeout_seconds=timeout_seconds
+                    or config.MAINTENANCE_TIMEOUT_SECONDS,
+                )
+                storage.finish_maintenance_run(
+                    run_id=run_id,
+                    status=result.status,
+                    duration=result.duration,
+                    error=result.error,
+                )
+
+        with ThreadPoolExecutor(max_workers=config.MAINTENANCE_WORKERS) as executor:
+            list(executor.map(run_database, runs_by_db))
+
+
+def prune_maintenance_runs() -> None:
+    storage.prune_maintenance_runs(
+        before=datetime.now(timezone.utc)
+        - timedelta(days=config.MAINTENANCE_HISTORY_DAYS)
+    )
+
+
+def run_operation(
+    admin_conn_str: str,
+    instance_name: str,
+    db_name: str,
+    operation: str,
+    timeout_seconds: int,
+) -> MaintenanceResult:
+    start = time.perf_counter()
+    status = "success"
+    error: str | None = None
+    try:
+        if operation == "vacuum":
+            postgres.vacuum_analyze(
+                admin_conn_str=admin_conn_str,
+                db_name=db_name,
+                timeout_seconds=timeout_seconds,
+            )
+        elif operation == "reindex":
+            postgres.reindex(
+                admin_conn_str=admin_conn_str,
+                db_name=db_name,
+                timeout_seconds=timeout_seconds,
+            )
+        elif operation == "autovacuum":
+            postgres.tune_autovacuum(
+                admin_conn_str=admin_conn_str,
+                db_name=db_name,
+                timeout_seconds=timeout_seconds,
+                min_live_tuples=config.AUTOVACUUM_MIN_LIVE_TUPLES,
+                vacuum_scale_factor=config.AUTOVACUUM_VACUUM_SCALE_FACTOR,
+                analyze_scale_factor=config.AUTOVACUUM_ANALYZE_SCALE_FACTOR,
+            )
+        else:
+            raise ValueError(f"Unknown maintenance operation {operation}")
+    except psycopg.errors.QueryCanceled as e:
+        log.warning("%s on %s (%s) timed out", operation, db_name, instance_name)
+        status = "timeout"
+        error = str(e)
+    except Exception as e:
+        log.exception("%s on %s (%s) failed", operation, db_name, instance_name)
+        status = "error"
+        error = str(e)
+    duration = time.perf_counter() - start
+    return MaintenanceResult(
+        db_name=db_name,
+        operation=operation,
+        status=status,
+        duration=duration,
+        error=error,
+    )
@@ -0,0 +1,156 @@
+import logging
+import time
+from collections import defaultdict
+
+from sqlalchemy import select
+from sqlalchemy.dialects.sqlite import insert
+
+from addon import timing
+from addon.models import MetricValue
+from addon.models.db import Session
+
+log = logging.getLogger(__name__)
+
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+CATEGORY_METRICS = {
+    "disco": ("addon_disco_calls", "call"),
+    "postgres": ("addon_postgres_operations", "operation"),
+    "storage": ("addon_storage_transactions", "result"),
+}
+
+
+class MetricsMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] == "/metrics":
+            # no write transaction for every scrape
+            await self.app(scope, receive, send)
+            return
+        start = time.perf_counter()
+        status_code = 500
+
+        async def send_with_status(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            route = scope.get("route")
+            try:
+                save(
+                    request_increments(
+                        method=scope["method"],
+                        route=route.path if route is not None else "unmatched",
+                        status_code=status_code,
+                        duration=time.perf_counter() - start,
+                        timings=timing.request_timings.get() or [],
+                    )
+                )
+            except Exception:
+                log.exception("Failed to save metrics")
+
+
+def request_increments(
+    method: str,
+    route: str,
+    status_code: int,
+    duration: float,
+    timings: list[timing.Timing],
+) -> dict[tuple[str, str], float]:
+    increments: dict[tuple[str, str], float] = defaultdict(float)
+    increments[
+        (
+            "addon_http_requests_total",
+            labels(method=method, route=route, status=str(status_code)),
+        )
+    ] += 1
+    observe(
+        increments,
+        "addon_http_request_duration_seconds",
+        duration,
+        method=method,
+        route=route,
+    )
+    for call in timings:
+        name, label = CATEGORY_METRICS[call.category]
+        if call.status is not None:
+            status = call.status
+        else:
+            status = "error" if call.error else "ok"
+        increments[
+            (f"{name}_total", labels(**{label: call.name, "status": status}))
+        ] += 1
+        observe(
+            increments, f"{name}_duration_seconds", call.duration, **{label: call.name}
+        )
+    return increments
+
+
+def observe(
+    increments: dict[tuple[str, str], float], name: str, value: float, **label_values
+) -> None:
+    for bucket in BUCKETS:
+        if value <= bucket:
+            increments[(f"{name}_bucket", labels(**label_values, le=str(bucket)))] += 1
+    increments[(f"{name}_bucket", labels(**label_values, le="+Inf"))] += 1
+    increments[(f"{name}_sum", labels(**label_values))] += value
+    increments[(f"{name}_count", labels(**label_values))] += 1
+
+
+def labels(**label_values: str) -> str:
+    return ",".join(
+        f'{key}="{escape(value)}"' for key, value in sorted(label_values.items())
+    )
+
+
+def escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def save(increments: dict[tuple[str, str], float]) -> None:
+    if len(increments) == 0:
+        return
+    stmt = insert(MetricValue).values(
+        [
+            {"name": name, "labels": label_str, "value": value}
+            for (name, label_str), value in increments.items()
+        ]
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[MetricValue.name, MetricValue.labels],
+        set_={"value": MetricValue.value + stmt.excluded.value},
+    )
+    with Session.begin() as dbsession:
+        dbsession.execute(stmt)
+
+
+def render() -> str:
+    with Session.begin() as dbsession:
+        result = dbsession.execute(
+            select(MetricValue.name, MetricValue.labels, MetricValue.value).order_by(
+                MetricValue.name, MetricValue.labels
+            )
+        )
+        rows = result.all()
+    lines = []
+    declared: set[str] = set()
+    for name, label_str, value in rows:
+        family, metric_type = metric_family(name)
+        if family not in declared:
+            lines.append(f"# TYPE {family} {metric_type}")
+            declared.add(family)
+        lines.append(f"{name}{{{label_str}}} {value:g}")
+    return "\n".join(lines) + "\n"
+
+
+def metric_family(name: str) -> tuple[str, str]:
+    for suffix in ("_bucket", "_sum", "_count"):
+        if name.endswith(suffix) and name.removesuffix(suffix).endswith("_seconds"):
+            return name.removesuffix(suffix), "histogram"
+    return name, "counter"
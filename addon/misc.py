@@ -1,5 +1,8 @@
+import json
+import re
 import secrets
 import string
+from urllib.parse import quote, urlencode
 
 
 def assert_status_code(response, status_code):
@@ -11,12 +14,40 @@ def assert_status_code(response, status_code):
 
 
 def conn_string(
-    user: str, password: str, postgres_project_name: str, db_name: str | None
+    user: str,
+    password: str,
+    postgres_project_name: str,
+    db_name: str | None,
+    params: dict[str, str] | None = None,
 ) -> str:
     instance_url = f"postgresql://{user}:{password}@{postgres_project_name}-postgres"
     if db_name is None:
         return instance_url
-    return f"{instance_url}/{db_name}"
+    if not params:
+        return f"{instance_url}/{db_name}"
+    # libpq does not decode + as a space, so spaces are percent-encoded
+    query = urlencode(sorted(params.items()), quote_via=quote)
+    return f"{instance_url}/{db_name}?{query}"
+
+
+def load_conn_params(conn_params: str | None) -> dict[str, str] | None:
+    if conn_params is None:
+        return None
+    return json.loads(conn_params)
+
+
+def shared_preload_libraries(stat_statements: bool) -> list[str]:
+    libraries = []
+    if stat_statements:
+        libraries.append("pg_stat_statements")
+    return libraries
+
+
+def major_version(version: str) -> int | None:
+    match = re.match(r"^([0-9]+)", version)
+    if match is None:
+        return None
+    return int(match.group(1))
 
 
 def instance_project_name(instance_name: str) -> str:
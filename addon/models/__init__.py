@@ -2,8 +2,17 @@ from sqlalchemy.orm import configure_mappers
 
 from addon.models.attachment import Attachment  # noqa: F401
 from addon.models.database import Database  # noqa: F401
+from addon.models.databasemove import DatabaseMove  # noqa: F401
+from addon.models.databasesize import DatabaseSize  # noqa: F401
 from addon.models.instance import Instance  # noqa: F401
+from addon.models.instanceupgrade import InstanceUpgrade  # noqa: F401
 from addon.models.keyvalue import KeyValue  # noqa: F401
+from addon.models.maintenancerun import MaintenanceRun  # noqa: F401
+from addon.models.metricvalue import MetricValue  # noqa: F401
+from addon.models.operation import Operation  # noqa: F401
+from addon.models.operationstep import OperationStep  # noqa: F401
+from addon.models.pooldatabase import PoolDatabase  # noqa: F401
+from addon.models.schema import Schema  # noqa: F401
 from addon.models.user import User  # noqa: F401
 
 configure_mappers()
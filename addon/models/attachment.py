@@ -4,7 +4,7 @@ from datetime import datetime, timezone
 from secrets import token_hex
 from typing import TYPE_CHECKING
 
-from sqlalchemy import ForeignKey, String
+from sqlalchemy import ForeignKey, String, UnicodeText
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 if TYPE_CHECKING:
@@ -34,6 +34,7 @@ class Attachment(Base):
     )
     project_name = mapped_column(String(255), nullable=False)
     env_var = mapped_column(String(255), nullable=False)
+    conn_params: Mapped[str | None] = mapped_column(UnicodeText())
     user_id: Mapped[str] = mapped_column(
         String(32),
         ForeignKey("users.id"),
@@ -4,12 +4,13 @@ from datetime import datetime, timezone
 from secrets import token_hex
 from typing import TYPE_CHECKING
 
-from sqlalchemy import ForeignKey, String
+from sqlalchemy import BigInteger, Boolean, Float, ForeignKey, String
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 if TYPE_CHECKING:
     from addon.models import (
         Instance,
+        Schema,
         User,
     )
 
@@ -34,6 +35,17 @@ class Database(Base):
         nullable=False,
     )
     name: Mapped[str] = mapped_column(String(255), nullable=False)
+    shared: Mapped[bool] = mapped_column(
+        Boolean, nullable=False, default=False, server_default="0"
+    )
+    size: Mapped[int | None] = mapped_column(BigInteger)
+    size_measured: Mapped[datetime | None] = mapped_column(DateTimeTzAware())
+    size_growth_per_day: Mapped[float | None] = mapped_column(Float)
+    soft_quota: Mapped[int | None] = mapped_column(BigInteger)
+    hard_quota: Mapped[int | None] = mapped_column(BigInteger)
+    quota_blocked: Mapped[bool] = mapped_column(
+        Boolean, nullable=False, default=False, server_default="0"
+    )
     instance_id: Mapped[str] = mapped_column(
         String(32),
         ForeignKey("instances.id"),
@@ -49,6 +61,10 @@ class Database(Base):
         "User",
         back_populates="database",
     )
+    schemas: Mapped[list[Schema]] = relationship(
+        "Schema",
+        back_populates="database",
+    )
 
     def log(self):
         return f"DATABASE_{self.name} ({self.instance.name})"
@@ -0,0 +1,47 @@
+from __future__ import annotations
+
+from datetime import datetime, timezone
+from secrets import token_hex
+
+from sqlalchemy import BigInteger, Boolean, String, UnicodeText
+from sqlalchemy.orm import Mapped, mapped_column
+
+from addon.models.meta import Base, DateTimeTzAware
+
+
+class DatabaseMove(Base):
+    __tablename__ = "database_moves"
+
+    id: Mapped[str] = mapped_column(
+        String(32), default=lambda: token_hex(16), primary_key=True
+    )
+    created: Mapped[datetime] = mapped_column(
+        DateTimeTzAware(),
+        default=lambda: datetime.now(timezone.utc),
+        nullable=False,
+    )
+    updated: Mapped[datetime] = mapped_column(
+        DateTimeTzAware(),
+        default=lambda: datetime.now(timezone.utc),
+        onupdate=lambda: datetime.now(timezone.utc),
+        nullable=False,
+    )
+    db_name: Mapped[str] = mapped_column(String(255), nullable=False)
+    source_instance_name: Mapped[str] = mapped_column(
+        String(255), nullable=False, index=True
+    )
+    target_instance_name: Mapped[str] = mapped_column(String(255), nullable=False)
+    status: Mapped[str] = mapped_column(String(32), nullable=False)
+    phases: Mapped[str] = mapped_column(UnicodeText(), nullable=False)
+    lag_bytes: Mapped[int | None] = mapped_column(BigInteger())
+    error: Mapped[str | None] = mapped_column(UnicodeText())
+    max_lag_bytes: Mapped[int | None] = mapped_column(BigInteger())
+    allow_restart: Mapped[bool] = mapped_column(
+        Boolean, nullable=False, default=False, server_default="0"
+    )
+    # kept until the move is complete or failed, an interrupted move is
+    # finished or rolled back by the next cron run
+    api_key: Mapped[str | None] = mapped_column(String(255))
+
+    def log(self):
+        return f"DATABASE_MOVE_{self.id} ({self.db_name})"
@@ -0,0 +1,43 @@
+from __future__ import annotations
+
+from datetime import datetime, timezone
+from secrets import token_hex
+from typing import TYPE_CHECKING
+
+from sqlalchemy import BigInteger, ForeignKey, String
+from sqlalchemy.orm import Mapped, mapped_column, relationship
+
+if TYPE_CHECKING:
+    from addon.models import (
+        Database,
+    )
+
+from addon.models.meta import Base, DateTimeTzAware
+
+
+class DatabaseSize(Base):
+    __tablename__ = "database_sizes"
+
+    id: Mapped[str] = mapped_column(
+        String(32), default=lambda: token_hex(16), primary_key=True
+    )
+    created: Mapped[datetime] = mapped_column(
+        DateTimeTzAware(),
+        default=lambda: datetime.now(timezone.utc),
+        nullable=False,
+        index=True,
+    )
+    size: Mapped[int] = mapped_column(BigInteger, nullable=False)
+    database_id: Mapped[str] = mapped_column(
+        String(32),
+        ForeignKey("databases.id"),
+        nullable=False,
+        index=True,
+    )
+
+    database: Mapped[Database] = relationship(
+        "Database",
+    )
+
+    def log(self):
+        return f"DATABASE_SIZE_{self.id} ({self.database.name})"
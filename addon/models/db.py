@@ -1,8 +1,9 @@
 import logging
 
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
 from sqlalchemy.orm import sessionmaker
 
+from addon import timing
 from addon.config import SQLALCHEMY_DATABASE_URL
 
 log = logging.getLogger(__name__)
@@ -11,4 +12,16 @@ log = logging.getLogger(__name__)
 engine = create_engine(
     SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
 )
+
+
+@event.listens_for(engine, "connect")
+def set_journal_mode(dbapi_connection, connection_record):
+    # Readers don't block writers, e.g. a slow client of a streamed export
+    # holds its read transaction for the whole response.
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL;")
+    cursor.close()
+
+
 Session = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+timing.instrument_sessions(Session)
@@ -4,12 +4,14 @@ from datetime import datetime, timezone
 from secrets import token_hex
 from typing import TYPE_CHECKING
 
-from sqlalchemy import String
+from sqlalchemy import Boolean, Float, Integer, String
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 if TYPE_CHECKING:
     from addon.models import (
         Database,
+        MaintenanceRun,
+        PoolDatabase,
     )
 
 from addon.models.meta import Base, DateTimeTzAware
@@ -37,11 +39,30 @@ class Instance(Base):
     version: Mapped[str] = mapped_column(String(255), nullable=False)
     admin_user: Mapped[str] = mapped_column(String(255), nullable=False)
     admin_password: Mapped[str] = mapped_column(String(255), nullable=False)
+    pool_size: Mapped[int] = mapped_column(
+        Integer, nullable=False, default=0, server_default="0"
+    )
+    stat_statements: Mapped[bool] = mapped_column(
+        Boolean, nullable=False, default=False, server_default="0"
+    )
+    max_query_seconds: Mapped[int | None] = mapped_column(Integer)
+    max_idle_in_transaction_seconds: Mapped[int | None] = mapped_column(Integer)
+    cpus: Mapped[float | None] = mapped_column(Float)
+    memory: Mapped[str | None] = mapped_column(String(32))
+    shm_size: Mapped[str | None] = mapped_column(String(32))
 
     databases: Mapped[list[Database]] = relationship(
         "Database",
         back_populates="instance",
     )
+    pool_databases: Mapped[list[PoolDatabase]] = relationship(
+        "PoolDatabase",
+        back_populates="instance",
+    )
+    maintenance_runs: Mapped[list[MaintenanceRun]] = relationship(
+        "MaintenanceRun",
+        back_populates="instance",
+    )
 
     def log(self):
         return f"INSTANCE_{self.name}"
@@ -0,0 +1,43 @@
+from __future__ import annotations
+
+from datetime import datetime, timezone
+from secrets import token_hex
+
+from sqlalchemy import Integer, String, UnicodeText
+from sqlalchemy.orm import Mapped, mapped_column
+
+from addon.models.meta import Base, DateTimeTzAware
+
+
+class InstanceUpgrade(Base):
+    __tablename__ = "instance_upgrades"
+
+    id: Mapped[str] = mapped_column(
+        String(32), default=lambda: token_hex(16), primary_key=True
+    )
+    created: Mapped[datetime] = mapped_column(
+        DateTimeTzAware(),
+        default=lambda: datetime.now(timezone.utc),
+        nullable=False,
+    )
+    updated: Mapped[datetime] = mapped_column(
+        DateTimeTzAware(),
+        default=lambda: datetime.now(timezone.utc),
+        onupdate=lambda: datetime.now(timezone.utc),
+        nullable=False,
+    )
+    instance_name: Mapped[str] = mapped_column(String(255), nullable=False, index=True)
+    target_instance_name: Mapped[str | None] = mapped_column(String(255))
+    method: Mapped[str] = mapped_column(String(32), nullable=False)
+    from_version: Mapped[str] = mapped_column(String(255), nullable=False)
+    to_version: Mapped[str] = mapped_column(String(255), nullable=False)
+    status: Mapped[str] = mapped_column(String(32), nullable=False)
+    phases: Mapped[str] = mapped_column(UnicodeText(), nullable=False)
+    error: Mapped[str | None] = mapped_column(UnicodeText())
+    image: Mapped[str | None] = mapped_column(String(255))
+    jobs: Mapped[int | None] = mapped_column(Integer)
+    # only kept until the cron job picks the upgrade up
+    api_key: Mapped[str | None] = mapped_column(String(255))
+
+    def log(self):
+        return f"INSTANCE_UPGRADE_{self.id} ({self.instance_name})"
@@ -0,0 +1,54 @@
+from __future__ import annotations
+
+from datetime import datetime, timezone
+from secrets import token_hex
+from typing import TYPE_CHECKING
+
+from sqlalchemy import Float, ForeignKey, Integer, String, UnicodeText
+from sqlalchemy.orm import Mapped, mapped_column, relationship
+
+if TYPE_CHECKING:
+    from addon.models import (
+        Instance,
+    )
+
+from addon.models.meta import Base, DateTimeTzAware
+
+
+class MaintenanceRun(Base):
+    __tablename__ = "maintenance_runs"
+
+    id: Mapped[str] = mapped_column(
+        String(32), default=lambda: token_hex(16), primary_key=True
+    )
+    created: Mapped[datetime] = mapped_column(
+        DateTimeTzAware(),
+        default=lambda: datetime.now(timezone.utc),
+        nullable=False,
+    )
+    updated: Mapped[datetime] = mapped_column(
+        DateTimeTzAware(),
+        default=lambda: datetime.now(timezone.utc),
+        onupdate=lambda: datetime.now(timezone.utc),
+        nullable=False,
+    )
+    db_name: Mapped[str] = mapped_column(String(255), nullable=False)
+    operation: Mapped[str] = mapped_column(String(32), nullable=False)
+    status: Mapped[str] = mapped_column(String(32), nullable=False)
+    duration: Mapped[float | None] = mapped_column(Float)
+    timeout_seconds: Mapped[int | None] = mapped_column(Integer)
+    error: Mapped[str | None] = mapped_column(UnicodeText())
+    instance_id: Mapped[str] = mapped_column(
+        String(32),
+        ForeignKey("instances.id"),
+        nullable=False,
+        index=True,
+    )
+
+    instance: Mapped[Instance] = relationship(
+        "Instance",
+        back_populates="maintenance_runs",
+    )
+
+    def log(self):
+        return f"MAINTENANCE_RUN_{self.id} ({self.db_name}, {self.instance.name})"
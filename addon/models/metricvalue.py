@@ -0,0 +1,12 @@
+from sqlalchemy import Float, String
+from sqlalchemy.orm import Mapped, mapped_column
+
+from addon.models.meta import Base
+
+
+class MetricValue(Base):
+    __tablename__ = "metric_values"
+
+    name: Mapped[str] = mapped_column(String(255), primary_key=True)
+    labels: Mapped[str] = mapped_column(String(1024), primary_key=True)
+    value: Mapped[float] = mapped_column(Float, nullable=False)
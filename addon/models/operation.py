@@ -0,0 +1,51 @@
+from __future__ import annotations
+
+from datetime import datetime, timezone
+from secrets import token_hex
+from typing import TYPE_CHECKING
+
+from sqlalchemy import String, UnicodeText
+from sqlalchemy.orm import Mapped, mapped_column, relationship
+
+if TYPE_CHECKING:
+    from addon.models import (
+        OperationStep,
+    )
+
+from addon.models.meta import Base, DateTimeTzAware
+
+
+class Operation(Base):
+    __tablename__ = "operations"
+
+    id: Mapped[str] = mapped_column(
+        String(32), default=lambda: token_hex(16), primary_key=True
+    )
+    created: Mapped[datetime] = mapped_column(
+        DateTimeTzAware(),
+        default=lambda: datetime.now(timezone.utc),
+        nullable=False,
+        index=True,
+    )
+    updated: Mapped[datetime] = mapped_column(
+        DateTimeTzAware(),
+        default=lambda: datetime.now(timezone.utc),
+        onupdate=lambda: datetime.now(timezone.utc),
+        nullable=False,
+    )
+    idempotency_key: Mapped[str | None] = mapped_column(String(255), unique=True)
+    kind: Mapped[str] = mapped_column(String(32), nullable=False)
+    instance_name: Mapped[str] = mapped_column(String(255), nullable=False, index=True)
+    request: Mapped[str] = mapped_column(UnicodeText(), nullable=False)
+    status: Mapped[str] = mapped_column(String(32), nullable=False)
+    response: Mapped[str | None] = mapped_column(UnicodeText())
+    error: Mapped[str | None] = mapped_column(UnicodeText())
+
+    steps: Mapped[list[OperationStep]] = relationship(
+        "OperationStep",
+        back_populates="operation",
+        order_by="OperationStep.created",
+    )
+
+    def log(self):
+        return f"OPERATION_{self.id} ({self.kind}, {self.instance_name})"
@@ -0,0 +1,47 @@
+from __future__ import annotations
+
+from datetime import datetime, timezone
+from secrets import token_hex
+from typing import TYPE_CHECKING
+
+from sqlalchemy import Float, ForeignKey, String, UnicodeText
+from sqlalchemy.orm import Mapped, mapped_column, relationship
+
+if TYPE_CHECKING:
+    from addon.models import (
+        Operation,
+    )
+
+from addon.models.meta import Base, DateTimeTzAware
+
+
+class OperationStep(Base):
+    __tablename__ = "operation_steps"
+
+    id: Mapped[str] = mapped_column(
+        String(32), default=lambda: token_hex(16), primary_key=True
+    )
+    created: Mapped[datetime] = mapped_column(
+        DateTimeTzAware(),
+        default=lambda: datetime.now(timezone.utc),
+        nullable=False,
+    )
+    name: Mapped[str] = mapped_column(String(255), nullable=False)
+    status: Mapped[str] = mapped_column(String(32), nullable=False)
+    duration: Mapped[float] = mapped_column(Float, nullable=False)
+    result: Mapped[str | None] = mapped_column(UnicodeText())
+    error: Mapped[str | None] = mapped_column(UnicodeText())
+    operation_id: Mapped[str] = mapped_column(
+        String(32),
+        ForeignKey("operations.id"),
+        nullable=False,
+        index=True,
+    )
+
+    operation: Mapped[Operation] = relationship(
+        "Operation",
+        back_populates="steps",
+    )
+
+    def log(self):
+        return f"OPERATION_STEP_{self.id} ({self.name}, {self.operation.kind})"
@@ -0,0 +1,49 @@
+from __future__ import annotations
+
+from datetime import datetime, timezone
+from secrets import token_hex
+from typing import TYPE_CHECKING
+
+from sqlalchemy import ForeignKey, String
+from sqlalchemy.orm import Mapped, mapped_column, relationship
+
+if TYPE_CHECKING:
+    from addon.models import (
+        Instance,
+    )
+
+from addon.models.meta import Base, DateTimeTzAware
+
+
+class PoolDatabase(Base):
+    __tablename__ = "pool_databases"
+
+    id: Mapped[str] = mapped_column(
+        String(32), default=lambda: token_hex(16), primary_key=True
+    )
+    created: Mapped[datetime] = mapped_column(
+        DateTimeTzAware(),
+        default=lambda: datetime.now(timezone.utc),
+        nullable=False,
+    )
+    updated: Mapped[datetime] = mapped_column(
+        DateTimeTzAware(),
+        default=lambda: datetime.now(timezone.utc),
+        onupdate=lambda: datetime.now(timezone.utc),
+        nullable=False,
+    )
+    name: Mapped[str] = mapped_column(String(255), nullable=False)
+    instance_id: Mapped[str] = mapped_column(
+        String(32),
+        ForeignKey("instances.id"),
+        nullable=False,
+        index=True,
+    )
+
+    instance: Mapped[Instance] = relationship(
+        "Instance",
+        back_populates="pool_databases",
+    )
+
+    def log(self):
+        return f"POOL_DATABASE_{self.name} ({self.instance.name})"
@@ -0,0 +1,54 @@
+from __future__ import annotations
+
+from datetime import datetime, timezone
+from secrets import token_hex
+from typing import TYPE_CHECKING
+
+from sqlalchemy import ForeignKey, String
+from sqlalchemy.orm import Mapped, mapped_column, relationship
+
+if TYPE_CHECKING:
+    from addon.models import (
+        Database,
+        User,
+    )
+
+from addon.models.meta import Base, DateTimeTzAware
+
+
+class Schema(Base):
+    __tablename__ = "schemas"
+
+    id: Mapped[str] = mapped_column(
+        String(32), default=lambda: token_hex(16), primary_key=True
+    )
+    created: Mapped[datetime] = mapped_column(
+        DateTimeTzAware(),
+        default=lambda: datetime.now(timezone.utc),
+        nullable=False,
+    )
+    updated: Mapped[datetime] = mapped_column(
+        DateTimeTzAware(),
+        default=lambda: datetime.now(timezone.utc),
+        onupdate=lambda: datetime.now(timezone.utc),
+        nullable=False,
+    )
+    name: Mapped[str] = mapped_column(String(255), nullable=False)
+    database_id: Mapped[str] = mapped_column(
+        String(32),
+        ForeignKey("databases.id"),
+        nullable=False,
+        index=True,
+    )
+
+    database: Mapped[Database] = relationship(
+        "Database",
+        back_populates="schemas",
+    )
+    users: Mapped[list[User]] = relationship(
+        "User",
+        back_populates="schema",
+    )
+
+    def log(self):
+        return f"SCHEMA_{self.name} ({self.database.name})"
@@ -4,13 +4,14 @@ from datetime import datetime, timezone
 from secrets import token_hex
 from typing import TYPE_CHECKING
 
-from sqlalchemy import ForeignKey, String
+from sqlalchemy import ForeignKey, Integer, String
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 if TYPE_CHECKING:
     from addon.models import (
         Attachment,
         Database,
+        Schema,
     )
 
 from addon.models.meta import Base, DateTimeTzAware
@@ -35,17 +36,30 @@ class User(Base):
     )
     name: Mapped[str] = mapped_column(String(255), nullable=False)
     password: Mapped[str] = mapped_column(String(255), nullable=False)
+    connection_limit: Mapped[int | None] = mapped_column(Integer)
+    statement_timeout: Mapped[str | None] = mapped_column(String(32))
+    idle_in_transaction_session_timeout: Mapped[str | None] = mapped_column(String(32))
+    work_mem: Mapped[str | None] = mapped_column(String(32))
     database_id: Mapped[str] = mapped_column(
         String(32),
         ForeignKey("databases.id"),
         nullable=False,
         index=True,
     )
+    schema_id: Mapped[str | None] = mapped_column(
+        String(32),
+        ForeignKey("schemas.id"),
+        index=True,
+    )
 
     database: Mapped[Database] = relationship(
         "Database",
         back_populates="users",
     )
+    schema: Mapped[Schema | None] = relationship(
+        "Schema",
+        back_populates="users",
+    )
     attachments: Mapped[list[Attachment]] = relationship(
         "Attachment",
         back_populates="user",
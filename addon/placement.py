@@ -0,0 +1,182 @@
+import json
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Callable
+
+from addon import config, keyvalues, postgres, storage
+from addon.models.db import Session
+
+log = logging.getLogger(__name__)
+
+
+@dataclass
+class InstanceLoad:
+    instance_name: str
+    database_count: int
+    total_size: int
+    connections: int
+    active_connections: int
+    transactions_per_second: float | None
+
+
+Policy = Callable[[list[InstanceLoad]], dict[str, float]]
+
+POLICIES: dict[str, Policy] = {}
+
+
+def register_policy(name: str) -> Callable[[Policy], Policy]:
+    def decorator(policy: Policy) -> Policy:
+        POLICIES[name] = policy
+        return policy
+
+    return decorator
+
+
+@register_policy("databases")
+def fewest_databases(loads: list[InstanceLoad]) -> dict[str, float]:
+    return {load.instance_name: float(load.database_count) for load in loads}
+
+
+@register_policy("size")
+def smallest_size(loads: list[InstanceLoad]) -> dict[str, float]:
+    return {load.instance_name: float(load.total_size) for load in loads}
+
+
+@register_policy("connections")
+def fewest_connections(loads: list[InstanceLoad]) -> dict[str, float]:
+    return {load.instance_name: float(load.connections) for load in loads}
+
+
+BALANCED_WEIGHTS: dict[str, float] = {
+    "database_count": 1.0,
+    "total_size": 1.0,
+    "connections": 1.0,
+    "active_connections": 0.5,
+    "transactions_per_second": 1.0,
+}
+
+
+@register_policy("balanced")
+def balanced(loads: list[InstanceLoad]) -> dict[str, float]:
+    # Each metric is normalized against the busiest candidate so that
+    # bytes and connection counts weigh the same.
+    scores = {load.instance_name: 0.0 for load in loads}
+    for metric, weight in BALANCED_WEIGHTS.items():
+        values = {load.instance_name: getattr(load, metric) for load in loads}
+        if None in values.values():
+            # unknown is not idle, leave the metric out rather than favor
+            # the instances it's missing for
+            log.info("%s unknown for some instances, not used", metric)
+            continue
+        highest = max(values.values(), default=0.0)
+        if highest <= 0:
+            continue
+        for instance_name, value in values.items():
+            scores[instance_name] += weight * value / highest
+    return scores
+
+
+def get_loads(instance_names: list[str]) -> list[InstanceLoad]:
+    with Session.begin() as dbsession:
+        database_counts = {
+            instance.name: len(instance.databases)
+            for instance in storage.get_instances(dbsession)
+            if instance.name in instance_names
+        }
+    with ThreadPoolExecutor(max_workers=max(1, len(database_counts))) as executor:
+        loads = executor.map(
+            lambda item: get_load(instance_name=item[0], database_count=item[1]),
+            database_counts.items(),
+        )
+        return [load for load in loads if load is not None]
+
+
+def get_load(instance_name: str, database_count: int) -> InstanceLoad | None:
+    admin_conn_str = storage.get_admin_conn_str(instance_name)
+    assert admin_conn_str is not None
+    try:
+        stats = postgres.get_load(admin_conn_str)
+    except Exception:
+        log.exception("Could not read load of %s, not placing there", instance_name)
+        return None
+    return InstanceLoad(
+        instance_name=instance_name,
+        database_count=database_count,
+        total_size=stats["total_size"],
+        connections=stats["connections"],
+        active_connections=stats["active_connections"],
+        transactions_per_second=transactions_per_second(instance_name),
+    )
+
+
+def transactions_per_second(instance_name: str) -> float | None:
+    # None (unknown) when cron hasn't sampled the instance recently.
+    with Session.begin() as dbsession:
+        value = keyvalues.get_value(dbsession, key=sample_key(instance_name))
+    if value is None:
+        return None
+    sample = json.loads(value)
+    if time.time() - sample["time"] > config.PLACEMENT_SAMPLE_MAX_AGE_SECONDS:
+        return None
+    return sample.get("rate")
+
+
+def record_all_samples() -> None:
+    with Session.begin() as dbsession:
+        instance_names = [
+            instance.name for instance in storage.get_instances(dbsession)
+        ]
+    for instance_name in instance_names:
+        try:
+            record_sample(instance_name)
+        except Exception:
+            log.exception("Failed to sample transactions of %s", instance_name)
+
+
+def record_sample(instance_name: str) -> None:
+    # pg_stat_database is cumulative, the rate is computed between two
+    # consecutive cron runs.
+    admin_conn_str = storage.get_admin_conn_str(instance_name)
+    assert admin_conn_str is not None
+    transactions = postgres.get_transactions(admin_conn_str)
+    now = time.time()
+    rate: float | None = None
+    with Session.begin() as dbsession:
+        key = sample_key(instance_name)
+        previous = keyvalues.get_value(dbsession, key=key)
+        if previous is not None:
+            sample = json.loads(previous)
+            elapsed = now - sample["time"]
+            if (
+                0 < elapsed <= config.PLACEMENT_SAMPLE_MAX_AGE_SECONDS
+                and transactions >= sample["transactions"]
+            ):
+                rate = (transactions - sample["transactions"]) / elapsed
+        keyvalues.set_value(
+            dbsession,
+            key=key,
+            value=json.dumps({"transactions": transactions, "time": now, "rate": rate}),
+        )
+
+
+def choose_instance(
+    instance_names: list[str], policy: str
+) -> tuple[str | None, dict[str, float]]:
+    loads = get_loads(instance_names)
+    if len(loads) == 0:
+        return None, {}
+    scores = POLICIES[policy](loads)
+    instance_name = min(scores, key=lambda name: (scores[name], name))
+    log.info("Placing database on %s (%s): %s", instance_name, policy, scores)
+    return instance_name, scores
+
+
+def clear_sample(instance_name: str) -> None:
+    with Session.begin() as dbsession:
+        keyvalues.delete_value(dbsession, key=sample_key(instance_name))
+
+
+def sample_key(instance_name: str) -> str:
+    return f"PLACEMENT_SAMPLE_{instance_name}"
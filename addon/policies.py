@@ -0,0 +1,46 @@
+import logging
+
+from addon import postgres, storage
+from addon.models.db import Session
+
+log = logging.getLogger(__name__)
+
+
+def enforce_termination_policies() -> None:
+    with Session.begin() as dbsession:
+        policies = {
+            instance.name: (
+                instance.admin_user,
+                instance.max_query_seconds,
+                instance.max_idle_in_transaction_seconds,
+            )
+            for instance in storage.get_instances(dbsession)
+            if instance.max_query_seconds is not None
+            or instance.max_idle_in_transaction_seconds is not None
+        }
+    for instance_name, (
+        admin_user,
+        max_query_seconds,
+        max_idle_in_transaction_seconds,
+    ) in policies.items():
+        admin_conn_str = storage.get_admin_conn_str(instance_name)
+        assert admin_conn_str is not None
+        try:
+            terminated = postgres.terminate_long_running(
+                admin_conn_str=admin_conn_str,
+                admin_user=admin_user,
+                max_query_seconds=max_query_seconds,
+                max_idle_in_transaction_seconds=max_idle_in_transaction_seconds,
+            )
+        except Exception:
+            log.exception("Failed to enforce termination policy of %s", instance_name)
+            continue
+        for backend in terminated:
+            log.info(
+                "Terminated backend %d (%s, %s, %s) on %s",
+                backend["pid"],
+                backend["user_name"],
+                backend["db_name"],
+                backend["state"],
+                instance_name,
+            )
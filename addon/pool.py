@@ -0,0 +1,51 @@
+import logging
+
+from addon import misc, postgres, storage
+from addon.models.db import Session
+
+log = logging.getLogger(__name__)
+
+
+def refill_pools() -> None:
+    with Session.begin() as dbsession:
+        instances = storage.get_instances(dbsession)
+        pools = {
+            instance.name: (
+                instance.pool_size,
+                [pool_database.name for pool_database in instance.pool_databases],
+            )
+            for instance in instances
+        }
+    for instance_name, (pool_size, pool_db_names) in pools.items():
+        if len(pool_db_names) == pool_size:
+            continue
+        try:
+            refill_pool(
+                instance_name=instance_name,
+                pool_size=pool_size,
+                pool_db_names=pool_db_names,
+            )
+        except Exception:
+            log.exception("Failed to refill database pool of %s", instance_name)
+
+
+def refill_pool(instance_name: str, pool_size: int, pool_db_names: list[str]) -> None:
+    admin_conn_str = storage.get_admin_conn_str(instance_name)
+    assert admin_conn_str is not None
+    if len(pool_db_names) > pool_size:
+        log.info("Trimming database pool of %s to %d", instance_name, pool_size)
+        for db_name in pool_db_names[pool_size:]:
+            if not storage.remove_pool_db(instance_name, db_name):
+                # claimed since the pool was listed, it now belongs to a user
+                continue
+            postgres.drop_db(admin_conn_str=admin_conn_str, db_name=db_name)
+        return
+    log.info(
+        "Adding %d database(s) to pool of %s",
+        pool_size - len(pool_db_names),
+        instance_name,
+    )
+    for _ in range(pool_size - len(pool_db_names)):
+        db_name = misc.generate_db_name()
+        postgres.create_db(admin_conn_str=admin_conn_str, db_name=db_name)
+        storage.add_pool_db(instance_name, db_name)
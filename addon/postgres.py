@@ -1,10 +1,22 @@
 import logging
+import os
+import shlex
+import subprocess
+import tempfile
+import time
+from typing import Any
 
 import psycopg
+from psycopg import sql
+from psycopg.conninfo import conninfo_to_dict, make_conninfo
+from psycopg.rows import dict_row
+
+from addon import timing
 
 log = logging.getLogger(__name__)
 
 
+@timing.timed("postgres")
 def create_db(admin_conn_str: str, db_name: str) -> None:
     log.info("Creating database %s", db_name)
     user = f"{db_name}_owner"
@@ -24,6 +36,7 @@ def create_db(admin_conn_str: str, db_name: str) -> None:
             cur.execute(f"GRANT ALL ON SCHEMA public TO {user};")
 
 
+@timing.timed("postgres")
 def drop_db(admin_conn_str: str, db_name: str) -> None:
     log.info("Dropping database %s", db_name)
     with psycopg.connect(admin_conn_str) as conn:
@@ -32,6 +45,7 @@ def drop_db(admin_conn_str: str, db_name: str) -> None:
             cur.execute(f"DROP DATABASE {db_name} WITH (FORCE);")
 
 
+@timing.timed("postgres")
 def add_user(admin_conn_str: str, db_name: str, user: str, password: str) -> None:
     log.info("Adding user %s to database %s", user, db_name)
     owner_role = f"{db_name}_owner"
@@ -50,6 +64,90 @@ def add_user(admin_conn_str: str, db_name: str, user: str, password: str) -> Non
             cur.execute(f"GRANT ALL ON ALL FUNCTIONS IN SCHEMA public TO {user};")
 
 
+@timing.timed("postgres")
+def restrict_db(admin_conn_str: str, db_name: str) -> None:
+    # Shared databases hold one schema per tenant, tenants only get CONNECT
+    # through their schema's owner role.
+    log.info("Restricting access to shared database %s", db_name)
+    with psycopg.connect(f"{admin_conn_str}/{db_name}") as conn:
+        conn.autocommit = True
+        with conn.cursor() as cur:
+            cur.execute(f"REVOKE ALL ON DATABASE {db_name} FROM PUBLIC;")
+            cur.execute("REVOKE ALL ON SCHEMA public FROM PUBLIC;")
+
+
+@timing.timed("postgres")
+def add_schema_owner(admin_conn_str: str, db_name: str, schema_name: str) -> None:
+    log.info("Adding owner role for schema %s in %s", schema_name, db_name)
+    owner_role = f"{schema_name}_owner"
+    with psycopg.connect(admin_conn_str) as conn:
+        conn.autocommit = True
+        with conn.cursor() as cur:
+            cur.execute(f"CREATE ROLE {owner_role};")
+            cur.execute(
+                f"GRANT CONNECT, TEMPORARY ON DATABASE {db_name} TO {owner_role};"
+            )
+
+
+@timing.timed("postgres")
+def create_schema(admin_conn_str: str, db_name: str, schema_name: str) -> None:
+    log.info("Creating schema %s in %s", schema_name, db_name)
+    with psycopg.connect(f"{admin_conn_str}/{db_name}") as conn:
+        conn.autocommit = True
+        with conn.cursor() as cur:
+            cur.execute(
+                f"CREATE SCHEMA {schema_name} AUTHORIZATION {schema_name}_owner;"
+            )
+
+
+@timing.timed("postgres")
+def drop_schema(admin_conn_str: str, db_name: str, schema_name: str) -> None:
+    log.info("Dropping schema %s in %s", schema_name, db_name)
+    with psycopg.connect(f"{admin_conn_str}/{db_name}") as conn:
+        conn.autocommit = True
+        with conn.cursor() as cur:
+            cur.execute(f"DROP SCHEMA IF EXISTS {schema_name} CASCADE;")
+
+
+@timing.timed("postgres")
+def add_schema_user(
+    admin_conn_str: str, schema_name: str, user: str, password: str
+) -> None:
+    log.info("Adding user %s to schema %s", user, schema_name)
+    owner_role = f"{schema_name}_owner"
+    with psycopg.connect(admin_conn_str) as conn:
+        conn.autocommit = True
+        with conn.cursor() as cur:
+            cur.execute(f"CREATE USER {user} WITH ENCRYPTED PASSWORD '{password}';")
+            cur.execute(f"GRANT {owner_role} TO {user};")
+            cur.execute(f"ALTER ROLE {user} SET search_path = {schema_name};")
+            # Sessions run as the owner role, so everything the tenant creates
+            # belongs to it and stays usable by the tenant's other users.
+            cur.execute(f"ALTER ROLE {user} SET role = {owner_role};")
+
+
+@timing.timed("postgres")
+def set_user_limits(
+    admin_conn_str: str,
+    user: str,
+    connection_limit: int | None,
+    settings: dict[str, str | None],
+) -> None:
+    log.info("Setting limits for user %s", user)
+    if connection_limit is None:
+        connection_limit = -1
+    with psycopg.connect(admin_conn_str) as conn:
+        conn.autocommit = True
+        with conn.cursor() as cur:
+            cur.execute(f"ALTER ROLE {user} CONNECTION LIMIT {connection_limit};")
+            for name, value in settings.items():
+                if value is None:
+                    cur.execute(f"ALTER ROLE {user} RESET {name};")
+                else:
+                    cur.execute(f"ALTER ROLE {user} SET {name} = '{value}';")
+
+
+@timing.timed("postgres")
 def remove_user(admin_conn_str: str, db_name: str, user: str) -> None:
     log.info("Removing user %s", user)
     owner_role = f"{db_name}_owner"
@@ -70,3 +168,851 @@ def remove_user(admin_conn_str: str, db_name: str, user: str) -> None:
                 f"ALTER DEFAULT PRIVILEGES REVOKE ALL ON FUNCTIONS FROM {user};"
             )
             cur.execute(f"DROP USER {user};")
+
+
+@timing.timed("postgres")
+def get_catalog(admin_conn_str: str) -> tuple[list[str], list[str]]:
+    with psycopg.connect(admin_conn_str) as conn:
+        with conn.cursor() as cur:
+            cur.execute(
+                """
+                SELECT 'database', datname FROM pg_database WHERE NOT datistemplate
+                UNION ALL
+                SELECT 'role', rolname FROM pg_roles WHERE rolname NOT LIKE 'pg\\_%'
+                """
+            )
+            rows = cur.fetchall()
+    databases = [name for kind, name in rows if kind == "database"]
+    roles = [name for kind, name in rows if kind == "role"]
+    return databases, roles
+
+
+@timing.timed("postgres")
+def get_role_memberships(admin_conn_str: str) -> dict[str, list[str]]:
+    with psycopg.connect(admin_conn_str) as conn:
+        with conn.cursor() as cur:
+            cur.execute(
+                """
+                SELECT m.rolname, r.rolname
+                FROM pg_auth_members am
+                JOIN pg_roles m ON m.oid = am.member
+                JOIN pg_roles r ON r.oid = am.roleid
+                """
+            )
+            rows = cur.fetchall()
+    memberships: dict[str, list[str]] = {}
+    for member, role in rows:
+        memberships.setdefault(member, []).append(role)
+    return memberships
+
+
+@timing.timed("postgres")
+def get_database_contents(admin_conn_str: str, db_name: str) -> dict[str, Any]:
+    # Schemas besides public, and how many tables, views, sequences etc.
+    # exist outside the system schemas.
+    with psycopg.connect(f"{admin_conn_str}/{db_name}") as conn:
+        with conn.cursor() as cur:
+            cur.execute(
+                """
+                SELECT nspname FROM pg_namespace
+                WHERE nspname NOT IN ('public', 'information_schema')
+                AND nspname NOT LIKE 'pg\\_%'
+                """
+            )
+            schemas = [row[0] for row in cur.fetchall()]
+            cur.execute(
+                """
+                SELECT count(*) FROM pg_class c
+                JOIN pg_namespace n ON n.oid = c.relnamespace
+                WHERE n.nspname NOT IN ('information_schema')
+                AND n.nspname NOT LIKE 'pg\\_%'
+                """
+            )
+            row = cur.fetchone()
+    assert row is not None
+    return {"schemas": schemas, "relations": row[0]}
+
+
+@timing.timed("postgres")
+def get_server_version(admin_conn_str: str) -> str:
+    with psycopg.connect(admin_conn_str) as conn:
+        with conn.cursor() as cur:
+            cur.execute("SHOW server_version;")
+            row = cur.fetchone()
+    assert row is not None
+    # e.g. "17.2 (Debian 17.2-1.pgdg120+1)"
+    return row[0].split(" ")[0]
+
+
+@timing.timed("postgres")
+def drop_roles(admin_conn_str: str, users: list[str]) -> None:
+    log.info("Dropping roles %s", users)
+    if len(users) == 0:
+        return
+    with psycopg.connect(admin_conn_str) as conn:
+        conn.autocommit = True
+        with conn.cursor() as cur:
+            # dbid 0 is for shared objects, e.g. CONNECT granted on a database
+            cur.execute(
+                """
+                SELECT DISTINCT d.datname
+                FROM pg_shdepend s
+                JOIN pg_roles r ON r.oid = s.refobjid
+                LEFT JOIN pg_database d ON d.oid = s.dbid
+                WHERE r.rolname = ANY(%s) AND (s.dbid = 0 OR d.datallowconn)
+                """,
+                (users,),
+            )
+            db_names = [row[0] for row in cur.fetchall()]
+    conn_strs = [
+        f"{admin_conn_str}/{db_name}" for db_name in db_names if db_name is not None
+    ]
+    if None in db_names and len(conn_strs) == 0:
+        # DROP OWNED in any database revokes privileges on shared objects
+        conn_strs.append(admin_conn_str)
+    role_list = ", ".join(users)
+    for conn_str in conn_strs:
+        # DROP OWNED also revokes privileges and default privileges
+        with psycopg.connect(conn_str) as conn:
+            conn.autocommit = True
+            with conn.cursor() as cur:
+                cur.execute(f"DROP OWNED BY {role_list};")
+    with psycopg.connect(admin_conn_str) as conn:
+        conn.autocommit = True
+        with conn.cursor() as cur:
+            for user in users:
+                cur.execute(f"DROP ROLE IF EXISTS {user};")
+
+
+STAT_STATEMENTS_ORDER_BY = {
+    "totalTime": "s.total_exec_time",
+    "meanTime": "s.mean_exec_time",
+    "calls": "s.calls",
+    "io": "(s.shared_blks_read + s.shared_blks_written"
+    " + s.temp_blks_read + s.temp_blks_written)",
+}
+
+
+@timing.timed("postgres")
+def get_top_statements(
+    admin_conn_str: str, db_name: str | None, order_by: str, limit: int
+) -> list[dict[str, Any]]:
+    log.info("Getting top statements by %s", order_by)
+    order_column = STAT_STATEMENTS_ORDER_BY[order_by]
+    with psycopg.connect(admin_conn_str, row_factory=dict_row) as conn:
+        conn.autocommit = True
+        with conn.cursor() as cur:
+            cur.execute("CREATE EXTENSION IF NOT EXISTS pg_stat_statements;")
+            cur.execute(
+                "SELECT d.datname AS db_name, r.rolname AS user_name,"
+                " s.queryid, s.query, s.calls, s.rows,"
+                " s.total_exec_time, s.mean_exec_time,"
+                " s.shared_blks_hit, s.shared_blks_read, s.shared_blks_written,"
+                " s.temp_blks_read, s.temp_blks_written"
+                " FROM pg_stat_statements s"
+                " JOIN pg_database d ON d.oid = s.dbid"
+                " JOIN pg_roles r ON r.oid = s.userid"
+                " WHERE %(db_name)s::text IS NULL OR d.datname = %(db_name)s"
+                f" ORDER BY {order_column} DESC"
+                " LIMIT %(limit)s;",
+                {"db_name": db_name, "limit": limit},
+            )
+            return cur.fetchall()
+
+
+@timing.timed("postgres")
+def reset_statements(admin_conn_str: str) -> None:
+    log.info("Resetting pg_stat_statements")
+    with psycopg.connect(admin_conn_str) as conn:
+        conn.autocommit = True
+        with conn.cursor() as cur:
+            cur.execute("CREATE EXTENSION IF NOT EXISTS pg_stat_statements;")
+            cur.execute("SELECT pg_stat_statements_reset();")
+
+
+@timing.timed("postgres")
+def get_activity(admin_conn_str: str) -> list[dict[str, Any]]:
+    log.info("Getting activity")
+    with psycopg.connect(admin_conn_str, row_factory=dict_row) as conn:
+        conn.autocommit = True
+        with conn.cursor() as cur:
+            cur.execute(
+                "SELECT a.pid, a.datname AS db_name, a.usename AS user_name,"
+                " a.application_name, a.client_addr::text AS client_addr,"
+                " a.state, a.wait_event_type, a.wait_event,"
+                " a.backend_start, a.xact_start, a.query_start, a.state_change,"
+                " EXTRACT(EPOCH FROM now() - a.query_start)::float AS query_seconds,"
+                " EXTRACT(EPOCH FROM now() - a.xact_start)::float"
+                " AS transaction_seconds,"
+                " a.query, pg_blocking_pids(a.pid) AS blocked_by,"
+                " COALESCE(("
+                "SELECT json_agg(json_build_object("
+                "'lockType', l.locktype, 'mode', l.mode, 'granted', l.granted,"
+                " 'relation', l.relation, 'transactionId', l.transactionid::text))"
+                " FROM pg_locks l WHERE l.pid = a.pid"
+                "), '[]'::json) AS locks"
+                " FROM pg_stat_activity a"
+                " WHERE a.backend_type = 'client backend'"
+                " AND a.pid <> pg_backend_pid()"
+                " ORDER BY a.query_start NULLS LAST;"
+            )
+            return cur.fetchall()
+
+
+@timing.timed("postgres")
+def cancel_backend(admin_conn_str: str, pid: int) -> bool:
+    log.info("Cancelling query of backend %d", pid)
+    with psycopg.connect(admin_conn_str) as conn:
+        conn.autocommit = True
+        with conn.cursor() as cur:
+            cur.execute("SELECT pg_cancel_backend(%s);", (pid,))
+            row = cur.fetchone()
+            assert row is not None
+            return row[0]
+
+
+@timing.timed("postgres")
+def terminate_backend(admin_conn_str: str, pid: int) -> bool:
+    log.info("Terminating backend %d", pid)
+    with psycopg.connect(admin_conn_str) as conn:
+        conn.autocommit = True
+        with conn.cursor() as cur:
+            cur.execute("SELECT pg_terminate_backend(%s);", (pid,))
+            row = cur.fetchone()
+            assert row is not None
+            return row[0]
+
+
+@timing.timed("postgres")
+def terminate_long_running(
+    admin_conn_str: str,
+    admin_user: str,
+    max_query_seconds: int | None,
+    max_idle_in_transaction_seconds: int | None,
+) -> list[dict[str, Any]]:
+    with psycopg.connect(admin_conn_str, row_factory=dict_row) as conn:
+        conn.autocommit = True
+        with conn.cursor() as cur:
+            cur.execute(
+                "SELECT pid, datname AS db_name, usename AS user_name, state,"
+                " pg_terminate_backend(pid) AS terminated"
+                " FROM pg_stat_activity"
+                " WHERE backend_type = 'client backend'"
+                " AND pid <> pg_backend_pid()"
+                " AND usename <> %(admin_user)s"
+                " AND ("
+                "(%(max_query)s::int IS NOT NULL AND state = 'active'"
+                " AND now() - query_start > make_interval(secs => %(max_query)s))"
+                " OR (%(max_idle)s::int IS NOT NULL"
+                " AND state IN ('idle in transaction',"
+                " 'idle in transaction (aborted)')"
+                " AND now() - state_change > make_interval(secs => %(max_idle)s))"
+                ");",
+                {
+                    "admin_user": admin_user,
+                    "max_query": max_query_seconds,
+                    "max_idle": max_idle_in_transaction_seconds,
+                },
+            )
+            return cur.fetchall()
+
+
+@timing.timed("postgres")
+def vacuum_analyze(admin_conn_str: str, db_name: str, timeout_seconds: int) -> None:
+    log.info("Running VACUUM (ANALYZE) on %s", db_name)
+    with psycopg.connect(
+        f"{admin_conn_str}/{db_name}",
+        options=f"-c statement_timeout={timeout_seconds}s",
+    ) as conn:
+        conn.autocommit = True
+        with conn.cursor() as cur:
+            cur.execute("VACUUM (ANALYZE);")
+
+
+@timing.timed("postgres")
+def reindex(admin_conn_str: str, db_name: str, timeout_seconds: int) -> None:
+    log.info("Running REINDEX DATABASE CONCURRENTLY on %s", db_name)
+    with psycopg.connect(
+        f"{admin_conn_str}/{db_name}",
+        options=f"-c statement_timeout={timeout_seconds}s",
+    ) as conn:
+        conn.autocommit = True
+        with conn.cursor() as cur:
+            cur.execute(f"REINDEX DATABASE CONCURRENTLY {db_name};")
+
+
+@timing.timed("postgres")
+def tune_autovacuum(
+    admin_conn_str: str,
+    db_name: str,
+    timeout_seconds: int,
+    min_live_tuples: int,
+    vacuum_scale_factor: float,
+    analyze_scale_factor: float,
+) -> int:
+    log.info("Tuning autovacuum thresholds on %s", db_name)
+    with psycopg.connect(
+        f"{admin_conn_str}/{db_name}",
+        options=f"-c statement_timeout={timeout_seconds}s",
+    ) as conn:
+        conn.autocommit = True
+        with conn.cursor() as cur:
+            cur.execute(
+                "SELECT schemaname, relname FROM pg_stat_user_tables"
+                " WHERE n_live_tup >= %s;",
+                (min_live_tuples,),
+            )
+            tables = cur.fetchall()
+            for schema_name, table_name in tables:
+                cur.execute(
+                    sql.SQL(
+                        "ALTER TABLE {} SET ("
+                        "autovacuum_vacuum_scale_factor = {},"
+                        " autovacuum_analyze_scale_factor = {});"
+                    ).format(
+                        sql.Identifier(schema_name, table_name),
+                        sql.Literal(vacuum_scale_factor),
+                        sql.Literal(analyze_scale_factor),
+                    )
+                )
+            return len(tables)
+
+
+@timing.timed("postgres")
+def get_index_report(
+    admin_conn_str: str, db_name: str, min_live_tuples: int, limit: int
+) -> dict[str, list[dict[str, Any]]]:
+    log.info("Getting index report for %s", db_name)
+    with psycopg.connect(f"{admin_conn_str}/{db_name}", row_factory=dict_row) as conn:
+        conn.autocommit = True
+        with conn.cursor() as cur:
+            cur.execute(
+                "SELECT s.schemaname AS schema_name, s.relname AS table_name,"
+                " s.indexrelname AS index_name, s.idx_scan AS scans,"
+                " pg_relation_size(s.indexrelid) AS size"
+                " FROM pg_stat_user_indexes s"
+                " JOIN pg_index i ON i.indexrelid = s.indexrelid"
+                " WHERE s.idx_scan = 0 AND NOT i.indisunique AND NOT i.indisprimary"
+                " ORDER BY size DESC LIMIT %(limit)s;",
+                {"limit": limit},
+            )
+            unused_indexes = cur.fetchall()
+            cur.execute(
+                "SELECT i.indrelid::regclass::text AS table_name,"
+                " array_agg(i.indexrelid::regclass::text ORDER BY i.indexrelid)"
+                " AS indexes,"
+                " sum(pg_relation_size(i.indexrelid))::bigint AS size"
+                " FROM pg_index i"
+                " JOIN pg_class c ON c.oid = i.indrelid"
+                " JOIN pg_namespace n ON n.oid = c.relnamespace"
+                " WHERE n.nspname NOT IN ('pg_catalog', 'information_schema')"
+                " GROUP BY i.indrelid, i.indkey::text, i.indclass::text,"
+                " COALESCE(i.indexprs::text, ''), COALESCE(i.indpred::text, '')"
+                " HAVING count(*) > 1"
+                " ORDER BY size DESC LIMIT %(limit)s;",
+                {"limit": limit},
+            )
+            duplicate_indexes = cur.fetchall()
+            cur.execute(
+                "SELECT schemaname AS schema_name, relname AS table_name,"
+                " seq_scan, seq_tup_read, COALESCE(idx_scan, 0) AS idx_scan,"
+                " n_live_tup AS live_tuples,"
+                " seq_scan::float / (seq_scan + COALESCE(idx_scan, 0))"
+                " AS seq_scan_ratio"
+                " FROM pg_stat_user_tables"
+                " WHERE seq_scan > 0 AND n_live_tup >= %(min_live_tuples)s"
+                " AND seq_scan > COALESCE(idx_scan, 0)"
+                " ORDER BY seq_tup_read DESC LIMIT %(limit)s;",
+                {"min_live_tuples": min_live_tuples, "limit": limit},
+            )
+            seq_scan_tables = cur.fetchall()
+            cur.execute(
+                "SELECT n.nspname AS schema_name, c.relname AS table_name,"
+                " c.relpages::bigint * current_setting('block_size')::bigint AS size,"
+                " GREATEST(c.relpages - CEIL(c.reltuples * (24 + COALESCE(w.width, 0))"
+                " / current_setting('block_size')::numeric), 0)::bigint"
+                " * current_setting('block_size')::bigint AS bloat"
+                " FROM pg_class c"
+                " JOIN pg_namespace n ON n.oid = c.relnamespace"
+                " LEFT JOIN ("
+                "SELECT schemaname, tablename,"
+                " SUM((1 - null_frac) * avg_width) AS width"
+                " FROM pg_stats GROUP BY schemaname, tablename"
+                ") w ON w.schemaname = n.nspname AND w.tablename = c.relname"
+                " WHERE c.relkind = 'r' AND c.reltuples > 0"
+                " AND n.nspname NOT IN ('pg_catalog', 'information_schema')"
+                " ORDER BY bloat DESC LIMIT %(limit)s;",
+                {"limit": limit},
+            )
+            table_bloat = cur.fetchall()
+            cur.execute(
+                "SELECT n.nspname AS schema_name, t.relname AS table_name,"
+                " c.relname AS index_name,"
+                " c.relpages::bigint * current_setting('block_size')::bigint AS size,"
+                " GREATEST(c.relpages - 1 - CEIL(c.reltuples * (12 + COALESCE(w.width, 0))"
+                " / (current_setting('block_size')::numeric * 0.9)), 0)::bigint"
+                " * current_setting('block_size')::bigint AS bloat"
+                " FROM pg_index i"
+                " JOIN pg_class c ON c.oid = i.indexrelid"
+                " JOIN pg_class t ON t.oid = i.indrelid"
+                " JOIN pg_namespace n ON n.oid = c.relnamespace"
+                " JOIN pg_am am ON am.oid = c.relam AND am.amname = 'btree'"
+                " LEFT JOIN LATERAL ("
+                "SELECT SUM(s.avg_width) AS width FROM pg_attribute a"
+                " JOIN pg_stats s ON s.schemaname = n.nspname"
+                " AND s.tablename = t.relname AND s.attname = a.attname"
+                " WHERE a.attrelid = t.oid AND a.attnum = ANY(i.indkey)"
+                ") w ON true"
+                " WHERE c.reltuples > 0"
+                " AND n.nspname NOT IN ('pg_catalog', 'information_schema')"
+                " AND n.nspname NOT LIKE 'pg_toast%%'"
+                " ORDER BY bloat DESC LIMIT %(limit)s;",
+                {"limit": limit},
+            )
+            index_bloat = cur.fetchall()
+    return {
+        "unused_indexes": unused_indexes,
+        "duplicate_indexes": duplicate_indexes,
+        "seq_scan_tables": seq_scan_tables,
+        "table_bloat": table_bloat,
+        "index_bloat": index_bloat,
+    }
+
+
+@timing.timed("postgres")
+def get_load(admin_conn_str: str) -> dict[str, Any]:
+    with psycopg.connect(
+        admin_conn_str, row_factory=dict_row, connect_timeout=5
+    ) as conn:
+        with conn.cursor() as cur:
+            cur.execute(
+                """
+                SELECT
+                    (SELECT coalesce(sum(pg_database_size(datname)), 0)
+                        FROM pg_database WHERE NOT datistemplate)::bigint
+                        AS total_size,
+                    (SELECT count(*) FROM pg_stat_activity
+                        WHERE backend_type = 'client backend') AS connections,
+                    (SELECT count(*) FROM pg_stat_activity
+                        WHERE backend_type = 'client backend' AND state = 'active')
+                        AS active_connections
+                """
+            )
+            row = cur.fetchone()
+    assert row is not None
+    return row
+
+
+@timing.timed("postgres")
+def get_transactions(admin_conn_str: str) -> int:
+    with psycopg.connect(admin_conn_str, connect_timeout=5) as conn:
+        with conn.cursor() as cur:
+            cur.execute(
+                """
+                SELECT coalesce(sum(xact_commit + xact_rollback), 0)::bigint
+                FROM pg_stat_database
+                """
+            )
+            row = cur.fetchone()
+    assert row is not None
+    return row[0]
+
+
+@timing.timed("postgres")
+def probe_instance(admin_conn_str: str, timeout_seconds: int) -> dict[str, Any]:
+    start = time.perf_counter()
+    with psycopg.connect(
+        admin_conn_str,
+        row_factory=dict_row,
+        connect_timeout=timeout_seconds,
+        options=f"-c statement_timeout={timeout_seconds}s",
+    ) as conn:
+        connect_seconds = time.perf_counter() - start
+        with conn.cursor() as cur:
+            start = time.perf_counter()
+            cur.execute("SELECT 1;")
+            cur.fetchone()
+            query_seconds = time.perf_counter() - start
+            cur.execute(
+                """
+                SELECT
+                    pg_is_in_recovery() AS in_recovery,
+                    (SELECT count(*) FROM pg_stat_replication) AS replicas,
+                    CASE WHEN pg_is_in_recovery()
+                        THEN pg_wal_lsn_diff(
+                            pg_last_wal_receive_lsn(), pg_last_wal_replay_lsn()
+                        )
+                        ELSE (SELECT max(pg_wal_lsn_diff(
+                            pg_current_wal_lsn(), replay_lsn
+                        )) FROM pg_stat_replication)
+                    END::bigint AS replication_lag_bytes,
+                    (SELECT coalesce(sum(pg_database_size(datname)), 0)
+                        FROM pg_database WHERE NOT datistemplate)::bigint
+                        AS data_size,
+                    current_setting('data_directory') AS data_directory
+                """
+            )
+            row = cur.fetchone()
+            assert row is not None
+            volume = None
+            if not row["in_recovery"]:
+                volume = get_volume_usage(conn, row["data_directory"])
+    return {
+        "connect_seconds": connect_seconds,
+        "query_seconds": query_seconds,
+        "in_recovery": row["in_recovery"],
+        "replicas": row["replicas"],
+        "replication_lag_bytes": row["replication_lag_bytes"],
+        "data_size": row["data_size"],
+        "volume": volume,
+    }
+
+
+def get_volume_usage(
+    conn: psycopg.Connection[dict[str, Any]], data_directory: str
+) -> dict[str, int] | None:
+    # The volume is only mounted in the Postgres container, so df runs
+    # there through COPY FROM PROGRAM (requires superuser).
+    try:
+        with conn.transaction():
+            with conn.cursor() as cur:
+                cur.execute(
+                    "CREATE TEMP TABLE volume_usage (line text) ON COMMIT DROP;"
+                )
+                cur.execute(
+                    sql.SQL("COPY volume_usage FROM PROGRAM {};").format(
+                        sql.Literal(f"df -kP {shlex.quote(data_directory)}")
+                    )
+                )
+                cur.execute("SELECT line FROM volume_usage;")
+                lines = [row["line"] for row in cur.fetchall()]
+    except psycopg.Error:
+        log.exception("Could not read disk usage of %s", data_directory)
+        return None
+    # Filesystem 1024-blocks Used Available Capacity Mounted-on
+    fields = lines[-1].split()
+    return {
+        "total": int(fields[1]) * 1024,
+        "used": int(fields[2]) * 1024,
+        "available": int(fields[3]) * 1024,
+    }
+
+
+@timing.timed("postgres")
+def probe_database(
+    admin_conn_str: str, db_name: str, timeout_seconds: int
+) -> dict[str, float]:
+    start = time.perf_counter()
+    with psycopg.connect(
+        f"{admin_conn_str}/{db_name}",
+        connect_timeout=timeout_seconds,
+        options=f"-c statement_timeout={timeout_seconds}s",
+    ) as conn:
+        connect_seconds = time.perf_counter() - start
+        with conn.cursor() as cur:
+            start = time.perf_counter()
+            cur.execute("SELECT 1;")
+            cur.fetchone()
+            query_seconds = time.perf_counter() - start
+    return {"connect_seconds": connect_seconds, "query_seconds": query_seconds}
+
+
+@timing.timed("postgres")
+def get_database_sizes(admin_conn_str: str) -> dict[str, int]:
+    with psycopg.connect(admin_conn_str, connect_timeout=5) as conn:
+        with conn.cursor() as cur:
+            cur.execute(
+                """
+                SELECT datname, pg_database_size(datname)
+                FROM pg_database
+                WHERE NOT datistemplate AND datallowconn
+                """
+            )
+            return {db_name: size for db_name, size in cur.fetchall()}
+
+
+@timing.timed("postgres")
+def wait_until_ready(admin_conn_str: str, timeout_seconds: int) -> None:
+    log.info("Waiting for Postgres to accept connections")
+    deadline = time.monotonic() + timeout_seconds
+    while True:
+        try:
+            with psycopg.connect(admin_conn_str, connect_timeout=5):
+                return
+        except psycopg.OperationalError:
+            if time.monotonic() > deadline:
+                raise
+            time.sleep(2)
+
+
+@timing.timed("postgres")
+def copy_database(source_conn_str: str, target_conn_str: str, jobs: int) -> None:
+    with tempfile.TemporaryDirectory() as dump_dir:
+        dump_path = os.path.join(dump_dir, "dump")
+        run_client_command(
+            [
+                "pg_dump",
+                "--format=directory",
+                f"--jobs={jobs}",
+                f"--file={dump_path}",
+            ],
+            conn_str=source_conn_str,
+        )
+        run_client_command(
+            [
+                "pg_restore",
+                f"--jobs={jobs}",
+                dump_path,
+            ],
+            conn_str=target_conn_str,
+        )
+
+
+@timing.timed("postgres")
+def copy_schema(source_conn_str: str, target_conn_str: str) -> None:
+    with tempfile.TemporaryDirectory() as dump_dir:
+        dump_path = os.path.join(dump_dir, "schema.dump")
+        run_client_command(
+            [
+                "pg_dump",
+                "--schema-only",
+                "--no-publications",
+                "--no-subscriptions",
+                "--format=custom",
+                f"--file={dump_path}",
+            ],
+            conn_str=source_conn_str,
+        )
+        run_client_command(
+            [
+                "pg_restore",
+                dump_path,
+            ],
+            conn_str=target_conn_str,
+        )
+
+
+@timing.timed("postgres")
+def get_wal_level(admin_conn_str: str) -> str:
+    with psycopg.connect(admin_conn_str) as conn:
+        with conn.cursor() as cur:
+            cur.execute("SHOW wal_level;")
+            row = cur.fetchone()
+    assert row is not None
+    return row[0]
+
+
+@timing.timed("postgres")
+def enable_logical_replication(admin_conn_str: str) -> bool:
+    # Returns whether a restart is needed for wal_level to take effect.
+    with psycopg.connect(admin_conn_str) as conn:
+        conn.autocommit = True
+        with conn.cursor() as cur:
+            cur.execute("SHOW wal_level;")
+            row = cur.fetchone()
+            assert row is not None
+            if row[0] == "logical":
+                return False
+            log.info("Setting wal_level to logical")
+            cur.execute("ALTER SYSTEM SET wal_level = logical;")
+            return True
+
+
+@timing.timed("postgres")
+def create_publication(admin_conn_str: str, db_name: str, name: str) -> None:
+    log.info("Creating publication %s in %s", name, db_name)
+    with psycopg.connect(f"{admin_conn_str}/{db_name}") as conn:
+        conn.autocommit = True
+        with conn.cursor() as cur:
+            cur.execute(f"DROP PUBLICATION IF EXISTS {name};")
+            cur.execute(f"CREATE PUBLICATION {name} FOR ALL TABLES;")
+
+
+@timing.timed("postgres")
+def drop_publication(admin_conn_str: str, db_name: str, name: str) -> None:
+    log.info("Dropping publication %s in %s", name, db_name)
+    with psycopg.connect(f"{admin_conn_str}/{db_name}") as conn:
+        conn.autocommit = True
+        with conn.cursor() as cur:
+            cur.execute(f"DROP PUBLICATION IF EXISTS {name};")
+
+
+@timing.timed("postgres")
+def create_subscription(
+    admin_conn_str: str, db_name: str, name: str, publisher_conn_str: str
+) -> None:
+    log.info("Creating subscription %s in %s", name, db_name)
+    with psycopg.connect(f"{admin_conn_str}/{db_name}") as conn:
+        conn.autocommit = True
+        with conn.cursor() as cur:
+            cur.execute(
+                sql.SQL(
+                    "CREATE SUBSCRIPTION {name} CONNECTION {conn_str}"
+                    " PUBLICATION {name} WITH (copy_data = true);"
+                ).format(
+                    name=sql.Identifier(name),
+                    conn_str=sql.Literal(publisher_conn_str),
+                )
+            )
+
+
+@timing.timed("postgres")
+def drop_subscription(admin_conn_str: str, db_name: str, name: str) -> None:
+    log.info("Dropping subscription %s in %s", name, db_name)
+    with psycopg.connect(f"{admin_conn_str}/{db_name}") as conn:
+        conn.autocommit = True
+        with conn.cursor() as cur:
+            cur.execute(f"DROP SUBSCRIPTION IF EXISTS {name};")
+
+
+@timing.timed("postgres")
+def drop_replication_slot(admin_conn_str: str, name: str) -> None:
+    # Normally dropped with the subscription, left behind when the target
+    # database is gone first.
+    log.info("Dropping replication slot %s", name)
+    with psycopg.connect(admin_conn_str) as conn:
+        conn.autocommit = True
+        with conn.cursor() as cur:
+            cur.execute(
+                """
+                SELECT pg_drop_replication_slot(slot_name)
+                FROM pg_replication_slots
+                WHERE slot_name = %s
+                """,
+                (name,),
+            )
+
+
+@timing.timed("postgres")
+def get_subscription_sync(
+    admin_conn_str: str, db_name: str, name: str
+) -> tuple[int, int]:
+    with psycopg.connect(f"{admin_conn_str}/{db_name}") as conn:
+        with conn.cursor() as cur:
+            cur.execute(
+                """
+                SELECT
+                    count(*) FILTER (WHERE sr.srsubstate IN ('r', 's')),
+                    count(*)
+                FROM pg_subscription_rel sr
+                JOIN pg_subscription s ON s.oid = sr.srsubid
+                WHERE s.subname = %s
+                """,
+                (name,),
+            )
+            row = cur.fetchone()
+    assert row is not None
+    return row[0], row[1]
+
+
+@timing.timed("postgres")
+def get_replication_lag(admin_conn_str: str, slot_name: str) -> int | None:
+    with psycopg.connect(admin_conn_str) as conn:
+        with conn.cursor() as cur:
+            cur.execute(
+                """
+                SELECT pg_wal_lsn_diff(pg_current_wal_lsn(), confirmed_flush_lsn)
+                FROM pg_replication_slots
+                WHERE slot_name = %s
+                """,
+                (slot_name,),
+            )
+            row = cur.fetchone()
+    if row is None or row[0] is None:
+        return None
+    return int(row[0])
+
+
+@timing.timed("postgres")
+def get_current_wal_lsn(admin_conn_str: str) -> str:
+    with psycopg.connect(admin_conn_str) as conn:
+        with conn.cursor() as cur:
+            cur.execute("SELECT pg_current_wal_lsn()::text;")
+            row = cur.fetchone()
+    assert row is not None
+    return row[0]
+
+
+@timing.timed("postgres")
+def get_slot_bytes_behind(admin_conn_str: str, slot_name: str, lsn: str) -> int | None:
+    # Unlike get_replication_lag, measured against a fixed LSN, WAL written
+    # since by other databases of the instance does not count.
+    with psycopg.connect(admin_conn_str) as conn:
+        with conn.cursor() as cur:
+            cur.execute(
+                """
+                SELECT pg_wal_lsn_diff(%s::pg_lsn, confirmed_flush_lsn)
+                FROM pg_replication_slots
+                WHERE slot_name = %s
+                """,
+                (lsn, slot_name),
+            )
+            row = cur.fetchone()
+    if row is None or row[0] is None:
+        return None
+    return int(row[0])
+
+
+@timing.timed("postgres")
+def set_users_login(
+    admin_conn_str: str, db_name: str, users: list[str], login: bool
+) -> None:
+    log.info("Setting %s for %s", "LOGIN" if login else "NOLOGIN", users)
+    with psycopg.connect(admin_conn_str) as conn:
+        conn.autocommit = True
+        with conn.cursor() as cur:
+            for user in users:
+                cur.execute(f"ALTER ROLE {user} {'LOGIN' if login else 'NOLOGIN'};")
+            if not login:
+                cur.execute(
+                    """
+                    SELECT pg_terminate_backend(pid)
+                    FROM pg_stat_activity
+                    WHERE datname = %s AND usename = ANY(%s)
+                    """,
+                    (db_name, users),
+                )
+
+
+@timing.timed("postgres")
+def copy_sequences(source_conn_str: str, target_conn_str: str) -> None:
+    # Logical replication does not carry sequence values.
+    with psycopg.connect(source_conn_str) as conn:
+        with conn.cursor() as cur:
+            cur.execute(
+                """
+                SELECT schemaname, sequencename, last_value
+                FROM pg_sequences
+                WHERE last_value IS NOT NULL
+                """
+            )
+            sequences = cur.fetchall()
+    with psycopg.connect(target_conn_str) as conn:
+        conn.autocommit = True
+        with conn.cursor() as cur:
+            for schema_name, sequence_name, last_value in sequences:
+                cur.execute(
+                    "SELECT setval(%s, %s);",
+                    (f'"{schema_name}"."{sequence_name}"', last_value),
+                )
+
+
+def run_client_command(args: list[str], conn_str: str) -> None:
+    log.info("Running %s", args[0])
+    # The password goes through the environment, the command line of
+    # pg_dump and pg_restore is visible to anyone listing processes.
+    conn_params = conninfo_to_dict(conn_str)
+    password = conn_params.pop("password", None)
+    env = dict(os.environ)
+    if password is not None:
+        env["PGPASSWORD"] = str(password)
+    process = subprocess.run(
+        [args[0], f"--dbname={make_conninfo('', **conn_params)}", *args[1:]],
+        capture_output=True,
+        text=True,
+        env=env,
+    )
+    if process.returncode != 0:
+        raise Exception(
+            f"{args[0]} exited with {process.returncode}: {process.stderr[-2000:]}"
+        )
@@ -0,0 +1,69 @@
+import cProfile
+import logging
+import os
+import re
+from datetime import datetime, timezone
+from typing import Callable
+
+from addon import config
+
+log = logging.getLogger(__name__)
+
+
+def requested() -> bool:
+    return (
+        os.environ.get("ADDON_PROFILE") == "1"
+        or os.environ.get("HTTP_X_ADDON_PROFILE") == "1"
+    )
+
+
+def run_profiled(func: Callable[[], None]) -> None:
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        func()
+    finally:
+        profiler.disable()
+        try:
+            save(profiler)
+        except Exception:
+            log.exception("Failed to save profile")
+
+
+def save(profiler: cProfile.Profile) -> None:
+    os.makedirs(config.PROFILES_DIR, exist_ok=True)
+    method = os.environ.get("REQUEST_METHOD", "UNKNOWN")
+    route = re.sub(r"[^a-zA-Z0-9_\-]+", "_", os.environ.get("PATH_INFO", "")).strip("_")
+    timestamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S%fZ")
+    file_name = f"{timestamp}-{method}-{route or 'root'}.pstats"
+    path = os.path.join(config.PROFILES_DIR, file_name)
+    profiler.dump_stats(path)
+    log.info("Saved profile %s", file_name)
+    enforce_size_limit()
+
+
+def enforce_size_limit() -> None:
+    profiles = list_profiles()
+    total_size = sum(size for _, size in profiles)
+    for file_name, size in profiles[:-1]:
+        if total_size <= config.PROFILES_MAX_BYTES:
+            break
+        log.info("Removing old profile %s", file_name)
+        os.remove(os.path.join(config.PROFILES_DIR, file_name))
+        total_size -= size
+
+
+def list_profiles() -> list[tuple[str, int]]:
+    if not os.path.isdir(config.PROFILES_DIR):
+        return []
+    return sorted(
+        (entry.name, entry.stat().st_size)
+        for entry in os.scandir(config.PROFILES_DIR)
+        if entry.is_file() and entry.name.endswith(".pstats")
+    )
+
+
+def profile_path(file_name: str) -> str | None:
+    if file_name not in [name for name, _ in list_profiles()]:
+        return None
+    return os.path.join(config.PROFILES_DIR, file_name)
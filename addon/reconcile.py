@@ -0,0 +1,213 @@
+import json
+import logging
+import re
+import time
+from dataclasses import dataclass, field
+
+from addon import config, keyvalues, postgres, storage
+from addon.models.db import Session
+
+log = logging.getLogger(__name__)
+
+# Names produced by misc.generate_db_name() and misc.generate_user_name(),
+# anything else in the catalogs was not created by the addon.
+GENERATED_NAME = re.compile(r"^[a-z][a-z0-9]{15}$")
+OWNER_ROLE = re.compile(r"^([a-z][a-z0-9]{15})_owner$")
+
+
+@dataclass
+class ReconcileReport:
+    instance_name: str
+    orphan_databases: list[str] = field(default_factory=list)
+    missing_databases: list[str] = field(default_factory=list)
+    orphan_roles: list[str] = field(default_factory=list)
+    missing_roles: list[str] = field(default_factory=list)
+    registered_databases: list[str] = field(default_factory=list)
+    dropped_roles: list[str] = field(default_factory=list)
+    recreated_roles: list[str] = field(default_factory=list)
+    # drift seen for less than RECONCILE_GRACE_SECONDS, possibly an operation
+    # still in progress
+    skipped: list[str] = field(default_factory=list)
+    # a move or upgrade creates databases and roles hours before storing
+    # them, no repairs at all meanwhile
+    busy: bool = False
+    errors: list[str] = field(default_factory=list)
+
+
+@dataclass
+class StoredUser:
+    name: str
+    password: str
+    db_name: str
+    schema_name: str | None
+
+
+def reconcile_all_instances() -> None:
+    with Session.begin() as dbsession:
+        instance_names = [
+            instance.name for instance in storage.get_instances(dbsession)
+        ]
+    for instance_name in instance_names:
+        try:
+            report = reconcile_instance(instance_name, repair=False)
+        except Exception:
+            log.exception("Failed to reconcile %s", instance_name)
+            continue
+        if (
+            len(report.orphan_databases)
+            + len(report.missing_databases)
+            + len(report.orphan_roles)
+            + len(report.missing_roles)
+            > 0
+        ):
+            log.warning(
+                "%s drifted from storage: orphan databases %s, missing databases %s,"
+                " orphan roles %s, missing roles %s",
+                instance_name,
+                report.orphan_databases,
+                report.missing_databases,
+                report.orphan_roles,
+                report.missing_roles,
+            )
+
+
+def reconcile_instance(instance_name: str, repair: bool) -> ReconcileReport:
+    with Session.begin() as dbsession:
+        instance = storage.get_instance_by_name(dbsession, instance_name)
+        assert instance is not None
+        busy = storage.has_move_or_upgrade_in_progress(dbsession, instance_name)
+        admin_user = instance.admin_user
+        stored_databases = set(database.name for database in instance.databases)
+        pool_databases = set(
+            pool_database.name for pool_database in instance.pool_databases
+        )
+        stored_schemas = set(
+            schema.name
+            for database in instance.databases
+            for schema in database.schemas
+        )
+        stored_users = [
+            StoredUser(
+                name=user.name,
+                password=user.password,
+                db_name=database.name,
+                schema_name=user.schema.name if user.schema is not None else None,
+            )
+            for database in instance.databases
+            for user in database.users
+        ]
+    admin_conn_str = storage.get_admin_conn_str(instance_name)
+    assert admin_conn_str is not None
+    live_databases, live_roles = postgres.get_catalog(admin_conn_str)
+    live_database_set = set(live_databases)
+    live_role_set = set(live_roles)
+    known_databases = stored_databases | pool_databases
+    known_roles = set(user.name for user in stored_users) | {admin_user}
+
+    report = ReconcileReport(instance_name=instance_name, busy=busy)
+    report.orphan_databases = sorted(
+        db_name
+        for db_name in live_database_set - known_databases
+        if GENERATED_NAME.match(db_name) is not None
+        and f"{db_name}_owner" in live_role_set
+    )
+    report.missing_databases = sorted(known_databases - live_database_set)
+    for role in sorted(live_role_set - known_roles):
+        owner_match = OWNER_ROLE.match(role)
+        if owner_match is not None:
+            if owner_match.group(1) not in live_database_set | stored_schemas:
+                report.orphan_roles.append(role)
+        elif GENERATED_NAME.match(role) is not None:
+            report.orphan_roles.append(role)
+    report.missing_roles = sorted(
+        user.name
+        for user in stored_users
+        if user.name not in live_role_set and user.db_name in live_database_set
+    )
+    first_seen = record_sightings(instance_name, report)
+    if repair:
+        settled_before = time.time() - config.RECONCILE_GRACE_SECONDS
+        settled = set(
+            name for name, seen in first_seen.items() if seen <= settled_before
+        )
+        if busy:
+            log.info("Move or upgrade in progress on %s, not repairing", instance_name)
+            settled = set()
+        repair_instance(instance_name, admin_conn_str, report, stored_users, settled)
+    return report
+
+
+def record_sightings(instance_name: str, report: ReconcileReport) -> dict[str, float]:
+    # Attaching and creating databases create the role or database before
+    # storing it, detaching removes it before. Remembering since when each
+    # drift is seen lets repairs leave those in-between states alone.
+    now = time.time()
+    key = f"RECONCILE_SIGHTINGS_{instance_name}"
+    names = (
+        [f"database:{db_name}" for db_name in report.orphan_databases]
+        + [f"role:{role}" for role in report.orphan_roles]
+        + [f"missing_role:{role}" for role in report.missing_roles]
+    )
+    with Session.begin() as dbsession:
+        value = keyvalues.get_value(dbsession, key=key)
+        previous = json.loads(value) if value is not None else {}
+        first_seen = {name: previous.get(name, now) for name in names}
+        if len(first_seen) > 0:
+            keyvalues.set_value(dbsession, key=key, value=json.dumps(first_seen))
+        else:
+            keyvalues.delete_value(dbsession, key=key)
+    return first_seen
+
+
+def repair_instance(
+    instance_name: str,
+    admin_conn_str: str,
+    report: ReconcileReport,
+    stored_users: list[StoredUser],
+    settled: set[str],
+) -> None:
+    for db_name in report.orphan_databases:
+        if f"database:{db_name}" not in settled:
+            report.skipped.append(db_name)
+            continue
+        log.info("Registering orphan database %s of %s", db_name, instance_name)
+        storage.add_db(instance_name, db_name)
+        report.registered_databases.append(db_name)
+    orphan_roles = []
+    for role in report.orphan_roles:
+        if f"role:{role}" not in settled:
+            report.skipped.append(role)
+            continue
+        orphan_roles.append(role)
+    if len(orphan_roles) > 0:
+        try:
+            postgres.drop_roles(admin_conn_str, orphan_roles)
+            report.dropped_roles.extend(orphan_roles)
+        except Exception as e:
+            log.exception("Failed to drop orphan roles of %s", instance_name)
+            report.errors.append(f"Dropping roles: {e}")
+    for user in stored_users:
+        if user.name not in report.missing_roles:
+            continue
+        if f"missing_role:{user.name}" not in settled:
+            report.skipped.append(user.name)
+            continue
+        try:
+            if user.schema_name is None:
+                postgres.add_user(
+                    admin_conn_str=admin_conn_str,
+                    db_name=user.db_name,
+                    user=user.name,
+                    password=user.password,
+                )
+            else:
+                postgres.add_schema_user(
+                    admin_conn_str=admin_conn_str,
+                    schema_name=user.schema_name,
+                    user=user.name,
+                    password=user.password,
+                )
+            report.recreated_roles.append(user.name)
+        except Exception as e:
+            log.exception("Failed to recreate role %s", user.name)
+            report.errors.append(f"Recreating role {user.name}: {e}")
@@ -0,0 +1,107 @@
+import logging
+import time
+from datetime import datetime, timedelta, timezone
+
+from addon import config, keyvalues, postgres, storage
+from addon.models.db import Session
+
+log = logging.getLogger(__name__)
+
+LAST_SAMPLE_KEY = "DATABASE_SIZES_LAST_SAMPLE"
+
+
+def record_all_instances() -> None:
+    # Cron runs every minute, sizes are only sampled every SIZE_SAMPLE_SECONDS.
+    now = time.time()
+    with Session.begin() as dbsession:
+        last_sample = keyvalues.get_value(dbsession, key=LAST_SAMPLE_KEY)
+        if (
+            last_sample is not None
+            and now - float(last_sample) < config.SIZE_SAMPLE_SECONDS
+        ):
+            return
+        keyvalues.set_value(dbsession, key=LAST_SAMPLE_KEY, value=str(now))
+        instance_names = [
+            instance.name for instance in storage.get_instances(dbsession)
+        ]
+    for instance_name in instance_names:
+        try:
+            record_instance(instance_name)
+        except Exception:
+            log.exception("Failed to record database sizes of %s", instance_name)
+    storage.prune_database_sizes(
+        before=datetime.now(timezone.utc) - timedelta(days=config.SIZE_HISTORY_DAYS)
+    )
+
+
+def record_instance(instance_name: str) -> None:
+    admin_conn_str = storage.get_admin_conn_str(instance_name)
+    assert admin_conn_str is not None
+    sizes = postgres.get_database_sizes(admin_conn_str)
+    storage.add_database_sizes(
+        instance_name,
+        sizes=sizes,
+        growth_window_seconds=config.SIZE_GROWTH_WINDOW_SECONDS,
+    )
+    enforce_quotas(instance_name)
+
+
+def enforce_quotas(instance_name: str) -> None:
+    with Session.begin() as dbsession:
+        instance = storage.get_instance_by_name(dbsession, instance_name)
+        assert instance is not None
+        quotas = [
+            (
+                database.name,
+                database.size,
+                database.soft_quota,
+                database.hard_quota,
+                database.quota_blocked,
+                [user.name for user in database.users],
+            )
+            for database in instance.databases
+            if database.soft_quota is not None
+            or database.hard_quota is not None
+            or database.quota_blocked
+        ]
+    if len(quotas) == 0:
+        return
+    admin_conn_str = storage.get_admin_conn_str(instance_name)
+    assert admin_conn_str is not None
+    for db_name, size, soft_quota, hard_quota, blocked, user_names in quotas:
+        if size is not None and soft_quota is not None and size >= soft_quota:
+            log.warning(
+                "Database %s (%s) is over its soft quota: %d >= %d bytes",
+                db_name,
+                instance_name,
+                size,
+                soft_quota,
+            )
+        if size is not None and hard_quota is not None and size >= hard_quota:
+            if not blocked:
+                log.warning(
+                    "Database %s (%s) is over its hard quota: %d >= %d bytes,"
+                    " blocking its users",
+                    db_name,
+                    instance_name,
+                    size,
+                    hard_quota,
+                )
+            # Applied on every run, so that users attached since are blocked too.
+            postgres.set_users_login(
+                admin_conn_str=admin_conn_str,
+                db_name=db_name,
+                users=user_names,
+                login=False,
+            )
+            if not blocked:
+                storage.set_quota_blocked(instance_name, db_name, blocked=True)
+        elif blocked:
+            log.info("Database %s (%s) is back under quota", db_name, instance_name)
+            postgres.set_users_login(
+                admin_conn_str=admin_conn_str,
+                db_name=db_name,
+                users=user_names,
+                login=True,
+            )
+            storage.set_quota_blocked(instance_name, db_name, blocked=False)
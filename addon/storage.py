@@ -1,11 +1,27 @@
+import json
 import logging
-from typing import Sequence
+from datetime import datetime, timedelta, timezone
+from typing import Iterator, Sequence
 
-from sqlalchemy import select
+from sqlalchemy import delete, func, select, update
+from sqlalchemy.orm import selectinload
 from sqlalchemy.orm.session import Session as DBSession
 
 from addon import misc
-from addon.models import Attachment, Database, Instance, User
+from addon.models import (
+    Attachment,
+    Database,
+    DatabaseMove,
+    DatabaseSize,
+    Instance,
+    InstanceUpgrade,
+    MaintenanceRun,
+    Operation,
+    OperationStep,
+    PoolDatabase,
+    Schema,
+    User,
+)
 from addon.models.db import Session
 
 log = logging.getLogger(__name__)
@@ -17,6 +33,11 @@ def add_postgres_instance(
     version: str,
     admin_user: str,
     admin_password: str,
+    pool_size: int,
+    stat_statements: bool,
+    cpus: float | None,
+    memory: str | None,
+    shm_size: str | None,
 ) -> None:
     log.info("Saving info about new instance %s", instance_name)
     with Session.begin() as dbsession:
@@ -26,6 +47,11 @@ def add_postgres_instance(
             version=version,
             admin_user=admin_user,
             admin_password=admin_password,
+            pool_size=pool_size,
+            stat_statements=stat_statements,
+            cpus=cpus,
+            memory=memory,
+            shm_size=shm_size,
         )
         dbsession.add(instance)
 
@@ -38,13 +64,23 @@ def remove_postgres_instance(instance_name: str) -> None:
             log.info("Instance not found, doing nothing")
             return
         for database in instance.databases:
+            for schema in database.schemas:
+                dbsession.delete(schema)
+            dbsession.execute(
+                delete(DatabaseSize).where(DatabaseSize.database_id == database.id)
+            )
             dbsession.delete(database)
+        for pool_database in instance.pool_databases:
+            dbsession.delete(pool_database)
+        for maintenance_run in instance.maintenance_runs:
+            dbsession.delete(maintenance_run)
         dbsession.delete(instance)
 
 
 def add_db(
     instance_name: str,
     db_name: str,
+    shared: bool = False,
 ) -> None:
     log.info("Storing info about database %s (%s)", db_name, instance_name)
     with Session.begin() as dbsession:
@@ -54,6 +90,7 @@ def add_db(
         assert instance is not None
         database = Database(
             name=db_name,
+            shared=shared,
             instance=instance,
         )
         dbsession.add(database)
@@ -72,10 +109,199 @@ def remove_db(
             log.info("Database not found, doing nothing")
             return
         assert len(database.users) == 0
+        assert len(database.schemas) == 0
+        dbsession.execute(
+            delete(DatabaseSize).where(DatabaseSize.database_id == database.id)
+        )
         dbsession.delete(database)
 
 
-def add_user(instance_name: str, db_name: str, user_name: str, password: str) -> None:
+def get_shared_db_name(instance_name: str, max_schemas: int) -> str | None:
+    with Session.begin() as dbsession:
+        stmt = (
+            select(Database.name)
+            .join(Instance)
+            .outerjoin(Schema)
+            .where(Instance.name == instance_name)
+            .where(Database.shared.is_(True))
+            .group_by(Database.id)
+            .having(func.count(Schema.id) < max_schemas)
+            .order_by(func.count(Schema.id))
+            .limit(1)
+        )
+        return dbsession.scalars(stmt).first()
+
+
+def add_schema(instance_name: str, db_name: str, schema_name: str) -> None:
+    log.info(
+        "Storing info about schema %s in database %s (%s)",
+        schema_name,
+        db_name,
+        instance_name,
+    )
+    with Session.begin() as dbsession:
+        database = get_database(
+            dbsession=dbsession, instance_name=instance_name, db_name=db_name
+        )
+        assert database is not None
+        schema = Schema(
+            name=schema_name,
+            database=database,
+        )
+        dbsession.add(schema)
+
+
+def remove_schema(instance_name: str, schema_name: str) -> None:
+    log.info("Removing info about schema %s (%s)", schema_name, instance_name)
+    with Session.begin() as dbsession:
+        schema = get_schema(
+            dbsession=dbsession, instance_name=instance_name, schema_name=schema_name
+        )
+        if schema is None:
+            log.info("Schema not found, doing nothing")
+            return
+        assert len(schema.users) == 0
+        dbsession.delete(schema)
+
+
+def get_schema(
+    dbsession: DBSession, instance_name: str, schema_name: str
+) -> Schema | None:
+    stmt = (
+        select(Schema)
+        .join(Database)
+        .join(Instance)
+        .where(Schema.name == schema_name)
+        .where(Instance.name == instance_name)
+        .limit(1)
+    )
+    result = dbsession.execute(stmt)
+    schema = result.scalars().first()
+    return schema
+
+
+def get_schemas(dbsession: DBSession, instance_name: str) -> Sequence[Schema]:
+    stmt = (
+        select(Schema)
+        .join(Database)
+        .join(Instance)
+        .where(Instance.name == instance_name)
+        .order_by(Schema.created)
+    )
+    result = dbsession.execute(stmt)
+    schemas = result.scalars().all()
+    return schemas
+
+
+def set_pool_size(instance_name: str, pool_size: int) -> None:
+    log.info("Setting database pool size of %s to %d", instance_name, pool_size)
+    with Session.begin() as dbsession:
+        instance = get_instance_by_name(dbsession, instance_name)
+        assert instance is not None
+        instance.pool_size = pool_size
+
+
+def set_stat_statements(instance_name: str, enabled: bool) -> None:
+    log.info("Setting pg_stat_statements of %s to %s", instance_name, enabled)
+    with Session.begin() as dbsession:
+        instance = get_instance_by_name(dbsession, instance_name)
+        assert instance is not None
+        instance.stat_statements = enabled
+
+
+def set_resources(
+    instance_name: str,
+    cpus: float | None,
+    memory: str | None,
+    shm_size: str | None,
+) -> None:
+    log.info("Setting resources of %s", instance_name)
+    with Session.begin() as dbsession:
+        instance = get_instance_by_name(dbsession, instance_name)
+        assert instance is not None
+        instance.cpus = cpus
+        instance.memory = memory
+        instance.shm_size = shm_size
+
+
+def set_termination_policy(
+    instance_name: str,
+    max_query_seconds: int | None,
+    max_idle_in_transaction_seconds: int | None,
+) -> None:
+    log.info("Setting termination policy of %s", instance_name)
+    with Session.begin() as dbsession:
+        instance = get_instance_by_name(dbsession, instance_name)
+        assert instance is not None
+        instance.max_query_seconds = max_query_seconds
+        instance.max_idle_in_transaction_seconds = max_idle_in_transaction_seconds
+
+
+def add_pool_db(instance_name: str, db_name: str) -> None:
+    log.info("Storing info about pooled database %s (%s)", db_name, instance_name)
+    with Session.begin() as dbsession:
+        instance = get_instance_by_name(dbsession, instance_name)
+        assert instance is not None
+        pool_database = PoolDatabase(
+            name=db_name,
+            instance=instance,
+        )
+        dbsession.add(pool_database)
+
+
+def claim_pool_db(instance_name: str) -> str | None:
+    with Session.begin() as dbsession:
+        stmt = (
+            select(PoolDatabase)
+            .join(Instance)
+            .where(Instance.name == instance_name)
+            .order_by(PoolDatabase.created)
+            .limit(1)
+        )
+        result = dbsession.execute(stmt)
+        pool_database = result.scalars().first()
+        if pool_database is None:
+            log.info("No pooled database available for %s", instance_name)
+            return None
+        db_name = pool_database.name
+        log.info("Claiming pooled database %s (%s)", db_name, instance_name)
+        database = Database(
+            name=db_name,
+            instance=pool_database.instance,
+        )
+        dbsession.delete(pool_database)
+        dbsession.add(database)
+    return db_name
+
+
+def remove_pool_db(instance_name: str, db_name: str) -> bool:
+    log.info("Removing info about pooled database %s (%s)", db_name, instance_name)
+    with Session.begin() as dbsession:
+        # a single DELETE, so that it cannot also remove a database claimed
+        # in the meantime: the row is either still pooled or gone
+        result = dbsession.execute(
+            delete(PoolDatabase)
+            .where(PoolDatabase.name == db_name)
+            .where(
+                PoolDatabase.instance_id
+                == select(Instance.id)
+                .where(Instance.name == instance_name)
+                .scalar_subquery()
+            )
+        )
+        if result.rowcount == 0:
+            log.info("Pooled database not found, it was claimed or removed")
+            return False
+        return True
+
+
+def add_user(
+    instance_name: str,
+    db_name: str,
+    user_name: str,
+    password: str,
+    schema_name: str | None = None,
+) -> None:
     log.info(
         "Storing info about user %s for database %s (%s)",
         user_name,
@@ -88,14 +314,52 @@ def add_user(instance_name: str, db_name: str, user_name: str, password: str) ->
             dbsession=dbsession, instance_name=instance_name, db_name=db_name
         )
         assert database is not None
+        schema = None
+        if schema_name is not None:
+            schema = get_schema(
+                dbsession=dbsession,
+                instance_name=instance_name,
+                schema_name=schema_name,
+            )
+            assert schema is not None
         user = User(
             name=user_name,
             password=password,
             database=database,
+            schema=schema,
         )
         dbsession.add(user)
 
 
+def set_user_limits(
+    instance_name: str,
+    db_name: str,
+    user_name: str,
+    connection_limit: int | None,
+    statement_timeout: str | None,
+    idle_in_transaction_session_timeout: str | None,
+    work_mem: str | None,
+) -> None:
+    log.info(
+        "Storing limits for user %s for database %s (%s)",
+        user_name,
+        db_name,
+        instance_name,
+    )
+    with Session.begin() as dbsession:
+        user = get_user(
+            dbsession=dbsession,
+            instance_name=instance_name,
+            db_name=db_name,
+            user_name=user_name,
+        )
+        assert user is not None
+        user.connection_limit = connection_limit
+        user.statement_timeout = statement_timeout
+        user.idle_in_transaction_session_timeout = idle_in_transaction_session_timeout
+        user.work_mem = work_mem
+
+
 def get_database(
     dbsession: DBSession, instance_name: str, db_name: str
 ) -> Database | None:
@@ -139,6 +403,7 @@ def add_attachment(
     user_name: str,
     project_name: str,
     var_name: str,
+    conn_params: dict[str, str] | None,
 ):
     log.info(
         "Saving info about env variable %s for project %s for database %s (%s)",
@@ -158,11 +423,60 @@ def add_attachment(
         attachment = Attachment(
             project_name=project_name,
             env_var=var_name,
+            conn_params=None if conn_params is None else json.dumps(conn_params),
             user=user,
         )
         dbsession.add(attachment)
 
 
+def set_attachment_conn_params(
+    attachment_ids: list[str], conn_params: dict[str, str] | None
+) -> None:
+    log.info("Setting connection parameters of %d attachment(s)", len(attachment_ids))
+    with Session.begin() as dbsession:
+        for attachment_id in attachment_ids:
+            attachment = dbsession.get(Attachment, attachment_id)
+            assert attachment is not None
+            attachment.conn_params = (
+                None if conn_params is None else json.dumps(conn_params)
+            )
+
+
+def remove_attachment(
+    instance_name: str,
+    db_name: str,
+    user_name: str,
+    project_name: str,
+    var_name: str,
+) -> int:
+    log.info(
+        "Removing info about env variable %s for project %s for database %s (%s)",
+        var_name,
+        project_name,
+        db_name,
+        instance_name,
+    )
+    with Session.begin() as dbsession:
+        user = get_user(
+            dbsession=dbsession,
+            instance_name=instance_name,
+            db_name=db_name,
+            user_name=user_name,
+        )
+        if user is None:
+            return 0
+        remaining = 0
+        for attachment in user.attachments:
+            if (
+                attachment.project_name == project_name
+                and attachment.env_var == var_name
+            ):
+                dbsession.delete(attachment)
+            else:
+                remaining += 1
+        return remaining
+
+
 def get_user(
     dbsession: DBSession, instance_name: str, db_name: str, user_name: str
 ) -> User | None:
@@ -224,6 +538,7 @@ def get_attachments(
         select(Attachment)
         .join(User)
         .join(Database)
+        .join(Database.instance)
         .where(Attachment.project_name == project_name)
         .where(Database.name == db_name)
         .where(Instance.name == instance_name)
@@ -235,6 +550,31 @@ def get_attachments(
     return attachments
 
 
+def get_schema_attachments(
+    dbsession: DBSession,
+    instance_name: str,
+    schema_name: str,
+    project_name: str | None,
+    env_var: str | None,
+) -> Sequence[Attachment]:
+    stmt = (
+        select(Attachment)
+        .join(Attachment.user)
+        .join(User.schema)
+        .join(Schema.database)
+        .join(Database.instance)
+        .where(Schema.name == schema_name)
+        .where(Instance.name == instance_name)
+    )
+    if project_name is not None:
+        stmt = stmt.where(Attachment.project_name == project_name)
+    if env_var is not None:
+        stmt = stmt.where(Attachment.env_var == env_var)
+    result = dbsession.execute(stmt)
+    attachments = result.scalars().all()
+    return attachments
+
+
 def get_instances(dbsession: DBSession) -> Sequence[Instance]:
     stmt = select(Instance)
     result = dbsession.execute(stmt)
@@ -242,6 +582,28 @@ def get_instances(dbsession: DBSession) -> Sequence[Instance]:
     return attachments
 
 
+def iter_instances(dbsession: DBSession, batch_size: int = 50) -> Iterator[Instance]:
+    # Instances are fetched batch_size at a time with their databases, users
+    # and attachments loaded per batch, so memory does not grow with the
+    # size of the inventory.
+    stmt = (
+        select(Instance)
+        .order_by(Instance.created)
+        .options(
+            selectinload(Instance.pool_databases),
+            selectinload(Instance.databases)
+            .selectinload(Database.users)
+            .selectinload(User.attachments),
+            selectinload(Instance.databases)
+            .selectinload(Database.users)
+            .selectinload(User.schema),
+        )
+        .execution_options(yield_per=batch_size)
+    )
+    for instance in dbsession.scalars(stmt):
+        yield instance
+
+
 def get_attachments_for_project(
     dbsession: DBSession,
     project_name: str,
@@ -268,3 +630,616 @@ def get_attachments_for_database(
     result = dbsession.execute(stmt)
     attachments = result.scalars().all()
     return attachments
+
+
+def get_attachments_by_user_name(
+    dbsession: DBSession, instance: Instance
+) -> dict[str, list[Attachment]]:
+    attachments_by_user_name: dict[str, list[Attachment]] = {}
+    for attachment in get_attachments_for_instance(dbsession, instance):
+        attachments_by_user_name.setdefault(attachment.user.name, []).append(attachment)
+    return attachments_by_user_name
+
+
+def add_maintenance_run(
+    instance_name: str,
+    db_name: str,
+    operation: str,
+    status: str,
+    duration: float,
+    error: str | None,
+) -> None:
+    with Session.begin() as dbsession:
+        instance = get_instance_by_name(dbsession, instance_name)
+        assert instance is not None
+        maintenance_run = MaintenanceRun(
+            db_name=db_name,
+            operation=operation,
+            status=status,
+            duration=duration,
+            error=error,
+            instance=instance,
+        )
+        dbsession.add(maintenance_run)
+
+
+def add_queued_maintenance_runs(
+    instance_name: str,
+    db_names: list[str],
+    operations: list[str],
+    timeout_seconds: int,
+) -> list[str]:
+    with Session.begin() as dbsession:
+        instance = get_instance_by_name(dbsession, instance_name)
+        assert instance is not None
+        maintenance_runs = [
+            MaintenanceRun(
+                db_name=db_name,
+                operation=operation,
+                status="queued",
+                timeout_seconds=timeout_seconds,
+                instance=instance,
+            )
+            for db_name in db_names
+            for operation in operations
+        ]
+        dbsession.add_all(maintenance_runs)
+        dbsession.flush()
+        return [maintenance_run.id for maintenance_run in maintenance_runs]
+
+
+def claim_maintenance_runs() -> (
+    tuple[str, list[tuple[str, str, str, int | None]]] | None
+):
+    # All the queued runs of the instance queued first, in the order queued.
+    with Session.begin() as dbsession:
+        stmt = (
+            select(MaintenanceRun)
+            .where(MaintenanceRun.status == "queued")
+            .order_by(MaintenanceRun.created)
+            .limit(1)
+        )
+        result = dbsession.execute(stmt)
+        first_run = result.scalars().first()
+        if first_run is None:
+            return None
+        instance = first_run.instance
+        stmt = (
+            select(MaintenanceRun)
+            .where(MaintenanceRun.instance == instance)
+            .where(MaintenanceRun.status == "queued")
+            .order_by(MaintenanceRun.created)
+        )
+        result = dbsession.execute(stmt)
+        runs = []
+        for maintenance_run in result.scalars().all():
+            maintenance_run.status = "running"
+            runs.append(
+                (
+                    maintenance_run.id,
+                    maintenance_run.db_name,
+                    maintenance_run.operation,
+                    maintenance_run.timeout_seconds,
+                )
+            )
+        log.info(
+            "Starting %d queued maintenance run(s) on %s", len(runs), instance.log()
+        )
+        return instance.name, runs
+
+
+def finish_maintenance_run(
+    run_id: str, status: str, duration: float, error: str | None
+) -> None:
+    with Session.begin() as dbsession:
+        maintenance_run = dbsession.get(MaintenanceRun, run_id)
+        if maintenance_run is None:
+            # instance removed in the meantime
+            return
+        maintenance_run.status = status
+        maintenance_run.duration = duration
+        maintenance_run.error = error
+
+
+def fail_stale_maintenance_runs(before: datetime) -> None:
+    with Session.begin() as dbsession:
+        result = dbsession.execute(
+            update(MaintenanceRun)
+            .where(MaintenanceRun.status == "running")
+            .where(MaintenanceRun.updated < before)
+            .values(status="error", error="Interrupted")
+        )
+        if result.rowcount > 0:
+            log.warning("Failed %d stale maintenance run(s)", result.rowcount)
+
+
+def prune_maintenance_runs(before: datetime) -> None:
+    with Session.begin() as dbsession:
+        result = dbsession.execute(
+            delete(MaintenanceRun)
+            .where(MaintenanceRun.created < before)
+            .where(MaintenanceRun.status.not_in(["queued", "running"]))
+        )
+        if result.rowcount > 0:
+            log.info("Pruned %d maintenance run(s)", result.rowcount)
+
+
+def get_maintenance_runs(
+    dbsession: DBSession, instance: Instance, limit: int
+) -> Sequence[MaintenanceRun]:
+    stmt = (
+        select(MaintenanceRun)
+        .where(MaintenanceRun.instance == instance)
+        .order_by(MaintenanceRun.created.desc())
+        .limit(limit)
+    )
+    result = dbsession.execute(stmt)
+    maintenance_runs = result.scalars().all()
+    return maintenance_runs
+
+
+def set_instance_version(instance_name: str, image: str, version: str) -> None:
+    log.info("Setting version of %s to %s:%s", instance_name, image, version)
+    with Session.begin() as dbsession:
+        instance = get_instance_by_name(dbsession, instance_name)
+        assert instance is not None
+        instance.image = image
+        instance.version = version
+
+
+def move_databases(source_instance_name: str, target_instance_name: str) -> None:
+    log.info(
+        "Moving info about databases from %s to %s",
+        source_instance_name,
+        target_instance_name,
+    )
+    with Session.begin() as dbsession:
+        source_instance = get_instance_by_name(dbsession, source_instance_name)
+        target_instance = get_instance_by_name(dbsession, target_instance_name)
+        assert source_instance is not None
+        assert target_instance is not None
+        for database in list(source_instance.databases):
+            database.instance = target_instance
+
+
+def move_database(
+    source_instance_name: str, target_instance_name: str, db_name: str
+) -> None:
+    log.info(
+        "Moving info about database %s from %s to %s",
+        db_name,
+        source_instance_name,
+        target_instance_name,
+    )
+    with Session.begin() as dbsession:
+        database = get_database(
+            dbsession=dbsession, instance_name=source_instance_name, db_name=db_name
+        )
+        target_instance = get_instance_by_name(dbsession, target_instance_name)
+        assert database is not None
+        assert target_instance is not None
+        database.instance = target_instance
+
+
+def add_instance_upgrade(
+    instance_name: str,
+    method: str,
+    from_version: str,
+    to_version: str,
+    image: str,
+    jobs: int,
+    api_key: str,
+) -> str:
+    log.info("Queuing upgrade of %s to %s", instance_name, to_version)
+    with Session.begin() as dbsession:
+        instance_upgrade = InstanceUpgrade(
+            instance_name=instance_name,
+            method=method,
+            from_version=from_version,
+            to_version=to_version,
+            image=image,
+            jobs=jobs,
+            api_key=api_key,
+            status="queued",
+            phases="[]",
+        )
+        dbsession.add(instance_upgrade)
+        dbsession.flush()
+        return instance_upgrade.id
+
+
+def update_instance_upgrade(
+    upgrade_id: str,
+    status: str,
+    phases: str,
+    error: str | None,
+    target_instance_name: str | None,
+) -> None:
+    with Session.begin() as dbsession:
+        instance_upgrade = dbsession.get(InstanceUpgrade, upgrade_id)
+        assert instance_upgrade is not None
+        instance_upgrade.status = status
+        instance_upgrade.phases = phases
+        instance_upgrade.error = error
+        instance_upgrade.target_instance_name = target_instance_name
+
+
+def claim_instance_upgrade() -> tuple[str, str] | None:
+    with Session.begin() as dbsession:
+        stmt = (
+            select(InstanceUpgrade)
+            .where(InstanceUpgrade.status == "queued")
+            .order_by(InstanceUpgrade.created)
+            .limit(1)
+        )
+        result = dbsession.execute(stmt)
+        instance_upgrade = result.scalars().first()
+        if instance_upgrade is None:
+            return None
+        log.info("Starting queued upgrade %s", instance_upgrade.log())
+        api_key = instance_upgrade.api_key
+        assert api_key is not None
+        instance_upgrade.status = "running"
+        instance_upgrade.api_key = None
+        return instance_upgrade.id, api_key
+
+
+def get_instance_upgrade(
+    dbsession: DBSession, upgrade_id: str
+) -> InstanceUpgrade | None:
+    return dbsession.get(InstanceUpgrade, upgrade_id)
+
+
+def get_unfinished_instance_upgrade(
+    dbsession: DBSession, instance_name: str
+) -> InstanceUpgrade | None:
+    stmt = (
+        select(InstanceUpgrade)
+        .where(InstanceUpgrade.instance_name == instance_name)
+        .where(InstanceUpgrade.status.in_(["queued", "running"]))
+        .limit(1)
+    )
+    result = dbsession.execute(stmt)
+    return result.scalars().first()
+
+
+def get_instance_upgrades(
+    dbsession: DBSession, instance_name: str
+) -> Sequence[InstanceUpgrade]:
+    stmt = (
+        select(InstanceUpgrade)
+        .where(InstanceUpgrade.instance_name == instance_name)
+        .order_by(InstanceUpgrade.created.desc())
+    )
+    result = dbsession.execute(stmt)
+    instance_upgrades = result.scalars().all()
+    return instance_upgrades
+
+
+def add_database_move(
+    source_instance_name: str,
+    target_instance_name: str,
+    db_name: str,
+    max_lag_bytes: int,
+    allow_restart: bool,
+    api_key: str,
+) -> str:
+    log.info(
+        "Queuing move of %s from %s to %s",
+        db_name,
+        source_instance_name,
+        target_instance_name,
+    )
+    with Session.begin() as dbsession:
+        database_move = DatabaseMove(
+            db_name=db_name,
+            source_instance_name=source_instance_name,
+            target_instance_name=target_instance_name,
+            status="queued",
+            phases="[]",
+            max_lag_bytes=max_lag_bytes,
+            allow_restart=allow_restart,
+            api_key=api_key,
+        )
+        dbsession.add(database_move)
+        dbsession.flush()
+        return database_move.id
+
+
+def claim_database_move() -> str | None:
+    with Session.begin() as dbsession:
+        stmt = (
+            select(DatabaseMove)
+            .where(DatabaseMove.status == "queued")
+            .order_by(DatabaseMove.created)
+            .limit(1)
+        )
+        result = dbsession.execute(stmt)
+        database_move = result.scalars().first()
+        if database_move is None:
+            return None
+        log.info("Starting queued move %s", database_move.log())
+        database_move.status = "running"
+        return database_move.id
+
+
+def get_database_move(dbsession: DBSession, move_id: str) -> DatabaseMove | None:
+    return dbsession.get(DatabaseMove, move_id)
+
+
+def get_running_database_moves(dbsession: DBSession) -> Sequence[DatabaseMove]:
+    stmt = (
+        select(DatabaseMove)
+        .where(DatabaseMove.status == "running")
+        .order_by(DatabaseMove.created)
+    )
+    result = dbsession.execute(stmt)
+    database_moves = result.scalars().all()
+    return database_moves
+
+
+def get_unfinished_database_move(
+    dbsession: DBSession, instance_name: str, db_name: str
+) -> DatabaseMove | None:
+    stmt = (
+        select(DatabaseMove)
+        .where(DatabaseMove.source_instance_name == instance_name)
+        .where(DatabaseMove.db_name == db_name)
+        .where(DatabaseMove.status.in_(["queued", "running"]))
+        .limit(1)
+    )
+    result = dbsession.execute(stmt)
+    return result.scalars().first()
+
+
+def update_database_move(
+    move_id: str,
+    status: str,
+    phases: str,
+    lag_bytes: int | None,
+    error: str | None,
+) -> None:
+    with Session.begin() as dbsession:
+        database_move = dbsession.get(DatabaseMove, move_id)
+        assert database_move is not None
+        database_move.status = status
+        database_move.phases = phases
+        database_move.lag_bytes = lag_bytes
+        database_move.error = error
+        if status in ("complete", "failed"):
+            database_move.api_key = None
+
+
+def get_database_moves(
+    dbsession: DBSession, instance_name: str
+) -> Sequence[DatabaseMove]:
+    stmt = (
+        select(DatabaseMove)
+        .where(DatabaseMove.source_instance_name == instance_name)
+        .order_by(DatabaseMove.created.desc())
+    )
+    result = dbsession.execute(stmt)
+    database_moves = result.scalars().all()
+    return database_moves
+
+
+def has_move_or_upgrade_in_progress(dbsession: DBSession, instance_name: str) -> bool:
+    stmt = (
+        select(DatabaseMove.id)
+        .where(DatabaseMove.status.in_(["queued", "running"]))
+        .where(
+            (DatabaseMove.source_instance_name == instance_name)
+            | (DatabaseMove.target_instance_name == instance_name)
+        )
+        .limit(1)
+    )
+    if dbsession.execute(stmt).first() is not None:
+        return True
+    stmt = (
+        select(InstanceUpgrade.id)
+        .where(InstanceUpgrade.status.in_(["queued", "running"]))
+        .where(
+            (InstanceUpgrade.instance_name == instance_name)
+            | (InstanceUpgrade.target_instance_name == instance_name)
+        )
+        .limit(1)
+    )
+    return dbsession.execute(stmt).first() is not None
+
+
+def add_database_sizes(
+    instance_name: str, sizes: dict[str, int], growth_window_seconds: int
+) -> None:
+    log.info("Storing sizes of %d database(s) of %s", len(sizes), instance_name)
+    now = datetime.now(timezone.utc)
+    window_start = now - timedelta(seconds=growth_window_seconds)
+    with Session.begin() as dbsession:
+        instance = get_instance_by_name(dbsession, instance_name)
+        assert instance is not None
+        databases = [
+            database for database in instance.databases if database.name in sizes
+        ]
+        # oldest sample inside the window of each database, for the growth rate
+        stmt = (
+            select(DatabaseSize.database_id, DatabaseSize.created, DatabaseSize.size)
+            .where(
+                DatabaseSize.database_id.in_([database.id for database in databases])
+            )
+            .where(DatabaseSize.created >= window_start)
+            .order_by(DatabaseSize.created)
+        )
+        oldest_samples: dict[str, tuple[datetime, int]] = {}
+        for database_id, created, size in dbsession.execute(stmt):
+            oldest_samples.setdefault(database_id, (created, size))
+        for database in databases:
+            size = sizes[database.name]
+            dbsession.add(DatabaseSize(size=size, database=database, created=now))
+            database.size = size
+            database.size_measured = now
+            database.size_growth_per_day = None
+            if database.id in oldest_samples:
+                created, oldest_size = oldest_samples[database.id]
+                elapsed = (now - created).total_seconds()
+                # a rate extrapolated from a few minutes of history is noise
+                if elapsed >= growth_window_seconds / 2:
+                    database.size_growth_per_day = (
+                        (size - oldest_size) / elapsed * 24 * 3600
+                    )
+
+
+def prune_database_sizes(before: datetime) -> None:
+    with Session.begin() as dbsession:
+        result = dbsession.execute(
+            delete(DatabaseSize).where(DatabaseSize.created < before)
+        )
+        log.info("Pruned %d database size sample(s)", result.rowcount)
+
+
+def get_database_sizes(
+    dbsession: DBSession, database: Database, limit: int
+) -> Sequence[DatabaseSize]:
+    stmt = (
+        select(DatabaseSize)
+        .where(DatabaseSize.database == database)
+        .order_by(DatabaseSize.created.desc())
+        .limit(limit)
+    )
+    result = dbsession.execute(stmt)
+    database_sizes = result.scalars().all()
+    return database_sizes
+
+
+def set_quota(
+    instance_name: str,
+    db_name: str,
+    soft_quota: int | None,
+    hard_quota: int | None,
+) -> None:
+    log.info("Setting quota of database %s (%s)", db_name, instance_name)
+    with Session.begin() as dbsession:
+        database = get_database(
+            dbsession=dbsession, instance_name=instance_name, db_name=db_name
+        )
+        assert database is not None
+        database.soft_quota = soft_quota
+        database.hard_quota = hard_quota
+
+
+def set_quota_blocked(instance_name: str, db_name: str, blocked: bool) -> None:
+    log.info(
+        "Marking database %s (%s) as %s",
+        db_name,
+        instance_name,
+        "blocked" if blocked else "unblocked",
+    )
+    with Session.begin() as dbsession:
+        database = get_database(
+            dbsession=dbsession, instance_name=instance_name, db_name=db_name
+        )
+        assert database is not None
+        database.quota_blocked = blocked
+
+
+def add_operation(
+    kind: str, instance_name: str, request: str, idempotency_key: str | None
+) -> str:
+    with Session.begin() as dbsession:
+        operation = Operation(
+            kind=kind,
+            instance_name=instance_name,
+            request=request,
+            idempotency_key=idempotency_key,
+            status="running",
+        )
+        dbsession.add(operation)
+        dbsession.flush()
+        return operation.id
+
+
+def get_operation_by_idempotency_key(
+    dbsession: DBSession, idempotency_key: str
+) -> Operation | None:
+    stmt = (
+        select(Operation)
+        .where(Operation.idempotency_key == idempotency_key)
+        .options(selectinload(Operation.steps))
+    )
+    result = dbsession.execute(stmt)
+    return result.scalars().first()
+
+
+def restart_operation(operation_id: str, status: str, updated: datetime) -> bool:
+    # Only if nobody else resumed it since it was read, returns whether it did.
+    with Session.begin() as dbsession:
+        result = dbsession.execute(
+            update(Operation)
+            .where(Operation.id == operation_id)
+            .where(Operation.status == status)
+            .where(Operation.updated == updated)
+            .values(status="running", error=None, updated=datetime.now(timezone.utc))
+        )
+        if result.rowcount == 0:
+            return False
+    log.info("Resuming operation %s", operation_id)
+    return True
+
+
+def add_operation_step(
+    operation_id: str,
+    name: str,
+    status: str,
+    duration: float,
+    result: str | None,
+    error: str | None,
+) -> None:
+    with Session.begin() as dbsession:
+        operation = dbsession.get(Operation, operation_id)
+        assert operation is not None
+        operation_step = OperationStep(
+            name=name,
+            status=status,
+            duration=duration,
+            result=result,
+            error=error,
+            operation=operation,
+        )
+        dbsession.add(operation_step)
+        # steps are only appended, keeps track of whether it is still running
+        operation.updated = datetime.now(timezone.utc)
+
+
+def finish_operation(
+    operation_id: str, status: str, response: str | None, error: str | None
+) -> None:
+    with Session.begin() as dbsession:
+        operation = dbsession.get(Operation, operation_id)
+        assert operation is not None
+        operation.status = status
+        operation.response = response
+        operation.error = error
+
+
+def get_operations(
+    dbsession: DBSession, instance_name: str, limit: int
+) -> Sequence[Operation]:
+    stmt = (
+        select(Operation)
+        .where(Operation.instance_name == instance_name)
+        .options(selectinload(Operation.steps))
+        .order_by(Operation.created.desc())
+        .limit(limit)
+    )
+    result = dbsession.execute(stmt)
+    operations = result.scalars().all()
+    return operations
+
+
+def prune_operations(before: datetime) -> None:
+    with Session.begin() as dbsession:
+        operation_ids = select(Operation.id).where(Operation.created < before)
+        dbsession.execute(
+            delete(OperationStep).where(OperationStep.operation_id.in_(operation_ids))
+        )
+        result = dbsession.execute(delete(Operation).where(Operation.created < before))
+        if result.rowcount > 0:
+            log.info("Pruned %d operation(s)", result.rowcount)
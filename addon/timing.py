@@ -0,0 +1,175 @@
+import functools
+import json
+import logging
+import time
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Any, Callable, TypeVar
+
+log = logging.getLogger(__name__)
+
+F = TypeVar("F", bound=Callable[..., Any])
+
+startup_duration: float | None = None
+
+
+@dataclass
+class Timing:
+    category: str
+    name: str
+    duration: float
+    error: bool = False
+    # e.g. the HTTP status code of a Disco call
+    status: str | None = None
+
+
+request_timings: ContextVar[list[Timing] | None] = ContextVar(
+    "request_timings", default=None
+)
+
+call_statuses: ContextVar[list[str] | None] = ContextVar("call_statuses", default=None)
+
+
+def record(
+    category: str,
+    name: str,
+    duration: float,
+    error: bool = False,
+    status: str | None = None,
+) -> None:
+    timings = request_timings.get()
+    if timings is not None:
+        timings.append(
+            Timing(
+                category=category,
+                name=name,
+                duration=duration,
+                error=error,
+                status=status,
+            )
+        )
+
+
+def record_status(status: str) -> None:
+    statuses = call_statuses.get()
+    if statuses is not None:
+        statuses.append(status)
+
+
+def timed(category: str) -> Callable[[F], F]:
+    def decorator(func: F) -> F:
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            statuses: list[str] = []
+            token = call_statuses.set(statuses)
+            start = time.perf_counter()
+            try:
+                result = func(*args, **kwargs)
+            except Exception:
+                record(
+                    category,
+                    func.__name__,
+                    time.perf_counter() - start,
+                    error=True,
+                    status=statuses[-1] if statuses else None,
+                )
+                raise
+            finally:
+                call_statuses.reset(token)
+            record(
+                category,
+                func.__name__,
+                time.perf_counter() - start,
+                status=statuses[-1] if statuses else None,
+            )
+            return result
+
+        return wrapper  # type: ignore
+
+    return decorator
+
+
+def instrument_sessions(session_factory) -> None:
+    from sqlalchemy import event
+
+    @event.listens_for(session_factory, "after_begin")
+    def after_begin(session, transaction, connection):
+        session.info["timing_start"] = time.perf_counter()
+
+    @event.listens_for(session_factory, "after_commit")
+    def after_commit(session):
+        record_session(session, "commit")
+
+    @event.listens_for(session_factory, "after_rollback")
+    def after_rollback(session):
+        record_session(session, "rollback", error=True)
+
+
+def record_session(session, name: str, error: bool = False) -> None:
+    start = session.info.pop("timing_start", None)
+    if start is not None:
+        record("storage", name, time.perf_counter() - start, error=error)
+
+
+def server_timing_header(timings: list[Timing], total: float) -> str:
+    categories: dict[str, list[float]] = {}
+    for timing in timings:
+        categories.setdefault(timing.category, []).append(timing.duration)
+    metrics = [
+        f'{category};dur={sum(durations) * 1000:.1f};desc="{len(durations)} calls"'
+        for category, durations in categories.items()
+    ]
+    if startup_duration is not None:
+        metrics.append(f"startup;dur={startup_duration * 1000:.1f}")
+    metrics.append(f"total;dur={total * 1000:.1f}")
+    return ", ".join(metrics)
+
+
+class TimingMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        timings: list[Timing] = []
+        token = request_timings.set(timings)
+        start = time.perf_counter()
+        status_code: int | None = None
+
+        async def send_with_timing(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                header = server_timing_header(timings, time.perf_counter() - start)
+                message["headers"] = list(message.get("headers", [])) + [
+                    (b"server-timing", header.encode())
+                ]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            request_timings.reset(token)
+            log.info(
+                "Request timing %s",
+                json.dumps(
+                    {
+                        "method": scope["method"],
+                        "path": scope["path"],
+                        "status": status_code,
+                        "total": time.perf_counter() - start,
+                        "startup": startup_duration,
+                        "calls": [
+                            {
+                                "category": timing.category,
+                                "name": timing.name,
+                                "duration": timing.duration,
+                                "error": timing.error,
+                            }
+                            for timing in timings
+                        ],
+                    }
+                ),
+            )
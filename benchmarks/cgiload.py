@@ -0,0 +1,222 @@
+"""Concurrent CGI load against the shared SQLite database.
+
+Disco runs one addon_cgi process per request, all sharing one SQLite
+file. This spawns many such processes in parallel (through the
+CGIHandler path, with a synthetic CGI environment) against a fake Disco
+API and the Postgres stand-in, and reports per-request latency, time
+spent waiting on SQLite and "database is locked" failure rates.
+
+    python -m benchmarks.cgiload --requests 200 --concurrency 16 --workload mixed
+"""
+
+import argparse
+import json
+import logging
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any
+
+from benchmarks import environment
+from benchmarks.cgiworker import STATS_PREFIX
+from benchmarks.fakedisco import FakeDisco
+
+WORKLOADS = ["read", "create-database", "attach", "mixed"]
+
+
+@dataclass
+class CGIResult:
+    name: str
+    status: int
+    latency: float
+    locked: bool
+    stats: dict[str, Any] | None
+
+
+def cgi_environ(method: str, path: str, body: bytes) -> dict[str, str]:
+    environ = dict(os.environ)
+    environ.update(
+        {
+            "GATEWAY_INTERFACE": "CGI/1.1",
+            "REQUEST_METHOD": method,
+            "SCRIPT_NAME": "",
+            "PATH_INFO": path,
+            "QUERY_STRING": "",
+            "SERVER_NAME": "postgres-addon",
+            "SERVER_PORT": "80",
+            "SERVER_PROTOCOL": "HTTP/1.1",
+            "CONTENT_LENGTH": str(len(body)),
+            "CONTENT_TYPE": "application/json",
+            "HTTP_ACCEPT": "application/json",
+        }
+    )
+    return environ
+
+
+def run_cgi(name: str, method: str, path: str, body: Any) -> CGIResult:
+    data = b"" if body is None else json.dumps(body).encode()
+    start = time.perf_counter()
+    process = subprocess.run(
+        [sys.executable, "-m", "benchmarks.cgiworker"],
+        input=data,
+        capture_output=True,
+        env=cgi_environ(method, path, data),
+        cwd=environment.REPO_ROOT,
+    )
+    latency = time.perf_counter() - start
+    stdout = process.stdout.decode(errors="replace")
+    stderr = process.stderr.decode(errors="replace")
+    status = 0
+    if stdout.startswith("Status: "):
+        status = int(stdout[len("Status: ") :].split(" ", 1)[0])
+    stats = None
+    for line in stderr.splitlines():
+        if line.startswith(STATS_PREFIX):
+            stats = json.loads(line[len(STATS_PREFIX) :])
+    if status >= 400 or status == 0:
+        logging.warning("%s %s: %d\n%s", method, path, status, stderr[-2000:])
+    return CGIResult(
+        name=name,
+        status=status,
+        latency=latency,
+        locked="database is locked" in stderr,
+        stats=stats,
+    )
+
+
+def seed(args, disco: FakeDisco) -> tuple[str, list[str]]:
+    from fastapi.testclient import TestClient
+
+    from addon.api import app
+    from benchmarks.standins import install_postgres
+
+    install_postgres(None)
+    client = TestClient(app)
+    response = client.post("/instances", json={})
+    assert response.status_code == 201, response.text
+    instance = response.json()["instance"]["name"]
+    databases = []
+    for _ in range(args.databases):
+        response = client.post(f"/instances/{instance}/databases")
+        assert response.status_code == 201, response.text
+        databases.append(response.json()["database"]["name"])
+    for index in range(args.requests):
+        disco.add_project(f"bench-app-{index}")
+    return instance, databases
+
+
+def build_calls(
+    workload: str, count: int, instance: str, databases: list[str]
+) -> list[tuple[str, str, str, Any]]:
+    calls: list[tuple[str, str, str, Any]] = []
+    for index in range(count):
+        name = workload
+        if workload == "mixed":
+            name = WORKLOADS[index % (len(WORKLOADS) - 1)]
+        if name == "read":
+            calls.append((name, "GET", "/instances", None))
+        elif name == "create-database":
+            calls.append((name, "POST", f"/instances/{instance}/databases", None))
+        else:
+            db_name = databases[index % len(databases)]
+            calls.append(
+                (
+                    name,
+                    "POST",
+                    f"/instances/{instance}/databases/{db_name}/attach",
+                    {"project": f"bench-app-{index}", "envVar": "DATABASE_URL"},
+                )
+            )
+    return calls
+
+
+def summarize(name: str, results: list[CGIResult], duration: float) -> dict[str, Any]:
+    latencies = [result.latency for result in results]
+    stats = [result.stats for result in results if result.stats is not None]
+    sqlite_seconds = [stat["sqliteSeconds"] + stat["commitSeconds"] for stat in stats]
+    failures = [
+        result for result in results if result.status >= 400 or result.status == 0
+    ]
+    locked = [result for result in results if result.locked]
+    return {
+        "workload": name,
+        "requests": len(results),
+        "throughput": len(results) / duration if duration > 0 else 0.0,
+        "p50Ms": environment.percentile(latencies, 50) * 1000,
+        "p99Ms": environment.percentile(latencies, 99) * 1000,
+        "sqliteWaitP50Ms": environment.percentile(sqlite_seconds, 50) * 1000,
+        "sqliteWaitP99Ms": environment.percentile(sqlite_seconds, 99) * 1000,
+        "sqliteWaitMaxMs": max(sqlite_seconds, default=0.0) * 1000,
+        "failureRate": len(failures) / max(len(results), 1),
+        "lockedRate": len(locked) / max(len(results), 1),
+    }
+
+
+def run(args) -> list[dict[str, Any]]:
+    disco = FakeDisco(latency=args.disco_latency / 1000).start()
+    data_dir = tempfile.mkdtemp(prefix="addon-cgiload-")
+    environment.prepare(data_dir=data_dir, disco_url=disco.url)
+    environment.migrate()
+    instance, databases = seed(args, disco)
+    calls = build_calls(args.workload, args.requests, instance, databases)
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        results = list(executor.map(lambda call: run_cgi(*call), calls))
+    duration = time.perf_counter() - start
+    disco.stop()
+    summaries = [summarize("all", results, duration)]
+    if args.workload == "mixed":
+        for name in WORKLOADS[:-1]:
+            summaries.append(
+                summarize(
+                    name,
+                    [result for result in results if result.name == name],
+                    duration,
+                )
+            )
+    return summaries
+
+
+def print_report(summaries: list[dict[str, Any]]) -> None:
+    header = (
+        f"{'workload':<16} {'reqs':>5} {'req/s':>7} {'p50 ms':>8} {'p99 ms':>8} "
+        f"{'wait p50':>9} {'wait p99':>9} {'wait max':>9} {'failed':>7} {'locked':>7}"
+    )
+    print(header)
+    print("-" * len(header))
+    for summary in summaries:
+        print(
+            f"{summary['workload']:<16} {summary['requests']:>5} "
+            f"{summary['throughput']:>7.1f} {summary['p50Ms']:>8.1f} "
+            f"{summary['p99Ms']:>8.1f} {summary['sqliteWaitP50Ms']:>9.1f} "
+            f"{summary['sqliteWaitP99Ms']:>9.1f} {summary['sqliteWaitMaxMs']:>9.1f} "
+            f"{summary['failureRate']:>7.1%} {summary['lockedRate']:>7.1%}"
+        )
+    print("\nSQLite wait is time spent in SQLite statements and commits per request.")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--workload", choices=WORKLOADS, default="mixed")
+    parser.add_argument("--databases", type=int, default=10, help="seeded databases")
+    parser.add_argument(
+        "--disco-latency", type=float, default=0.0, help="ms added to Disco calls"
+    )
+    parser.add_argument("--json", action="store_true", help="print JSON")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+    summaries = run(args)
+    if args.json:
+        print(json.dumps(summaries, indent=2))
+    else:
+        print_report(summaries)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+"""One CGI invocation, as Disco runs addon_cgi, with the Postgres stand-in.
+
+Writes the response to stdout like addon.cgi.main() and a stats line
+prefixed with STATS_PREFIX to stderr for benchmarks/cgiload.py.
+"""
+
+import json
+import sys
+import time
+
+STATS_PREFIX = "BENCHMARK_STATS "
+
+
+def main():
+    start = time.perf_counter()
+    from sqlalchemy import event
+
+    from addon.models.db import engine
+    from benchmarks.standins import install_postgres
+
+    install_postgres(None)
+    stats = {"sqliteStatements": 0, "sqliteSeconds": 0.0, "commitSeconds": 0.0}
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, many):
+        conn.info["statement_start"] = time.perf_counter()
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, many):
+        stats["sqliteStatements"] += 1
+        stats["sqliteSeconds"] += time.perf_counter() - conn.info.pop("statement_start")
+
+    @event.listens_for(engine, "commit")
+    def commit(conn):
+        conn.info["commit_start"] = time.perf_counter()
+
+    @event.listens_for(engine, "checkin")
+    def checkin(dbapi_connection, connection_record):
+        # Pooled connections are checked in right after commit/rollback.
+        commit_start = connection_record.info.pop("commit_start", None)
+        if commit_start is not None:
+            stats["commitSeconds"] += time.perf_counter() - commit_start
+
+    from addon import cgi
+
+    cgi.handle_request()
+    stats["processSeconds"] = time.perf_counter() - start
+    sys.stderr.write(f"{STATS_PREFIX}{json.dumps(stats)}\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,343 @@
+"""End-to-end benchmark of addon.api.app.
+
+Runs create/attach/detach/delete workloads at a configurable scale
+against a fake Disco API and a Postgres stand-in (or a real throwaway
+Postgres when --postgres-dsn is given), then reports throughput,
+latency percentiles and call counts per phase.
+
+    python -m benchmarks.e2e --instances 5 --databases 10 --attachments 3
+"""
+
+import argparse
+import json
+import logging
+import re
+import tempfile
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any
+
+from benchmarks import environment
+from benchmarks.fakedisco import FakeDisco
+
+
+@dataclass
+class PhaseStats:
+    name: str
+    latencies: list[float] = field(default_factory=list)
+    errors: int = 0
+    duration: float = 0.0
+    disco_calls: int = 0
+    sqlite_statements: int = 0
+    postgres_connections: int = 0
+    postgres_statements: int = 0
+    server_timing: dict[str, float] = field(default_factory=dict)
+
+    def summary(self) -> dict[str, Any]:
+        requests = len(self.latencies)
+        per_request = max(requests, 1)
+        return {
+            "phase": self.name,
+            "requests": requests,
+            "errors": self.errors,
+            "throughput": requests / self.duration if self.duration > 0 else 0.0,
+            "p50Ms": environment.percentile(self.latencies, 50) * 1000,
+            "p99Ms": environment.percentile(self.latencies, 99) * 1000,
+            "discoCallsPerRequest": self.disco_calls / per_request,
+            "sqliteStatementsPerRequest": self.sqlite_statements / per_request,
+            "postgresConnectionsPerRequest": self.postgres_connections / per_request,
+            "postgresStatementsPerRequest": self.postgres_statements / per_request,
+            "serverTimingMsPerRequest": {
+                category: total / per_request
+                for category, total in self.server_timing.items()
+            },
+        }
+
+
+class SQLiteCounter:
+    def __init__(self, engine):
+        from sqlalchemy import event
+
+        self.lock = threading.Lock()
+        self.statements = 0
+        event.listen(engine, "before_cursor_execute", self.before_cursor_execute)
+
+    def before_cursor_execute(self, *args, **kwargs):
+        with self.lock:
+            self.statements += 1
+
+
+SERVER_TIMING_RE = re.compile(r"([a-z]+);dur=([0-9.]+)")
+
+
+class Runner:
+    def __init__(self, client, disco: FakeDisco, sqlite_counter, postgres_counter):
+        self.client = client
+        self.disco = disco
+        self.sqlite_counter = sqlite_counter
+        self.postgres_counter = postgres_counter
+
+    def run_phase(self, name: str, calls: list[tuple[str, str, Any]]) -> PhaseStats:
+        stats = PhaseStats(name=name)
+        disco_before = sum(self.disco.calls.values())
+        sqlite_before = self.sqlite_counter.statements
+        connections_before = self.postgres_counter.connections
+        statements_before = self.postgres_counter.total()
+        phase_start = time.perf_counter()
+        for method, url, body in calls:
+            start = time.perf_counter()
+            response = self.client.request(method, url, json=body)
+            stats.latencies.append(time.perf_counter() - start)
+            if response.status_code >= 400:
+                stats.errors += 1
+                logging.warning(
+                    "%s %s: %d %s", method, url, response.status_code, response.text
+                )
+            for category, duration in SERVER_TIMING_RE.findall(
+                response.headers.get("server-timing", "")
+            ):
+                stats.server_timing[category] = stats.server_timing.get(
+                    category, 0.0
+                ) + float(duration)
+        stats.duration = time.perf_counter() - phase_start
+        stats.disco_calls = sum(self.disco.calls.values()) - disco_before
+        stats.sqlite_statements = self.sqlite_counter.statements - sqlite_before
+        stats.postgres_connections = (
+            self.postgres_counter.connections - connections_before
+        )
+        stats.postgres_statements = self.postgres_counter.total() - statements_before
+        return stats
+
+    def post(self, url: str, body: Any = None) -> Any:
+        response = self.client.post(url, json=body)
+        assert response.status_code < 400, response.text
+        return response.json()
+
+
+def run(args) -> list[dict[str, Any]]:
+    disco = FakeDisco(latency=args.disco_latency / 1000).start()
+    data_dir = tempfile.mkdtemp(prefix="addon-bench-")
+    environment.prepare(data_dir=data_dir, disco_url=disco.url)
+    environment.migrate()
+
+    from fastapi.testclient import TestClient
+
+    from addon.api import app
+    from addon.models.db import engine
+    from benchmarks.standins import install_postgres
+
+    postgres_counter = install_postgres(args.postgres_dsn)
+    sqlite_counter = SQLiteCounter(engine)
+    client = TestClient(app, raise_server_exceptions=False)
+    runner = Runner(client, disco, sqlite_counter, postgres_counter)
+    projects = [f"bench-app-{index}" for index in range(args.attachments)]
+    for project in projects:
+        disco.add_project(project)
+
+    results = []
+    stats = runner.run_phase(
+        "create-instance",
+        [("POST", "/instances", {}) for _ in range(args.instances)],
+    )
+    results.append(stats)
+    instances = [
+        instance["name"] for instance in client.get("/instances").json()["instances"]
+    ]
+    results.append(
+        runner.run_phase(
+            "create-database",
+            [
+                ("POST", f"/instances/{instance}/databases", None)
+                for instance in instances
+                for _ in range(args.databases)
+            ],
+        )
+    )
+    databases = [
+        (instance, database["name"])
+        for instance in instances
+        for database in client.get(f"/instances/{instance}/databases").json()[
+            "databases"
+        ]
+    ]
+    attachments = [
+        (instance, db_name, project, f"DB_{db_index}_URL")
+        for db_index, (instance, db_name) in enumerate(databases)
+        for project in projects
+    ]
+    results.append(
+        runner.run_phase(
+            "attach",
+            [
+                (
+                    "POST",
+                    f"/instances/{instance}/databases/{db_name}/attach",
+                    {"project": project, "envVar": env_var},
+                )
+                for instance, db_name, project, env_var in attachments
+            ],
+        )
+    )
+    results.append(
+        runner.run_phase(
+            "list-instances",
+            [("GET", "/instances", None) for _ in range(args.reads)],
+        )
+    )
+    results.append(
+        runner.run_phase(
+            "detach",
+            [
+                (
+                    "POST",
+                    f"/instances/{instance}/databases/{db_name}/detach",
+                    {"project": project, "envVar": env_var},
+                )
+                for instance, db_name, project, env_var in attachments
+            ],
+        )
+    )
+    results.append(
+        runner.run_phase(
+            "delete-database",
+            [
+                ("DELETE", f"/instances/{instance}/databases/{db_name}", None)
+                for instance, db_name in databases
+            ],
+        )
+    )
+    # schema-per-project tenants, packed into a shared database per instance
+    results.append(
+        runner.run_phase(
+            "create-schema",
+            [
+                ("POST", f"/instances/{instance}/schemas", None)
+                for instance in instances
+                for _ in range(args.schemas)
+            ],
+        )
+    )
+    schemas = [
+        (instance, schema["name"])
+        for instance in instances
+        for schema in client.get(f"/instances/{instance}/schemas").json()["schemas"]
+    ]
+    schema_attachments = [
+        (instance, schema_name, project, f"SCHEMA_{schema_index}_URL")
+        for schema_index, (instance, schema_name) in enumerate(schemas)
+        for project in projects
+    ]
+    results.append(
+        runner.run_phase(
+            "attach-schema",
+            [
+                (
+                    "POST",
+                    f"/instances/{instance}/schemas/{schema_name}/attach",
+                    {"project": project, "envVar": env_var},
+                )
+                for instance, schema_name, project, env_var in schema_attachments
+            ],
+        )
+    )
+    results.append(
+        runner.run_phase(
+            "detach-schema",
+            [
+                (
+                    "POST",
+                    f"/instances/{instance}/schemas/{schema_name}/detach",
+                    {"project": project, "envVar": env_var},
+                )
+                for instance, schema_name, project, env_var in schema_attachments
+            ],
+        )
+    )
+    results.append(
+        runner.run_phase(
+            "delete-schema",
+            [
+                ("DELETE", f"/instances/{instance}/schemas/{schema_name}", None)
+                for instance, schema_name in schemas
+            ],
+        )
+    )
+    shared_databases = [
+        (instance, database["name"])
+        for instance in instances
+        for database in client.get(f"/instances/{instance}/databases").json()[
+            "databases"
+        ]
+        if database["shared"]
+    ]
+    results.append(
+        runner.run_phase(
+            "delete-shared",
+            [
+                ("DELETE", f"/instances/{instance}/databases/{db_name}", None)
+                for instance, db_name in shared_databases
+            ],
+        )
+    )
+    results.append(
+        runner.run_phase(
+            "delete-instance",
+            [("DELETE", f"/instances/{instance}", None) for instance in instances],
+        )
+    )
+    disco.stop()
+    return [stats.summary() for stats in results]
+
+
+def print_report(summaries: list[dict[str, Any]]) -> None:
+    header = (
+        f"{'phase':<16} {'reqs':>6} {'errs':>5} {'req/s':>8} {'p50 ms':>8} "
+        f"{'p99 ms':>8} {'disco':>6} {'sqlite':>7} {'pg conn':>8} {'pg sql':>7}"
+    )
+    print(header)
+    print("-" * len(header))
+    for summary in summaries:
+        print(
+            f"{summary['phase']:<16} {summary['requests']:>6} "
+            f"{summary['errors']:>5} {summary['throughput']:>8.1f} "
+            f"{summary['p50Ms']:>8.2f} {summary['p99Ms']:>8.2f} "
+            f"{summary['discoCallsPerRequest']:>6.1f} "
+            f"{summary['sqliteStatementsPerRequest']:>7.1f} "
+            f"{summary['postgresConnectionsPerRequest']:>8.1f} "
+            f"{summary['postgresStatementsPerRequest']:>7.1f}"
+        )
+    print("\nCall counts are per request.")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--instances", type=int, default=2)
+    parser.add_argument("--databases", type=int, default=5, help="per instance")
+    parser.add_argument("--attachments", type=int, default=2, help="per database")
+    parser.add_argument("--schemas", type=int, default=3, help="per instance")
+    parser.add_argument("--reads", type=int, default=20, help="GET /instances calls")
+    parser.add_argument(
+        "--disco-latency", type=float, default=0.0, help="ms added to Disco calls"
+    )
+    parser.add_argument(
+        "--postgres-dsn",
+        default=None,
+        help="throwaway Postgres superuser DSN, e.g. postgresql://postgres:pw@127.0.0.1",
+    )
+    parser.add_argument("--json", action="store_true", help="print JSON")
+    parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.WARNING)
+    summaries = run(args)
+    if args.json:
+        print(json.dumps(summaries, indent=2))
+    else:
+        print_report(summaries)
+    # so that a run against a real Postgres doubles as a check
+    if any(summary["errors"] > 0 for summary in summaries):
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,32 @@
+import os
+
+from alembic import command
+from alembic.config import Config
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def prepare(data_dir: str, disco_url: str) -> None:
+    # Must run before anything imports addon.context or addon.models.db.
+    os.environ["ADDON_DATABASE_URL"] = f"sqlite:///{data_dir}/db.sqlite3"
+    os.environ["DISCO_PROJECT_NAME"] = "postgres-addon"
+    os.environ["DISCO_HOST"] = "disco.example.com"
+    os.environ["DISCO_API_KEY"] = "benchmark-api-key"
+    os.environ["HTTP_PROXY"] = disco_url
+    os.environ["http_proxy"] = disco_url
+    os.environ.pop("NO_PROXY", None)
+    os.environ.pop("no_proxy", None)
+
+
+def migrate() -> None:
+    config = Config(os.path.join(REPO_ROOT, "alembic.ini"))
+    config.set_main_option("script_location", os.path.join(REPO_ROOT, "addon/alembic"))
+    command.upgrade(config, "head")
+
+
+def percentile(values: list[float], pct: float) -> float:
+    if len(values) == 0:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
@@ -0,0 +1,155 @@
+"""Stand-in for the Disco HTTP API used by addon/disco.py.
+
+addon/disco.py always talks to http://disco/api/..., so the server is
+reached by pointing HTTP_PROXY at it: requests then sends absolute URLs
+to the proxy, and the handler routes them on the path.
+"""
+
+import json
+import re
+import secrets
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable
+from urllib.parse import urlsplit
+
+
+class FakeDisco:
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.lock = threading.Lock()
+        self.projects: dict[str, dict[str, str]] = {}
+        self.deployments: dict[str, int] = {}
+        self.calls: Counter[str] = Counter()
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), self.handler_class())
+        self.server.daemon_threads = True
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f"http://{host!s}:{port}"
+
+    def start(self) -> "FakeDisco":
+        self.thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+
+    def add_project(self, name: str) -> None:
+        with self.lock:
+            self.projects.setdefault(name, {})
+
+    def handler_class(self) -> type[BaseHTTPRequestHandler]:
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                self.dispatch("GET")
+
+            def do_POST(self):
+                self.dispatch("POST")
+
+            def do_DELETE(self):
+                self.dispatch("DELETE")
+
+            def dispatch(self, method: str) -> None:
+                length = int(self.headers.get("Content-Length") or 0)
+                body = json.loads(self.rfile.read(length)) if length > 0 else None
+                path = urlsplit(self.path).path
+                if fake.latency > 0:
+                    time.sleep(fake.latency)
+                status_code, resp_body = fake.route(method, path, body)
+                data = json.dumps(resp_body).encode()
+                self.send_response(status_code)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def route(self, method: str, path: str, body: Any) -> tuple[int, Any]:
+        routes: list[tuple[str, str, Callable[..., tuple[int, Any]]]] = [
+            ("POST", r"^/api/projects$", self.create_project),
+            ("GET", r"^/api/projects$", self.list_projects),
+            ("DELETE", r"^/api/projects/([^/]+)$", self.remove_project),
+            ("GET", r"^/api/projects/([^/]+)/env$", self.list_env),
+            ("POST", r"^/api/projects/([^/]+)/env$", self.set_env),
+            ("GET", r"^/api/projects/([^/]+)/env/([^/]+)$", self.get_env),
+            ("DELETE", r"^/api/projects/([^/]+)/env/([^/]+)$", self.unset_env),
+            ("POST", r"^/api/projects/([^/]+)/deployments$", self.deploy),
+            (
+                "GET",
+                r"^/api/projects/([^/]+)/deployments/([0-9]+)$",
+                self.deployment_status,
+            ),
+            ("POST", r"^/api/projects/([^/]+)/scale$", self.scale),
+        ]
+        for route_method, pattern, func in routes:
+            match = re.match(pattern, path)
+            if route_method == method and match is not None:
+                with self.lock:
+                    self.calls[func.__name__] += 1
+                    return func(body, *match.groups())
+        return 404, {"detail": f"{method} {path} not handled by fake Disco"}
+
+    def next_deployment(self, project_name: str) -> dict[str, int]:
+        number = self.deployments.get(project_name, 0) + 1
+        self.deployments[project_name] = number
+        return {"number": number}
+
+    def create_project(self, body):
+        name = body["name"]
+        if body.get("generateSuffix"):
+            name = f"{name}-{secrets.token_hex(3)}"
+        self.projects[name] = {}
+        return 201, {"project": {"name": name}}
+
+    def list_projects(self, body):
+        return 200, {"projects": [{"name": name} for name in self.projects]}
+
+    def remove_project(self, body, project_name):
+        if self.projects.pop(project_name, None) is None:
+            return 404, {"detail": "Project not found"}
+        return 200, {}
+
+    def set_env(self, body, project_name):
+        env = self.projects.setdefault(project_name, {})
+        for variable in body["envVariables"]:
+            env[variable["name"]] = variable["value"]
+        return 200, {"deployment": self.next_deployment(project_name)}
+
+    def list_env(self, body, project_name):
+        env = self.projects.get(project_name, {})
+        return 200, {
+            "envVariables": [
+                {"name": name, "value": value} for name, value in env.items()
+            ]
+        }
+
+    def get_env(self, body, project_name, var_name):
+        value = self.projects.get(project_name, {}).get(var_name)
+        if value is None:
+            return 404, {"detail": "Env variable not found"}
+        return 200, {"envVariable": {"name": var_name, "value": value}}
+
+    def unset_env(self, body, project_name, var_name):
+        self.projects.get(project_name, {}).pop(var_name, None)
+        return 200, {"deployment": self.next_deployment(project_name)}
+
+    def deploy(self, body, project_name):
+        return 201, {"deployment": self.next_deployment(project_name)}
+
+    def deployment_status(self, body, project_name, deployment_number):
+        return 200, {"deployment": {"status": "COMPLETE"}}
+
+    def scale(self, body, project_name):
+        return 200, {}
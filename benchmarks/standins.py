@@ -0,0 +1,143 @@
+"""Postgres stand-in for the benchmarks.
+
+addon/postgres.py only reaches the server through psycopg.connect(), so
+the stand-in replaces that one attribute. Statements are counted either
+way; with a DSN they are also executed against a throwaway server.
+"""
+
+import threading
+from collections import Counter
+from typing import Any
+from urllib.parse import urlsplit, urlunsplit
+
+import psycopg
+
+from addon import postgres
+
+
+class StatementCounter:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.connections = 0
+        self.statements: Counter[str] = Counter()
+
+    def count_connection(self) -> None:
+        with self.lock:
+            self.connections += 1
+
+    def count_statement(self, query: Any) -> None:
+        text = query if isinstance(query, str) else repr(query)
+        keyword = " ".join(text.split()[:2]).upper()
+        with self.lock:
+            self.statements[keyword] += 1
+
+    def total(self) -> int:
+        with self.lock:
+            return sum(self.statements.values())
+
+
+class FakeCursor:
+    def __init__(self, counter: StatementCounter):
+        self.counter = counter
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, query, params=None):
+        self.counter.count_statement(query)
+        return self
+
+    def fetchall(self):
+        return []
+
+    def fetchone(self):
+        return None
+
+
+class FakeConnection:
+    autocommit = False
+
+    def __init__(self, counter: StatementCounter):
+        self.counter = counter
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def cursor(self, *args, **kwargs):
+        return FakeCursor(self.counter)
+
+
+class CountingCursor:
+    def __init__(self, cursor, counter: StatementCounter):
+        self.cursor = cursor
+        self.counter = counter
+
+    def __enter__(self):
+        self.cursor.__enter__()
+        return self
+
+    def __exit__(self, *exc):
+        return self.cursor.__exit__(*exc)
+
+    def execute(self, query, params=None):
+        self.counter.count_statement(query)
+        return self.cursor.execute(query, params)
+
+    def __getattr__(self, name):
+        return getattr(self.cursor, name)
+
+
+class CountingConnection:
+    def __init__(self, conn, counter: StatementCounter):
+        self.__dict__["conn"] = conn
+        self.__dict__["counter"] = counter
+
+    def __enter__(self):
+        self.conn.__enter__()
+        return self
+
+    def __exit__(self, *exc):
+        return self.conn.__exit__(*exc)
+
+    def cursor(self, *args, **kwargs):
+        return CountingCursor(self.conn.cursor(*args, **kwargs), self.counter)
+
+    def __getattr__(self, name):
+        return getattr(self.conn, name)
+
+    def __setattr__(self, name, value):
+        setattr(self.conn, name, value)
+
+
+class PsycopgStandIn:
+    OperationalError = psycopg.OperationalError
+
+    def __init__(self, counter: StatementCounter, dsn: str | None):
+        self.counter = counter
+        self.dsn = dsn
+
+    def connect(self, conn_str: str, *args, **kwargs):
+        self.counter.count_connection()
+        if self.dsn is None:
+            return FakeConnection(self.counter)
+        conn = psycopg.connect(self.real_conn_str(conn_str), *args, **kwargs)
+        return CountingConnection(conn, self.counter)
+
+    def real_conn_str(self, conn_str: str) -> str:
+        # Instances are all served by the one throwaway server, keep only
+        # the database name from the conn string built by the addon.
+        assert self.dsn is not None
+        db_name = urlsplit(conn_str).path
+        return urlunsplit(urlsplit(self.dsn)._replace(path=db_name or "/postgres"))
+
+
+def install_postgres(dsn: str | None) -> StatementCounter:
+    counter = StatementCounter()
+    postgres.psycopg = PsycopgStandIn(counter, dsn)  # type: ignore
+    return counter